@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Benchmark offline do YouTube Downloader
+Mede análise, downloads, playlist, custo do progresso e memória (inclusive
+por entrada de playlist) sem internet
+
+Sobe um servidor HTTP local (com suporte a Range) com arquivos de mídia
+sintéticos e uma playlist RSS, que o yt-dlp lê pelo extrator genérico.
+Os dados do aplicativo (cache, diário, arquivo de downloads) ficam numa
+pasta temporária, então os dados do usuário não são tocados.
+
+Uso:
+    python benchmark.py                      # resultados em benchmark-results.json
+    python benchmark.py -o antes.json --size-mb 100 --playlist-items 20
+"""
+
+import argparse
+import http.server
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+# Isolar os dados do aplicativo antes de importar o downloader
+DATA_DIR = tempfile.mkdtemp(prefix="ytd-bench-")
+os.environ["YTD_DATA_DIR"] = os.path.join(DATA_DIR, "data")
+
+import yt_dlp
+import youtube_downloader as ytd
+
+class MediaHandler(http.server.BaseHTTPRequestHandler):
+    """Serve os arquivos da pasta de mídia, aceitando requisições Range"""
+
+    root = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self._serve(body=False)
+
+    def do_GET(self):
+        self._serve(body=True)
+
+    def _serve(self, body):
+        path = os.path.join(self.root, self.path.lstrip('/').split('?')[0])
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range') or '')
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'application/rss+xml' if path.endswith('.xml') else 'video/mp4')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        if not body:
+            return
+        try:
+            with open(path, 'rb') as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    data = f.read(min(1024 * 1024, remaining))
+                    if not data:
+                        break
+                    self.wfile.write(data)
+                    remaining -= len(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+class MediaServer:
+    """
+    Servidor local com mídia sintética
+
+    Args:
+        root: Pasta onde criar os arquivos
+        size_mb: Tamanho do arquivo grande (throughput)
+        playlist_items: Vídeos da playlist
+        item_mb: Tamanho de cada vídeo da playlist
+    """
+
+    def __init__(self, root, size_mb, playlist_items, item_mb):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._write_file('large.mp4', size_mb)
+        for i in range(playlist_items):
+            self._write_file(f'item{i}.mp4', item_mb)
+        handler = type('Handler', (MediaHandler,), {'root': root})
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self._write_feed(playlist_items)
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def _write_file(self, name, size_mb):
+        # Conteúdo pseudoaleatório (não comprime) em blocos de 1 MB
+        block = os.urandom(1024 * 1024)
+        with open(os.path.join(self.root, name), 'wb') as f:
+            for _ in range(max(1, int(size_mb))):
+                f.write(block)
+
+    def _write_feed(self, playlist_items):
+        items = "".join(
+            f'<item><title>Item {i}</title><link>{self.base_url}/item{i}.mp4</link>'
+            f'<enclosure url="{self.base_url}/item{i}.mp4" type="video/mp4"/></item>'
+            for i in range(playlist_items)
+        )
+        with open(os.path.join(self.root, 'playlist.xml'), 'w', encoding='utf-8') as f:
+            f.write('<?xml version="1.0"?><rss version="2.0"><channel><title>Benchmark</title>'
+                    f'<link>{self.base_url}/</link>{items}</channel></rss>')
+
+    def url(self, name):
+        return f'{self.base_url}/{name}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def quiet_opts(profile, outtmpl, hooks=()):
+    return ytd.build_ydl_opts(profile, outtmpl, hooks, quiet=True, no_warnings=True, noprogress=True)
+
+def bench_analyze(server, repeat):
+    """Latência da análise de uma playlist (lógica de _analyze_url_thread), fria e com cache"""
+    url = server.url('playlist.xml')
+    results = {}
+    for label, use_cache in (('cold', False), ('warm', True)):
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            marks = {}
+            entries = 0
+            for _, entry in ytd.stream_playlist(url, on_info=lambda info: marks.setdefault(
+                    'info', time.perf_counter() - started), use_cache=use_cache):
+                marks.setdefault('first_entry', time.perf_counter() - started)
+                entries += 1
+            marks['total'] = time.perf_counter() - started
+            marks['entries'] = entries
+            runs.append(marks)
+        results[label] = {key: min(run[key] for run in runs) for key in ('info', 'first_entry', 'total')}
+        results[label]['entries'] = runs[0]['entries']
+    return results
+
+def bench_single(server, workdir, repeat, segments):
+    """Throughput de um arquivo grande (uma conexão e segmentado)"""
+    url = server.url('large.mp4')
+    size = os.path.getsize(os.path.join(server.root, 'large.mp4'))
+    results = {}
+    for count in sorted({1, segments}):
+        times = []
+        for run in range(repeat):
+            output = os.path.join(workdir, f'single-{count}-{run}')
+            started = time.perf_counter()
+            ytd.download_with_journal(url, 'video', quiet_opts('video', os.path.join(output, '%(title)s.%(ext)s')),
+                                      segments=count)
+            times.append(time.perf_counter() - started)
+            shutil.rmtree(output, ignore_errors=True)
+        best = min(times)
+        results[f'segments_{count}'] = {'seconds': best, 'bytes_per_second': size / best}
+    return results
+
+def bench_playlist(server, workdir, workers):
+    """Tempo total de uma playlist com downloads paralelos, e a memória de pico"""
+    url = server.url('playlist.xml')
+    output = os.path.join(workdir, 'playlist')
+
+    def build_opts(idx, entry, hook):
+        return quiet_opts('video', os.path.join(output, f'{idx+1} - %(title)s.%(ext)s'), [hook])
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    scheduler = ytd.DownloadScheduler(build_opts, max_workers=workers)
+    results = scheduler.run(ytd.stream_playlist(url, use_cache=False))
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    downloaded = sum(os.path.getsize(os.path.join(output, name)) for name in os.listdir(output))
+    shutil.rmtree(output, ignore_errors=True)
+    return {
+        'items': len(results),
+        'failed': sum(1 for ok in results.values() if not ok),
+        'workers': workers,
+        'seconds': elapsed,
+        'bytes_per_second': downloaded / elapsed,
+        'python_peak_bytes': peak,
+    }
+
+def bench_progress(calls):
+    """Custo por evento de progresso da cadeia de hooks de um job real"""
+    aggregator = ytd.ProgressAggregator()
+    journal = ytd.DownloadJournal(os.path.join(DATA_DIR, 'bench-journal.sqlite3'))
+    governor = ytd.BandwidthGovernor()
+    job = journal.start('http://127.0.0.1/bench.mp4', 'video', 'bench.%(ext)s')
+    hooks = [aggregator.hook('bench'), journal.hook(job), governor.hook(job)]
+    events = [{
+        'status': 'downloading', 'downloaded_bytes': i * 1024, 'total_bytes': calls * 1024,
+        'filename': 'bench.mp4', 'tmpfilename': 'bench.mp4.part',
+    } for i in range(calls)]
+
+    started = time.perf_counter()
+    for d in events:
+        for hook in hooks:
+            hook(d)
+    hook_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        aggregator.poll()
+    poll_seconds = time.perf_counter() - started
+    return {
+        'events': calls,
+        'hooks': len(hooks),
+        'ns_per_event': hook_seconds / calls * 1e9,
+        'us_per_render_poll': poll_seconds / 1000 * 1e6,
+    }
+
+# Forma de uma entrada flat de playlist do YouTube (campos e tamanhos típicos)
+YOUTUBE_FLAT_ENTRY = {
+    '_type': 'url', 'ie_key': 'Youtube', 'id': 'dQw4w9WgXcQ',
+    'url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ',
+    'title': 'Título de um vídeo qualquer com um tamanho comum (Clipe Oficial)',
+    'description': None, 'duration': 213.0, 'channel_id': 'UCuAXFkgsw1L7xaCfnd5JJOw',
+    'channel': 'Canal de Exemplo', 'channel_url': 'https://www.youtube.com/channel/UCuAXFkgsw1L7xaCfnd5JJOw',
+    'uploader': 'Canal de Exemplo', 'uploader_id': '@canaldeexemplo',
+    'uploader_url': 'https://www.youtube.com/@canaldeexemplo',
+    'thumbnails': [
+        {'url': f'https://i.ytimg.com/vi/dQw4w9WgXcQ/{name}.jpg?sqp=-oaymwEbCKgBEF5IVfKriqkDDggBFQAAiEIYAXABwAEG&rs=AOn4CLB',
+         'height': height, 'width': width}
+        for name, width, height in (('hqdefault', 168, 94), ('hqdefault', 196, 110),
+                                    ('hqdefault', 246, 138), ('hqdefault', 336, 188))
+    ],
+    'timestamp': None, 'release_timestamp': None, 'availability': None,
+    'view_count': 1234567, 'live_status': None, 'channel_is_verified': None,
+}
+
+def load_entry(data):
+    """Entrada a partir do JSON, com valores novos mas chaves compartilhadas (como no yt-dlp)"""
+    return json.loads(data, object_pairs_hook=lambda pairs: {sys.intern(k): v for k, v in pairs})
+
+def entries_size(build, count):
+    """Bytes que 'count' entradas criadas por build(i) ocupam enquanto guardadas"""
+    tracemalloc.start()
+    entries = [build(i) for i in range(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del entries
+    return current
+
+def bench_entries(server, count):
+    """Memória por entrada de playlist: dicionário flat do yt-dlp x PlaylistEntry"""
+    with ytd.ydl_pool.session('probe', ytd.PROBE_OPTS) as ydl:
+        info = ydl.extract_info(server.url('playlist.xml'), download=False, process=False)
+        listed = [json.dumps(entry) for entry in info['entries']]
+    results = {}
+    # Cada entrada é recriada do JSON, para que nenhuma string seja compartilhada
+    for label, samples in (('listing', listed), ('youtube_flat', [json.dumps(YOUTUBE_FLAT_ENTRY)])):
+        flat = entries_size(lambda i: load_entry(samples[i % len(samples)]), count)
+        compact = entries_size(
+            lambda i: ytd.PlaylistEntry.from_info(i, load_entry(samples[i % len(samples)])), count)
+        results[label] = {
+            'entries': count,
+            'dict_bytes_per_entry': flat / count,
+            'compact_bytes_per_entry': compact / count,
+        }
+    return results
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def max_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss vem em KB no Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline do YouTube Downloader.")
+    parser.add_argument('-o', '--output', default="benchmark-results.json", help="arquivo JSON de saída")
+    parser.add_argument('--size-mb', type=int, default=64, help="tamanho do arquivo grande (padrão: 64)")
+    parser.add_argument('--playlist-items', type=int, default=12, help="vídeos da playlist (padrão: 12)")
+    parser.add_argument('--item-mb', type=int, default=4, help="tamanho de cada vídeo da playlist (padrão: 4)")
+    parser.add_argument('--workers', type=int, default=ytd.DEFAULT_WORKERS, help="downloads simultâneos")
+    parser.add_argument('--segments', type=int, default=4, help="conexões do teste segmentado (padrão: 4)")
+    parser.add_argument('--repeat', type=int, default=3, help="repetições (fica o melhor tempo)")
+    parser.add_argument('--progress-events', type=int, default=100000, help="eventos no teste de progresso")
+    parser.add_argument('--entries', type=int, default=10000, help="entradas no teste de memória (padrão: 10000)")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.join(DATA_DIR, 'work')
+    try:
+        with MediaServer(os.path.join(DATA_DIR, 'media'), args.size_mb, args.playlist_items, args.item_mb) as server:
+            results = {
+                'analyze': bench_analyze(server, args.repeat),
+                'single': bench_single(server, workdir, args.repeat, args.segments),
+                'playlist': bench_playlist(server, workdir, args.workers),
+                'progress': bench_progress(args.progress_events),
+                'entries': bench_entries(server, args.entries),
+            }
+        results['max_rss_bytes'] = max_rss_bytes()
+        report = {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'yt_dlp': yt_dlp.version.__version__,
+            'platform': platform.platform(),
+            'parameters': vars(args),
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(json.dumps(results, indent=2))
+        print(f"\n📊 Resultados salvos em: {os.path.abspath(args.output)}")
+    finally:
+        ytd.ydl_pool.close_all()
+        shutil.rmtree(DATA_DIR, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
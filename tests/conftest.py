@@ -0,0 +1,41 @@
+"""
+Fixtures dos testes
+
+Os testes usam o servidor local do benchmark (mídia sintética com suporte
+a Range e uma playlist RSS), então rodam sem internet. Importar o
+benchmark também isola os dados do aplicativo numa pasta temporária.
+"""
+
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import benchmark  # noqa: E402 (define YTD_DATA_DIR antes de importar o downloader)
+import youtube_downloader as ytd  # noqa: E402
+
+@pytest.fixture(scope='session')
+def media_server(tmp_path_factory):
+    """Servidor com large.mp4 (4 MB), item0..item7.mp4 (1 MB) e playlist.xml"""
+    root = str(tmp_path_factory.mktemp('media'))
+    with benchmark.MediaServer(root, size_mb=4, playlist_items=8, item_mb=1) as server:
+        yield server
+
+@pytest.fixture(scope='session')
+def ffmpeg():
+    """Caminho do FFmpeg (pula o teste se não houver)"""
+    path = ytd.find_ffmpeg() or shutil.which('ffmpeg')
+    if path is None:
+        try:
+            import imageio_ffmpeg
+            path = imageio_ffmpeg.get_ffmpeg_exe()
+        except (ImportError, RuntimeError):
+            pytest.skip("FFmpeg não encontrado")
+    return path
+
+def pytest_sessionfinish(session, exitstatus):
+    ytd.ydl_pool.close_all()
+    shutil.rmtree(benchmark.DATA_DIR, ignore_errors=True)
@@ -0,0 +1,31 @@
+"""Análise de vários links ao mesmo tempo (analyze_links)"""
+
+import time
+
+import youtube_downloader as ytd
+
+def test_links_are_analyzed_concurrently(media_server):
+    urls = [media_server.url(f'item{i}.mp4') for i in range(4)] + [media_server.url('missing.mp4')]
+    results = {}
+    ytd.analyze_links(urls, lambda position, url, info, entries, error: results.update({position: (entries, error)}),
+                      concurrency=3)
+    assert sorted(results) == list(range(5))
+    for position in range(4):
+        entries, error = results[position]
+        assert error is None and len(entries) == 1 and entries[0].url == urls[position]
+    assert results[4][1] is not None
+
+def test_timeout_counts_from_when_the_analysis_starts(monkeypatch):
+    delays = {'slow': 1.0, 'fast': 0.2}
+
+    def probe(url):
+        time.sleep(delays[url])
+        return {'title': url}, []
+
+    monkeypatch.setattr(ytd, 'probe_link', probe)
+    errors = {}
+    ytd.analyze_links(['slow', 'fast'], lambda position, url, info, entries, error: errors.update({url: error}),
+                      concurrency=1, timeout=0.5)
+    # 'fast' só começa quando a thread de 'slow' fica livre, e leva 0.2s
+    assert errors['slow'].startswith('tempo esgotado')
+    assert errors['fast'] is None
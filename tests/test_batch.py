@@ -0,0 +1,51 @@
+"""Modo em lote local (run_batch)"""
+
+import io
+import json
+import threading
+from contextlib import contextmanager
+
+import youtube_downloader as ytd
+
+def test_playlists_share_the_batch_concurrency(media_server, tmp_path, monkeypatch):
+    active = []
+    peak = [0]
+    lock = threading.Lock()
+    session = ytd.ydl_pool.session
+
+    @contextmanager
+    def counting_session(profile, ydl_opts):
+        with session(profile, ydl_opts) as ydl:
+            if profile == 'probe':
+                # Listagem da playlist, não é download
+                yield ydl
+                return
+            with lock:
+                active.append(ydl)
+                peak[0] = max(peak[0], len(active))
+            try:
+                yield ydl
+            finally:
+                with lock:
+                    active.remove(ydl)
+
+    monkeypatch.setattr(ytd.ydl_pool, 'session', counting_session)
+    # Banda limitada para os downloads se sobreporem
+    ytd.bandwidth_governor.set_rate(4 * 1024 * 1024)
+    try:
+        out = io.StringIO()
+        jobs = [('playlist', media_server.url('playlist.xml'))] + [('video', media_server.url('large.mp4'))]
+        failed = ytd.run_batch(jobs, str(tmp_path / 'out'), concurrency=2, out=out, segments=1)
+    finally:
+        ytd.bandwidth_governor.set_rate(None)
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert failed == 0 and len(results) == 2
+    assert peak[0] == 2
+
+def test_skipped_download_is_not_reported_as_downloaded(media_server, tmp_path, capsys):
+    url = media_server.url('item7.mp4')
+    assert ytd.download_video(url, str(tmp_path), progress_hooks=[])
+    assert "Download concluído" in capsys.readouterr().out
+    assert ytd.download_video(url, str(tmp_path), progress_hooks=[])
+    output = capsys.readouterr().out
+    assert "pulando" in output and "Download concluído" not in output
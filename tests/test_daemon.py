@@ -0,0 +1,119 @@
+"""Serviço local: fila, eventos e modo em lote pelo HTTP"""
+
+import io
+import json
+import threading
+
+import pytest
+
+from youtube_downloader_daemon import DownloadServer, DownloadService, ServiceClient, ServiceError
+
+def start_service(tmp_path, **kwargs):
+    service = DownloadService(segments=1, **kwargs)
+    return DownloadServer(service, port=0, service_file=str(tmp_path / 'daemon.json')).start()
+
+def run_in_thread(target, timeout=60):
+    """Roda target() numa thread e devolve o resultado (falha se não terminar a tempo)"""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(target()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "não terminou a tempo"
+    return result[0]
+
+def test_run_batch_with_more_jobs_than_max_finished(media_server, tmp_path):
+    # Os primeiros jobs terminam e saem da lista do serviço antes do último
+    # ser enviado; o lote ainda precisa receber o resultado de todos
+    server = start_service(tmp_path, max_workers=2, max_finished=3)
+    try:
+        client = ServiceClient(server.url, server.token)
+        jobs = [('video', media_server.url(f'item{i}.mp4')) for i in range(8)]
+        # Na segunda vez todos são pulados (já baixados) e terminam na hora
+        for _ in range(2):
+            out = io.StringIO()
+            failed = run_in_thread(lambda: client.run_batch(jobs, str(tmp_path / 'out'), out=out))
+            lines = [json.loads(line) for line in out.getvalue().splitlines()]
+            assert failed == 0
+            assert sorted(line['url'] for line in lines) == sorted(url for _, url in jobs)
+            assert all(line['ok'] for line in lines)
+    finally:
+        server.close()
+
+def test_finished_jobs_are_evicted_once_delivered(media_server, tmp_path):
+    server = start_service(tmp_path, max_workers=2, max_finished=2)
+    try:
+        client = ServiceClient(server.url, server.token)
+        jobs = [('video', media_server.url(f'item{i}.mp4')) for i in range(5)]
+        run_in_thread(lambda: client.run_batch(jobs, str(tmp_path / 'out'), out=io.StringIO()))
+        # Sem leitores de /events, o limite volta a valer
+        assert len(client.jobs()) <= 2
+    finally:
+        server.close()
+
+def test_submit_and_follow_events(media_server, tmp_path):
+    server = start_service(tmp_path, max_workers=2)
+    try:
+        client = ServiceClient(server.url, server.token)
+        events = client.subscribe()
+        job = client.submit(media_server.url('item0.mp4'), output=str(tmp_path / 'out'), name='first.mp4')
+        assert job['status'] == 'queued'
+        seen = []
+        results = run_in_thread(lambda: client.wait([job['id']], on_update=lambda j: seen.append(j['status']),
+                                                    events=events))
+        final = results[job['id']]
+        assert final['ok'] and final['bytes'] == 1024 * 1024
+        assert 'downloading' in seen and seen[-1] == 'done'
+        assert (tmp_path / 'out' / 'first.mp4').stat().st_size == 1024 * 1024
+        assert client.job(job['id'])['status'] == 'done'
+    finally:
+        server.close()
+
+def test_playlist_job_downloads_every_entry(media_server, tmp_path):
+    server = start_service(tmp_path, max_workers=3)
+    try:
+        client = ServiceClient(server.url, server.token)
+        events = client.subscribe()
+        job = client.submit(media_server.url('playlist.xml'), mode='playlist', output=str(tmp_path / 'out'))
+        final = run_in_thread(lambda: client.wait([job['id']], events=events))[job['id']]
+        assert final['ok']
+        assert final['children']['total'] == 8 and final['children']['done'] == 8
+        assert len(list((tmp_path / 'out').iterdir())) == 8
+    finally:
+        server.close()
+
+def test_queued_and_running_jobs_can_be_cancelled(media_server, tmp_path):
+    server = start_service(tmp_path, max_workers=1)
+    client = ServiceClient(server.url, server.token)
+    try:
+        # Banda baixa para o primeiro job ainda estar baixando ao cancelar
+        client.set_rate(100 * 1024)
+        events = client.subscribe()
+        running = client.submit(media_server.url('item5.mp4'), output=str(tmp_path / 'out'))
+        queued = client.submit(media_server.url('item6.mp4'), output=str(tmp_path / 'out'))
+        assert client.cancel(queued['id'])['status'] == 'cancelled'
+        client.cancel(running['id'])
+        results = run_in_thread(lambda: client.wait([running['id'], queued['id']], events=events))
+        assert {job['status'] for job in results.values()} == {'cancelled'}
+        with pytest.raises(ServiceError) as error:
+            client.cancel(queued['id'])
+        assert error.value.status == 409
+    finally:
+        client.set_rate(0)
+        server.close()
+
+def test_requests_are_validated(tmp_path):
+    server = start_service(tmp_path)
+    try:
+        with pytest.raises(ServiceError) as error:
+            ServiceClient(server.url, 'wrong-token').status()
+        assert error.value.status == 401
+        client = ServiceClient(server.url, server.token)
+        for kwargs in ({'mode': 'gif'}, {'name': '../outside.mp4'}):
+            with pytest.raises(ServiceError) as error:
+                client.submit('https://example.com/video', output=str(tmp_path), **kwargs)
+            assert error.value.status == 400
+        with pytest.raises(ServiceError) as error:
+            client.job('999')
+        assert error.value.status == 404
+    finally:
+        server.close()
@@ -0,0 +1,53 @@
+"""Diário de downloads: o que fica retomável depois de uma falha"""
+
+import os
+
+import pytest
+
+import youtube_downloader as ytd
+
+class Stop(Exception):
+    pass
+
+def opts(output, hooks=(), quality=None):
+    return ytd.build_ydl_opts('video', os.path.join(str(output), '%(title)s.%(ext)s'), list(hooks), quality=quality,
+                              quiet=True, no_warnings=True, noprogress=True)
+
+def test_extraction_error_is_not_resumable(media_server, tmp_path):
+    journal = ytd.DownloadJournal(str(tmp_path / 'journal.sqlite3'))
+    url = media_server.url('missing.mp4')
+    with pytest.raises(Exception):
+        ytd.download_with_journal(url, 'video', opts(tmp_path / 'out'), journal=journal, segments=1)
+    assert journal.interrupted() == []
+    job_id = journal.job_id(url, 'video', opts(tmp_path / 'out')['outtmpl'])
+    assert journal._execute("SELECT state FROM jobs WHERE job_id = ?", (job_id,)) == [('failed',)]
+
+def test_interrupted_download_keeps_its_part_file(media_server, tmp_path, monkeypatch):
+    journal = ytd.DownloadJournal(str(tmp_path / 'journal.sqlite3'))
+    url = media_server.url('large.mp4')
+    
+    def stop_midway(d):
+        if d['status'] == 'downloading' and (d.get('downloaded_bytes') or 0) > 1024 * 1024:
+            raise Stop()
+    
+    quality = ytd.FormatSelector(max_height=360, max_size=50 * 1024 * 1024)
+    with pytest.raises(Exception):
+        ytd.download_with_journal(url, 'video', opts(tmp_path / 'out', [stop_midway], quality), journal=journal,
+                                  segments=1)
+    jobs = journal.interrupted()
+    assert [job['url'] for job in jobs] == [url]
+    assert jobs[0]['options'] == {'quality': quality.to_dict(), 'segments': 1}
+    
+    # Retomar continua o .part com as mesmas opções e conclui o job
+    used = []
+    build_ydl_opts = ytd.build_ydl_opts
+    
+    def spy(profile, outtmpl, progress_hooks=(), ffmpeg_location=None, quality=None, **extra):
+        used.append(quality)
+        return build_ydl_opts(profile, outtmpl, progress_hooks, ffmpeg_location, quality, **extra)
+    monkeypatch.setattr(ytd, 'build_ydl_opts', spy)
+    results = ytd.resume_interrupted(journal=journal)
+    assert [selector.to_dict() for selector in used] == [quality.to_dict()]
+    assert [ok for _, ok in results] == [True]
+    assert journal.interrupted() == []
+    assert os.path.getsize(tmp_path / 'out' / 'large.mp4') == 4 * 1024 * 1024
@@ -0,0 +1,52 @@
+"""Pool de instâncias do YoutubeDL (YoutubeDLPool)"""
+
+import os
+
+import youtube_downloader as ytd
+from benchmark import quiet_opts
+
+def test_playlist_items_reuse_instances(media_server, tmp_path, monkeypatch):
+    pool = ytd.YoutubeDLPool()
+    monkeypatch.setattr(ytd, 'ydl_pool', pool)
+    output = str(tmp_path / 'out')
+
+    def build_opts(idx, entry, hook):
+        return quiet_opts('video', os.path.join(output, f'{idx+1} - %(title)s.%(ext)s'), [hook])
+
+    jobs = [(i, {'url': media_server.url(f'item{i}.mp4')}) for i in range(8)]
+    try:
+        assert all(ytd.DownloadScheduler(build_opts, max_workers=2, segments=1).run(jobs).values())
+        # Uma instância por download simultâneo; o nome de cada item muda a cada uso
+        assert pool.created <= 2 and pool.reused >= 6
+        assert len(pool._idle) == 1
+    finally:
+        pool.close_all()
+    assert sorted(os.listdir(output)) == sorted(f'{i+1} - item{i}.mp4' for i in range(8))
+
+def test_idle_instances_are_capped_across_profiles(tmp_path):
+    pool = ytd.YoutubeDLPool(max_idle=2, max_idle_total=3)
+    try:
+        for profile in ('a', 'b', 'c'):
+            opts = {'quiet': True, 'outtmpl': str(tmp_path / '%(title)s.%(ext)s')}
+            with pool.session(profile, opts), pool.session(profile, opts):
+                pass
+        # Sobram as 3 mais recentes: as duas de 'c' e uma de 'b'
+        assert sorted((key[0], len(idle)) for key, idle in pool._idle.items()) == [('b', 1), ('c', 2)]
+    finally:
+        pool.close_all()
+
+def test_template_and_hooks_belong_to_each_session(tmp_path):
+    pool = ytd.YoutubeDLPool()
+    try:
+        calls = []
+        with pool.session('p', {'quiet': True, 'outtmpl': 'first/%(id)s', 'progress_hooks': [calls.append]}) as ydl:
+            first = ydl
+            assert ydl.prepare_filename({'id': 'x', 'ext': 'mp4'}) == os.path.join('first', 'x')
+        with pool.session('p', {'quiet': True, 'outtmpl': 'second/%(id)s'}) as ydl:
+            assert ydl is first
+            assert ydl.prepare_filename({'id': 'x', 'ext': 'mp4'}) == os.path.join('second', 'x')
+            for hook in ydl.params['progress_hooks']:
+                hook({'status': 'downloading'})
+        assert calls == []
+    finally:
+        pool.close_all()
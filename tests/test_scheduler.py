@@ -0,0 +1,75 @@
+"""Downloads de playlist em paralelo (DownloadScheduler)"""
+
+import os
+import threading
+import time
+
+import youtube_downloader as ytd
+from benchmark import quiet_opts
+
+def numbered_opts(output, slow=0):
+    def build_opts(idx, entry, hook):
+        def slow_hook(d):
+            hook(d)
+            # Deixa os downloads durarem o bastante para se sobreporem
+            if slow and d['status'] == 'downloading':
+                time.sleep(slow)
+        return quiet_opts('video', os.path.join(output, f'{idx+1} - %(title)s.%(ext)s'), [slow_hook])
+    return build_opts
+
+def test_files_are_named_by_playlist_position(media_server, tmp_path):
+    output = str(tmp_path / 'out')
+    scheduler = ytd.DownloadScheduler(numbered_opts(output), max_workers=4, segments=1)
+    results = scheduler.run(ytd.stream_playlist(media_server.url('playlist.xml'), use_cache=False))
+    assert results == {i: True for i in range(8)}
+    # A ordem em que terminam não muda o número de cada arquivo
+    assert sorted(os.listdir(output)) == sorted(f'{i+1} - item{i}.mp4' for i in range(8))
+    assert scheduler.aggregate()['done'] == 8
+
+def test_concurrency_is_bounded_by_max_workers(media_server, tmp_path):
+    peak = []
+    lock = threading.Lock()
+
+    def on_progress(idx, item, aggregate):
+        with lock:
+            peak.append(aggregate['active'])
+
+    jobs = [(i, {'url': media_server.url(f'item{i}.mp4'), 'title': f'item{i}'}) for i in range(6)]
+    scheduler = ytd.DownloadScheduler(numbered_opts(str(tmp_path / 'out'), slow=0.02), max_workers=3,
+                                      on_progress=on_progress, segments=1)
+    assert all(scheduler.run(jobs).values())
+    assert max(peak) == 3
+
+def test_entries_are_pulled_as_slots_free_up(media_server, tmp_path):
+    pulled = []
+    scheduler = ytd.DownloadScheduler(numbered_opts(str(tmp_path / 'out')), max_workers=2, segments=1)
+
+    def jobs():
+        for i in range(8):
+            aggregate = scheduler.aggregate()
+            pulled.append(i - aggregate['done'] - aggregate['failed'])
+            yield i, {'url': media_server.url(f'item{i}.mp4'), 'title': f'item{i}'}
+
+    assert len(scheduler.run(jobs())) == 8
+    # Nunca mais que 2 * max_workers itens esperando ou em andamento
+    assert max(pulled) <= 4
+
+def test_failed_item_does_not_stop_the_others(media_server, tmp_path):
+    output = str(tmp_path / 'out')
+    jobs = [(0, {'url': media_server.url('item0.mp4')}), (1, {'url': media_server.url('missing.mp4')}),
+            (2, {'url': media_server.url('item2.mp4')})]
+    scheduler = ytd.DownloadScheduler(numbered_opts(output), max_workers=2, segments=1)
+    assert scheduler.run(jobs) == {0: True, 1: False, 2: True}
+    assert scheduler.aggregate()['failed'] == 1
+    assert sorted(os.listdir(output)) == ['1 - item0.mp4', '3 - item2.mp4']
+
+def test_items_share_pooled_instances(media_server, tmp_path, monkeypatch):
+    pool = ytd.YoutubeDLPool()
+    monkeypatch.setattr(ytd, 'ydl_pool', pool)
+    output = str(tmp_path / 'out')
+    jobs = [(i, {'url': media_server.url(f'item{i}.mp4'), 'title': f'item{i}'}) for i in range(8)]
+    scheduler = ytd.DownloadScheduler(numbered_opts(output), max_workers=2, segments=1)
+    assert all(scheduler.run(jobs).values())
+    # Só o modelo de saída muda entre os itens: no máximo uma instância por slot
+    assert pool.created <= 2 and pool.reused == 8 - pool.created
+    assert sorted(os.listdir(output)) == sorted(f'{i+1} - item{i}.mp4' for i in range(8))
@@ -0,0 +1,107 @@
+"""Download segmentado: pedaços com Range, retomada e formatos com junção"""
+
+import os
+import subprocess
+
+import pytest
+import yt_dlp
+
+import youtube_downloader as ytd
+from benchmark import quiet_opts
+
+class Stop(Exception):
+    pass
+
+def write_media(server, name, size):
+    # Conteúdo diferente em cada posição, para pegar pedaços fora do lugar
+    data = os.urandom(size)
+    with open(os.path.join(server.root, name), 'wb') as f:
+        f.write(data)
+    return data
+
+def test_segments_are_written_in_place(media_server, tmp_path):
+    data = write_media(media_server, 'ranges.bin', 3 * 1024 * 1024 + 12345)
+    target = str(tmp_path / 'ranges.bin')
+    events = []
+    with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+        downloader = ytd.SegmentedDownloader(ydl, 3, [events.append])
+        assert downloader.download(media_server.url('ranges.bin'), target)
+    with open(target, 'rb') as f:
+        assert f.read() == data
+    assert sorted(os.listdir(tmp_path)) == ['ranges.bin']
+    assert events[-1]['status'] == 'finished'
+
+def test_small_file_is_left_to_yt_dlp(media_server, tmp_path):
+    write_media(media_server, 'small.bin', 100 * 1024)
+    with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+        assert not ytd.SegmentedDownloader(ydl, 4).download(media_server.url('small.bin'), str(tmp_path / 'small.bin'))
+    assert os.listdir(tmp_path) == []
+
+def test_interrupted_download_resumes_missing_segments(media_server, tmp_path):
+    data = write_media(media_server, 'resume.bin', 4 * 1024 * 1024)
+    target = str(tmp_path / 'resume.bin')
+
+    def stop_at_the_end(d):
+        # O último bloco já foi gravado: os outros pedaços terminaram e este falha
+        if d['downloaded_bytes'] == d['total_bytes']:
+            raise Stop()
+
+    with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+        with pytest.raises(Stop):
+            ytd.SegmentedDownloader(ydl, 4, [stop_at_the_end]).download(media_server.url('resume.bin'), target)
+        assert not os.path.exists(target)
+        assert os.path.exists(target + '.seg.part') and os.path.exists(target + '.ytdl')
+
+        events = []
+        assert ytd.SegmentedDownloader(ydl, 4, [events.append]).download(media_server.url('resume.bin'), target)
+    # Só o pedaço que falhou foi baixado de novo
+    assert events[0]['downloaded_bytes'] == 3 * 1024 * 1024
+    with open(target, 'rb') as f:
+        assert f.read() == data
+    assert sorted(os.listdir(tmp_path)) == ['resume.bin']
+
+def test_download_with_journal_segments_large_file(media_server, tmp_path):
+    output = tmp_path / 'out'
+    info = ytd.download_with_journal(media_server.url('large.mp4'), 'video',
+                                     quiet_opts('video', str(output / '%(title)s.%(ext)s')), segments=4)
+    filepath = ytd.final_filename(info)
+    assert os.path.getsize(filepath) == os.path.getsize(os.path.join(media_server.root, 'large.mp4'))
+    assert os.listdir(output) == [os.path.basename(filepath)]
+
+def test_merged_formats_are_segmented_part_by_part(media_server, tmp_path, monkeypatch, ffmpeg):
+    # Partes pequenas, para não precisar gerar vários MB de mídia
+    monkeypatch.setattr(ytd, 'SEGMENT_MIN_SIZE', 8 * 1024)
+    root = media_server.root
+    subprocess.run([ffmpeg, '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc=size=640x360:rate=25', '-t', '4',
+                    '-c:v', 'libx264', '-pix_fmt', 'yuv420p', os.path.join(root, 'merge-v.mp4')], check=True)
+    subprocess.run([ffmpeg, '-v', 'error', '-y', '-f', 'lavfi', '-i', 'sine=f=440', '-t', '4',
+                    '-c:a', 'aac', '-b:a', '128k', os.path.join(root, 'merge-a.m4a')], check=True)
+
+    # Informações sintéticas no cache, como se viessem do YouTube
+    url = 'https://www.youtube.com/watch?v=MERGETEST01'
+    ytd.metadata_cache.put(ytd.canonical_key(url), {
+        'id': 'MERGETEST01', 'title': 'merge test', 'extractor': 'youtube', 'extractor_key': 'Youtube',
+        'webpage_url': url, 'duration': 4,
+        'formats': [
+            {'format_id': '140', 'url': media_server.url('merge-a.m4a'), 'ext': 'm4a', 'protocol': 'http',
+             'vcodec': 'none', 'acodec': 'mp4a.40.2', 'abr': 128},
+            {'format_id': '134', 'url': media_server.url('merge-v.mp4'), 'ext': 'mp4', 'protocol': 'http',
+             'vcodec': 'avc1.4d401e', 'acodec': 'none', 'height': 360, 'width': 640},
+        ],
+    })
+    segmented = []
+    download = ytd.SegmentedDownloader.download
+
+    def spy(self, url, filename, headers=None):
+        result = download(self, url, filename, headers)
+        if result:
+            segmented.append(os.path.basename(filename))
+        return result
+
+    monkeypatch.setattr(ytd.SegmentedDownloader, 'download', spy)
+    output = tmp_path / 'out'
+    opts = ytd.build_ydl_opts('video', str(output / '%(title)s.%(ext)s'), (), ffmpeg,
+                              quiet=True, no_warnings=True, noprogress=True)
+    ytd.download_with_journal(url, 'video', opts, segments=4)
+    assert sorted(segmented) == ['merge test.f134.mp4', 'merge test.f140.m4a']
+    assert os.listdir(output) == ['merge test.mp4']
@@ -0,0 +1,55 @@
+"""Thumbnails em segundo plano (ThumbnailLoader), sem abrir janelas"""
+
+import os
+
+from PIL import Image
+
+from youtube_downloader_gui import ThumbnailLoader
+
+class FakeWindow:
+    """Só guarda o que seria agendado na thread do Tk"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, delay, callback):
+        self.scheduled.append(callback)
+
+def load(loader, url):
+    loader.load(url, lambda photo: None)
+    loader._executor.shutdown(wait=True)
+
+def test_thumbnail_is_resized_and_cached(media_server, tmp_path):
+    Image.new('RGB', (1280, 720), 'red').save(os.path.join(media_server.root, 'thumb.jpg'))
+    url = media_server.url('thumb.jpg')
+    window = FakeWindow()
+    loader = ThumbnailLoader(window, cache_dir=str(tmp_path))
+    load(loader, url)
+    assert len(window.scheduled) == 1
+    assert loader._memory_get(url).size == (320, 180)
+    assert len(os.listdir(tmp_path)) == 1
+
+    # Outra execução lê do disco, mesmo sem o servidor ter a imagem
+    os.remove(os.path.join(media_server.root, 'thumb.jpg'))
+    loader = ThumbnailLoader(FakeWindow(), cache_dir=str(tmp_path))
+    load(loader, url)
+    assert loader._memory_get(url).size == (320, 180)
+
+def test_memory_cache_is_bounded(media_server, tmp_path):
+    for i in range(3):
+        Image.new('RGB', (64, 64), (i * 80, 0, 0)).save(os.path.join(media_server.root, f'small{i}.jpg'))
+    loader = ThumbnailLoader(FakeWindow(), max_memory=2, cache_dir=str(tmp_path))
+    for i in range(3):
+        loader._fetch(media_server.url(f'small{i}.jpg'), lambda photo: None)
+    assert loader._memory_get(media_server.url('small0.jpg')) is None
+    assert loader._memory_get(media_server.url('small2.jpg')) is not None
+
+def test_failed_download_reports_none(media_server, tmp_path):
+    window = FakeWindow()
+    loader = ThumbnailLoader(window, cache_dir=str(tmp_path))
+    results = []
+    loader.load(media_server.url('missing.jpg'), results.append)
+    loader._executor.shutdown(wait=True)
+    window.scheduled[0]()
+    assert results == [None]
+    assert os.listdir(tmp_path) == []
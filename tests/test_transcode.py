@@ -0,0 +1,58 @@
+"""Conversão de áudio fora dos downloads (TranscodePool)"""
+
+import os
+import subprocess
+
+import youtube_downloader as ytd
+
+def make_tone(ffmpeg, path, codec, seconds=3):
+    subprocess.run([ffmpeg, '-v', 'error', '-y', '-f', 'lavfi', '-i', 'sine=f=440', '-t', str(seconds),
+                    '-c:a', codec, path], check=True)
+    return path
+
+def test_mp3_profile_reencodes_other_codecs(ffmpeg, tmp_path):
+    source = make_tone(ffmpeg, str(tmp_path / 'tone.m4a'), 'aac')
+    files = []
+    pool = ytd.TranscodePool(ffmpeg, max_workers=1)
+    try:
+        target = pool.submit(source, codec='mp3', on_file=lambda *args: files.append(args)).result(60)
+    finally:
+        pool.shutdown()
+    assert target == str(tmp_path / 'tone.mp3')
+    assert os.listdir(tmp_path) == ['tone.mp3']
+    assert files == [(source, target, 'transcode', 'aac')]
+    assert pool.stats()['transcoded'] == 1 and pool.stats()['progress'] == 0.0
+
+def test_best_profile_copies_the_stream(ffmpeg, tmp_path):
+    sources = [make_tone(ffmpeg, str(tmp_path / 'tone.webm'), 'libopus'),
+               make_tone(ffmpeg, str(tmp_path / 'song.mp3'), 'libmp3lame')]
+    pool = ytd.TranscodePool(ffmpeg, max_workers=2)
+    try:
+        targets = [pool.submit(source, codec=codec).result(60)
+                   for source, codec in zip(sources, ('best', 'mp3'))]
+    finally:
+        pool.shutdown()
+    # Opus vai para o contêiner próprio; MP3 já serve para o perfil 'mp3'
+    assert targets == [str(tmp_path / 'tone.opus'), str(tmp_path / 'song.mp3')]
+    assert sorted(os.listdir(tmp_path)) == ['song.mp3', 'tone.opus']
+    assert pool.stats()['copied'] == 2 and pool.stats()['transcoded'] == 0
+
+def test_scheduler_hands_downloads_to_the_pool(media_server, ffmpeg, tmp_path):
+    for i in range(3):
+        make_tone(ffmpeg, os.path.join(media_server.root, f'tone{i}.m4a'), 'aac', seconds=2)
+    output = str(tmp_path / 'out')
+    pool = ytd.TranscodePool(ffmpeg, max_workers=2)
+
+    def build_opts(idx, entry, hook):
+        return ytd.build_ydl_opts('audio', os.path.join(output, f'{idx+1} - %(title)s.%(ext)s'), [hook], ffmpeg,
+                                  quiet=True, no_warnings=True, noprogress=True, postprocessors=[])
+
+    jobs = [(i, {'url': media_server.url(f'tone{i}.m4a')}) for i in range(3)]
+    scheduler = ytd.DownloadScheduler(build_opts, max_workers=2, profile='audio', segments=1,
+                                      postprocess=pool.submit_info)
+    try:
+        assert scheduler.run(jobs) == {0: True, 1: True, 2: True}
+    finally:
+        pool.shutdown()
+    assert sorted(os.listdir(output)) == [f'{i+1} - tone{i}.mp3' for i in range(3)]
+    assert scheduler.aggregate()['done'] == 3
@@ -6,52 +6,2825 @@ Download vídeos do YouTube facilmente
 
 import os
 import sys
+import argparse
+import asyncio
+import atexit
+import copy
+import itertools
+import json
+import shutil
+import sqlite3
+import subprocess
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlparse, parse_qs
 
-try:
-    import yt_dlp
-except ImportError:
-    print("❌ Biblioteca yt-dlp não encontrada!")
-    print("📦 Instalando yt-dlp...")
-    os.system(f"{sys.executable} -m pip install yt-dlp")
-    import yt_dlp
+# Quantidade padrão de vídeos baixados ao mesmo tempo em playlists
+DEFAULT_WORKERS = 3
 
-def download_video(url, output_path="downloads"):
+# Importar o yt-dlp leva ~0,2 s (carrega centenas de extractors); o módulo
+# só o importa na primeira vez que precisa, para a interface abrir antes
+yt_dlp = None
+
+def load_yt_dlp():
+    """Importa o yt-dlp na primeira chamada e devolve o módulo"""
+    global yt_dlp
+    if yt_dlp is None:
+        import yt_dlp as module
+        yt_dlp = module
+    return yt_dlp
+
+def ensure_yt_dlp():
+    """Versão para a linha de comando: instala o yt-dlp se ele não existir"""
+    try:
+        return load_yt_dlp()
+    except ImportError:
+        print("❌ Biblioteca yt-dlp não encontrada!")
+        print("📦 Instalando yt-dlp...")
+        subprocess.run([sys.executable, '-m', 'pip', 'install', 'yt-dlp'])
+        return load_yt_dlp()
+
+class _PoolHooks:
+    """Hooks fixos de uma instância do pool, que repassam para os do uso atual"""
+
+    def __init__(self):
+        self.progress_hooks = []
+        self.postprocessor_hooks = []
+
+    def progress(self, d):
+        for hook in self.progress_hooks:
+            hook(d)
+
+    def postprocessor(self, d):
+        for hook in self.postprocessor_hooks:
+            hook(d)
+
+class YoutubeDLPool:
+    """
+    Mantém instâncias de YoutubeDL já inicializadas, separadas por perfil
+
+    Criar um YoutubeDL carrega os extractors e abre uma nova conexão HTTP.
+    Aqui cada instância fica guardada depois do uso e é reaproveitada pelo
+    próximo pedido com as mesmas opções, mantendo as conexões abertas.
+    O modelo do nome ('outtmpl'), os hooks e o 'logger' mudam a cada uso,
+    então os itens de uma playlist ('1 - ...', '2 - ...') usam as mesmas
+    instâncias: cada uma é criada com hooks fixos (_PoolHooks) que repassam
+    os eventos para os do uso atual, e o modelo é trocado em params.
+
+    Args:
+        idle_timeout: Segundos sem uso até a instância ser fechada
+        max_idle: Máximo de instâncias paradas guardadas por perfil
+        max_idle_total: Máximo de instâncias paradas no total (as usadas
+            há mais tempo são fechadas primeiro)
+    """
+
+    # Opções trocadas a cada checkout (não fazem parte da chave)
+    PER_CALL_OPTIONS = ('outtmpl', 'progress_hooks', 'postprocessor_hooks', 'logger')
+
+    def __init__(self, idle_timeout=300, max_idle=DEFAULT_WORKERS, max_idle_total=DEFAULT_WORKERS * 2):
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+        self.max_idle_total = max_idle_total
+        self._lock = threading.Lock()
+        self._idle = {}
+        self.created = 0
+        self.reused = 0
+
+    def _key(self, profile, ydl_opts):
+        base = {k: v for k, v in ydl_opts.items() if k not in self.PER_CALL_OPTIONS}
+        return (profile, repr(sorted(base.items())))
+
+    def _evict_expired(self, now):
+        """Remove instâncias paradas há muito tempo (chamar com o lock)"""
+        expired = []
+        for key, idle in list(self._idle.items()):
+            keep = [item for item in idle if now - item[2] < self.idle_timeout]
+            expired.extend(ydl for ydl, hooks, last_used in idle if now - last_used >= self.idle_timeout)
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+        return expired
+
+    def _checkout(self, key, ydl_opts):
+        with self._lock:
+            expired = self._evict_expired(time.monotonic())
+            idle = self._idle.get(key)
+            ydl, hooks, _ = idle.pop() if idle else (None, None, None)
+            if ydl is None:
+                self.created += 1
+            else:
+                self.reused += 1
+        for old in expired:
+            old.close()
+        
+        if ydl is None:
+            hooks = _PoolHooks()
+            ydl = load_yt_dlp().YoutubeDL(dict(ydl_opts, progress_hooks=[hooks.progress],
+                                               postprocessor_hooks=[hooks.postprocessor]))
+        
+        # Aplicar o modelo do nome, os hooks e o logger deste uso
+        outtmpl = ydl_opts.get('outtmpl') or load_yt_dlp().utils.DEFAULT_OUTTMPL['default']
+        ydl.params['outtmpl'].update(outtmpl if isinstance(outtmpl, dict) else {'default': outtmpl})
+        hooks.progress_hooks = list(ydl_opts.get('progress_hooks', []))
+        hooks.postprocessor_hooks = list(ydl_opts.get('postprocessor_hooks', []))
+        ydl.params['logger'] = ydl_opts.get('logger')
+        return ydl, hooks
+
+    def _checkin(self, key, ydl, hooks):
+        hooks.progress_hooks = hooks.postprocessor_hooks = []
+        now = time.monotonic()
+        with self._lock:
+            closing = self._evict_expired(now)
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append((ydl, hooks, now))
+            else:
+                closing.append(ydl)
+            # Limite total: fechar as paradas há mais tempo, de qualquer perfil
+            total = sum(len(instances) for instances in self._idle.values())
+            while total > self.max_idle_total:
+                oldest = min(self._idle, key=lambda k: self._idle[k][0][2])
+                closing.append(self._idle[oldest].pop(0)[0])
+                if not self._idle[oldest]:
+                    del self._idle[oldest]
+                total -= 1
+        for old in closing:
+            old.close()
+
+    @contextmanager
+    def session(self, profile, ydl_opts):
+        """
+        Empresta um YoutubeDL do pool (uso exclusivo dentro do 'with')
+        
+        Args:
+            profile: Nome do perfil de opções ('video', 'audio', 'probe')
+            ydl_opts: Opções do yt-dlp para este uso
+        """
+        key = self._key(profile, ydl_opts)
+        ydl, hooks = self._checkout(key, ydl_opts)
+        try:
+            yield ydl
+        except BaseException:
+            # Não devolver ao pool uma instância que falhou no meio do uso
+            ydl.close()
+            raise
+        self._checkin(key, ydl, hooks)
+
+    def close_all(self):
+        """Fecha todas as instâncias paradas"""
+        with self._lock:
+            idle = [item[0] for instances in self._idle.values() for item in instances]
+            self._idle.clear()
+        for ydl in idle:
+            ydl.close()
+
+# Pool compartilhado por todos os downloads do processo
+ydl_pool = YoutubeDLPool()
+atexit.register(ydl_pool.close_all)
+
+# Pasta de dados do aplicativo (cache de metadados etc.); YTD_DATA_DIR troca
+# a pasta, ex.: para o benchmark não usar os dados do usuário
+APP_DATA_DIR = os.environ.get("YTD_DATA_DIR") or os.path.join(os.path.expanduser("~"), ".ytd")
+
+def canonical_key(url, playlist=True):
+    """
+    Chave canônica de um link do YouTube, sem acessar a rede
+    
+    Args:
+        url: Link do vídeo ou playlist
+        playlist: Se links com 'list=' devem ser tratados como playlist
+    
+    Returns:
+        'youtube:video:<id>', 'youtube:playlist:<id>' ou 'url:<link>'
+    """
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith('www.') or host.startswith('m.'):
+        host = host.split('.', 1)[1]
+    query = parse_qs(parsed.query)
+    parts = [part for part in parsed.path.split('/') if part]
+    
+    if host == 'youtu.be' and parts:
+        if playlist and query.get('list'):
+            return f"youtube:playlist:{query['list'][0]}"
+        return f"youtube:video:{parts[0]}"
+    
+    if host in ('youtube.com', 'music.youtube.com'):
+        if playlist and query.get('list'):
+            return f"youtube:playlist:{query['list'][0]}"
+        if query.get('v'):
+            return f"youtube:video:{query['v'][0]}"
+        if len(parts) >= 2 and parts[0] in ('shorts', 'embed', 'live', 'v'):
+            return f"youtube:video:{parts[1]}"
+    
+    return f"url:{url.strip()}"
+
+class SQLiteStore:
+    """
+    Base dos dados persistentes em SQLite (cache, diário, arquivo, playlists)
+    
+    Todos usam o mesmo banco por padrão (~/.ytd/ytd.sqlite3), cada um com as
+    suas tabelas, em modo WAL para que o CLI, a interface e o serviço possam
+    usá-lo ao mesmo tempo. A conexão é aberta no primeiro uso e dividida
+    entre as threads com um lock. Os dados do arquivo antigo de cada
+    classe (LEGACY_FILE) são copiados para o banco na primeira abertura.
+    
+    Args:
+        path: Arquivo do banco (padrão: ~/.ytd/ytd.sqlite3)
+    """
+
+    # Comandos CREATE das tabelas e índices, e as tabelas a copiar do arquivo antigo
+    SCHEMA = ()
+    TABLES = ()
+    LEGACY_FILE = None
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(APP_DATA_DIR, "ytd.sqlite3")
+        self._legacy = os.path.join(APP_DATA_DIR, self.LEGACY_FILE) if path is None and self.LEGACY_FILE else None
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connect(self):
+        """Conexão aberta (chamar com o lock)"""
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+            self._migrate(conn)
+            conn.commit()
+            if self._legacy and os.path.exists(self._legacy):
+                self._import_legacy(conn)
+            self._conn = conn
+        return self._conn
+
+    def _migrate(self, conn):
+        """Ajustes em tabelas criadas por versões anteriores"""
+
+    def _import_legacy(self, conn):
+        """Copia as tabelas do arquivo antigo (um banco por classe) e o apaga"""
+        conn.execute("ATTACH DATABASE ? AS legacy", (self._legacy,))
+        try:
+            for table in self.TABLES:
+                old = {row[1] for row in conn.execute(f"PRAGMA legacy.table_info({table})")}
+                columns = ", ".join(row[1] for row in conn.execute(f"PRAGMA main.table_info({table})") if row[1] in old)
+                if columns:
+                    conn.execute(f"INSERT OR IGNORE INTO main.{table} ({columns}) SELECT {columns} FROM legacy.{table}")
+            conn.commit()
+        finally:
+            conn.execute("DETACH DATABASE legacy")
+        for path in (self._legacy, self._legacy + "-wal", self._legacy + "-shm", self._legacy + "-journal"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _execute(self, query, args=()):
+        """Executa um comando numa transação e devolve as linhas"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                return conn.execute(query, args).fetchall()
+
+class MetadataCache(SQLiteStore):
+    """
+    Cache em disco (SQLite) das informações extraídas pelo yt-dlp
+    
+    Os campos estáveis (título, duração, entradas da playlist...) e os de
+    curta duração (formatos com links assinados) são guardados separados,
+    cada um com seu próprio prazo de validade. Quando passa de max_entries,
+    os itens usados há mais tempo são removidos.
+    
+    Args:
+        path: Arquivo do banco (padrão: ~/.ytd/ytd.sqlite3)
+        stable_ttl: Validade dos campos estáveis, em segundos
+        volatile_ttl: Validade dos formatos/links assinados, em segundos
+        max_entries: Quantidade máxima de itens guardados
+    """
+
+    # Campos que dependem de links assinados e expiram rápido
+    VOLATILE_FIELDS = (
+        'formats', 'requested_formats', 'requested_downloads', 'url', 'manifest_url',
+        'fragments', 'fragment_base_url', 'http_headers', 'format_id', 'protocol',
+    )
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS metadata ("
+        " key TEXT PRIMARY KEY,"
+        " stable TEXT NOT NULL,"
+        " volatile TEXT,"
+        " stable_expires REAL NOT NULL,"
+        " volatile_expires REAL,"
+        " last_access REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS metadata_lru ON metadata (last_access)",
+    )
+    TABLES = ('metadata',)
+    LEGACY_FILE = "metadata.sqlite3"
+
+    def __init__(self, path=None, stable_ttl=24 * 3600, volatile_ttl=30 * 60, max_entries=2000):
+        super().__init__(path)
+        self.stable_ttl = stable_ttl
+        self.volatile_ttl = volatile_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, need_formats=False):
+        """
+        Busca um item no cache
+        
+        Args:
+            key: Chave canônica (ver canonical_key)
+            need_formats: Exigir também os formatos (para baixar)
+        
+        Returns:
+            Dicionário de informações ou None se não houver item válido
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                row = conn.execute(
+                    "SELECT stable, volatile, stable_expires, volatile_expires FROM metadata WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row is None or row[2] < now:
+                    self.misses += 1
+                    return None
+                volatile_fresh = row[1] is not None and row[3] is not None and row[3] >= now
+                if need_formats and not volatile_fresh:
+                    self.misses += 1
+                    return None
+                conn.execute("UPDATE metadata SET last_access = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self.hits += 1
+        except sqlite3.Error:
+            return None
+        
+        info = json.loads(row[0])
+        if volatile_fresh:
+            info.update(json.loads(row[1]))
+        return info
+
+    def put(self, key, info):
+        """
+        Guarda as informações extraídas
+        
+        As entradas de playlist (geradores) são convertidas em lista no
+        próprio dicionário recebido, para que continuem utilizáveis.
+        """
+        if 'entries' in info and not isinstance(info['entries'], list):
+            info['entries'] = list(info['entries'] or [])
+        
+        clean = load_yt_dlp().YoutubeDL.sanitize_info(dict(info))
+        clean = {k: v for k, v in clean.items() if not k.startswith('__')}
+        stable = {k: v for k, v in clean.items() if k not in self.VOLATILE_FIELDS}
+        volatile = {k: v for k, v in clean.items() if k in self.VOLATILE_FIELDS}
+        
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        key,
+                        json.dumps(stable),
+                        json.dumps(volatile) if volatile else None,
+                        now + self.stable_ttl,
+                        now + self.volatile_ttl if volatile else None,
+                        now,
+                    )
+                )
+                self._evict(conn, now)
+                conn.commit()
+        except sqlite3.Error:
+            pass
+
+    def _evict(self, conn, now):
+        """Remove itens vencidos e os menos usados acima do limite"""
+        conn.execute("DELETE FROM metadata WHERE stable_expires < ?", (now,))
+        count = conn.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+        if count > self.max_entries:
+            conn.execute(
+                "DELETE FROM metadata WHERE key IN "
+                "(SELECT key FROM metadata ORDER BY last_access ASC LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def clear(self):
+        """Apaga todo o cache"""
+        self._execute("DELETE FROM metadata")
+
+metadata_cache = MetadataCache()
+
+# Quantas extrações completas (página, player, formatos) foram feitas por URL
+extraction_counts = Counter()
+_extraction_lock = threading.Lock()
+
+def extract_info_once(ydl, url, use_cache=True):
+    """
+    Extrai as informações do link uma única vez, sem resolver os formatos
+    
+    O resultado deve ser entregue a ydl.process_ie_result(info, download=True),
+    que resolve os formatos e baixa sem buscar a página de novo. Se o link
+    já estiver no metadata_cache com formatos válidos, nada é extraído.
+    """
+    key = canonical_key(url, playlist=not ydl.params.get('noplaylist'))
+    if use_cache:
+        info = metadata_cache.get(key, need_formats=True)
+        if info is not None:
+            return info
+    
+    info = ydl.extract_info(url, download=False, process=False)
+    with _extraction_lock:
+        extraction_counts[url] += 1
+    
+    if use_cache:
+        metadata_cache.put(key, info)
+    return info
+
+def entry_url(entry):
+    """Obter o link de uma entrada (flat) de playlist"""
+    return entry.get('url') or f"https://www.youtube.com/watch?v={entry.get('id')}"
+
+def entry_thumbnail(entry, width=320):
+    """
+    Obter a thumbnail de uma entrada (flat) de playlist sem nova extração
+    
+    Usa o campo 'thumbnails' da listagem (a menor que cubra a largura
+    desejada) ou monta o link padrão do YouTube a partir do ID.
+    """
+    if entry.get('thumbnail'):
+        return entry['thumbnail']
+    
+    thumbnails = [t for t in entry.get('thumbnails') or [] if t.get('url')]
+    if thumbnails:
+        sized = [t for t in thumbnails if t.get('width')]
+        if not sized:
+            return thumbnails[-1]['url']
+        wide = [t for t in sized if t['width'] >= width]
+        if wide:
+            return min(wide, key=lambda t: t['width'])['url']
+        return max(sized, key=lambda t: t['width'])['url']
+    
+    if entry.get('id') and entry.get('ie_key') in (None, 'Youtube'):
+        return f"https://i.ytimg.com/vi/{entry['id']}/hqdefault.jpg"
+    return None
+
+class PlaylistEntry:
+    """
+    Entrada de playlist compacta: só o que a lista e os downloads usam
+    
+    A entrada flat do yt-dlp traz dezenas de campos (thumbnails em vários
+    tamanhos, canal, descrição...) que ficariam na memória enquanto a
+    playlist estiver aberta. Aqui ficam só ID, extrator (para o arquivo de
+    downloads), título, duração, índice, link e uma thumbnail. Os detalhes
+    completos são buscados por entrada quando necessário.
+    
+    Lê como o dicionário flat (entry.get('title'), entry['id']), então entry_url,
+    entry_thumbnail e entry_id funcionam com os dois.
+    """
+
+    __slots__ = ('index', 'id', 'ie_key', 'title', 'duration', 'url', 'thumbnail')
+
+    # Campos guardados (e lidos de volta do cache); 'index' é a posição
+    FIELDS = __slots__[1:]
+
+    def __init__(self, index, id=None, ie_key=None, title=None, duration=None, url=None, thumbnail=None):
+        self.index = index
+        self.id = id
+        self.ie_key = ie_key
+        self.title = title
+        self.duration = duration
+        self.url = url
+        self.thumbnail = thumbnail
+
+    @classmethod
+    def from_info(cls, index, entry):
+        """Compactar uma entrada flat (ou uma já compactada, vinda do cache)"""
+        duration = entry.get('duration')
+        return cls(
+            index,
+            id=entry.get('id'),
+            ie_key=entry.get('ie_key'),
+            title=entry.get('title'),
+            duration=int(duration) if duration else None,
+            url=entry.get('url'),
+            thumbnail=entry_thumbnail(entry),
+        )
+
+    def __repr__(self):
+        return f"PlaylistEntry({self.index}, id={self.id!r}, title={self.title!r})"
+
+    def get(self, key, default=None):
+        if key in self.__slots__:
+            value = getattr(self, key)
+            return default if value is None else value
+        return default
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def update(self, details):
+        """Completar com detalhes extraídos depois (campos desconhecidos são ignorados)"""
+        for key in self.FIELDS:
+            if details.get(key) is not None:
+                setattr(self, key, int(details[key]) if key == 'duration' else details[key])
+
+    def to_dict(self):
+        """Campos preenchidos, para o cache da listagem"""
+        return {key: getattr(self, key) for key in self.FIELDS if getattr(self, key) is not None}
+
+# Locais comuns do FFmpeg no Windows
+FFMPEG_PATHS = [
+    os.path.expanduser(r"~\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\ffmpeg-8.0.1-full_build\bin\ffmpeg.exe"),
+    r"C:\ffmpeg\bin\ffmpeg.exe",
+    r"C:\Program Files\ffmpeg\bin\ffmpeg.exe",
+    os.path.expanduser(r"~\scoop\apps\ffmpeg\current\bin\ffmpeg.exe"),
+]
+
+def find_ffmpeg(extra_paths=()):
+    """
+    Tentar encontrar o FFmpeg
+    
+    Args:
+        extra_paths: Caminhos verificados antes dos locais comuns
+            (ex.: o FFmpeg que acompanha o executável)
+    """
+    for path in list(extra_paths) + FFMPEG_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+# Codec de saída de cada perfil de áudio: 'mp3' reconverte (192k) e 'best'
+# mantém o codec original (cópia do fluxo) sempre que o contêiner permitir
+AUDIO_CODECS = {
+    'audio': 'mp3',
+    'audio-original': 'best',
+}
+
+# Codecs copiados sem reconversão e o contêiner de cada um
+COPY_CONTAINERS = {
+    'aac': 'm4a',
+    'alac': 'm4a',
+    'mp3': 'mp3',
+    'opus': 'opus',
+    'vorbis': 'ogg',
+    'flac': 'flac',
+}
+
+def audio_codec_name(acodec):
+    """Nome curto de um codec de áudio ('mp4a.40.2' -> 'aac', 'opus', ...)"""
+    if not acodec or acodec == 'none':
+        return None
+    acodec = acodec.lower().replace(',', ' ').split('.')[0].split()[0]
+    return 'aac' if acodec == 'mp4a' else acodec
+
+# Resolução máxima padrão dos vídeos (None = sem limite)
+DEFAULT_MAX_HEIGHT = 1080
+
+# Bitrate de áudio (kbps) considerado suficiente ao escolher o áudio de um vídeo
+TARGET_AUDIO_ABR = 128
+
+# Família de cada codec de vídeo (para comparar com os codecs preferidos)
+VIDEO_CODEC_FAMILIES = {'avc1': 'avc1', 'avc3': 'avc1', 'h264': 'avc1', 'vp09': 'vp9', 'vp9': 'vp9',
+                        'av01': 'av01', 'hev1': 'hevc', 'hvc1': 'hevc', 'vp8': 'vp8'}
+
+def video_codec_family(vcodec):
+    """'avc1.640028' -> 'avc1', 'vp09.00.40.08' -> 'vp9' (None se desconhecido)"""
+    if not vcodec or vcodec == 'none':
+        return None
+    name = vcodec.split('.')[0].lower()
+    return VIDEO_CODEC_FAMILIES.get(name, name)
+
+def estimate_size(fmt, duration):
+    """Tamanho de um formato: filesize, filesize_approx ou bitrate x duração (None se não der)"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return size
+    if fmt.get('tbr') and duration:
+        return int(fmt['tbr'] * 125 * duration)  # kbps -> bytes
+    return None
+
+class FormatSelector:
+    """
+    Escolhe o formato mais barato (em bytes) que atende à qualidade pedida
+    
+    Usado como 'format' do yt-dlp (que aceita uma função). Os candidatos são
+    os arquivos com vídeo e áudio juntos e, com FFmpeg, cada vídeo sem áudio
+    junto com o áudio mais barato de bitrate >= TARGET_AUDIO_ABR (de
+    preferência do mesmo contêiner, para a junção sair em MP4/WebM) ou com
+    o menor áudio, se só assim couber. Entre os que cabem em max_size, fica
+    a maior resolução até max_height e, nela, o de menos bytes (os codecs
+    preferidos vêm antes, na ordem dada). Os tamanhos são estimados pelos
+    metadados, antes de baixar qualquer coisa.
+    
+    Sem codecs preferidos, só entram H.264 + AAC em MP4 (o arquivo sai em
+    MP4, como o "Baixar MP4" sempre entregou), a não ser que o link não
+    tenha nenhum vídeo assim; VP9, AV1 e WebM precisam ser pedidos em codecs.
+    
+    O formato escolhido leva '_format_plan' (ver format_plan) com o tamanho
+    estimado e quanto ele economiza em relação ao padrão do yt-dlp (o
+    melhor vídeo + o melhor áudio, sem limite de resolução).
+    
+    Args:
+        max_height: Resolução máxima (ex.: 720; None = sem limite)
+        max_size: Tamanho máximo do arquivo em bytes (None = sem limite)
+        codecs: Codecs de vídeo preferidos, em ordem (ex.: ('av01', 'vp9'));
+            os outros continuam valendo, depois deles
+        can_merge: Se o FFmpeg está disponível para juntar vídeo e áudio
+    """
+
+    def __init__(self, max_height=DEFAULT_MAX_HEIGHT, max_size=None, codecs=None, can_merge=True):
+        self.max_height = int(max_height) if max_height else None
+        self.max_size = int(max_size) if max_size else None
+        self.codecs = tuple(video_codec_family(codec) or codec for codec in codecs or ())
+        self.can_merge = can_merge
+
+    def __repr__(self):
+        # Faz parte da chave do YoutubeDLPool: mesma configuração, mesma instância
+        return (f"FormatSelector(max_height={self.max_height!r}, max_size={self.max_size!r}, "
+                f"codecs={self.codecs!r}, can_merge={self.can_merge!r})")
+
+    def with_merge(self, can_merge):
+        return FormatSelector(self.max_height, self.max_size, self.codecs, can_merge)
+
+    def to_dict(self):
+        """Limites em JSON (o inverso de FormatSelector(**dados))"""
+        return {'max_height': self.max_height, 'max_size': self.max_size, 'codecs': list(self.codecs)}
+
+    @staticmethod
+    def _has(fmt, kind):
+        # Codec desconhecido (None) conta como presente, como no yt-dlp
+        return fmt.get(kind) != 'none'
+
+    @staticmethod
+    def _mp4_compatible(fmt):
+        """Se o formato é H.264 e/ou AAC em MP4/M4A (codec desconhecido conta como compatível)"""
+        if fmt.get('ext') not in ('mp4', 'm4a'):
+            return False
+        vcodec, acodec = fmt.get('vcodec'), fmt.get('acodec')
+        if vcodec not in (None, 'none') and video_codec_family(vcodec) != 'avc1':
+            return False
+        return acodec in (None, 'none') or acodec.startswith('mp4a')
+
+    def _audios_for(self, video, audios, duration):
+        """Áudios a testar com um vídeo: o ideal e o menor (para caber no tamanho máximo)"""
+        family = 'webm' if video.get('ext') == 'webm' else 'mp4'
+        
+        def key(audio):
+            same = ('webm' if audio.get('ext') in ('webm', 'weba') else 'mp4') == family
+            enough = (audio.get('abr') or 0) >= TARGET_AUDIO_ABR
+            size = estimate_size(audio, duration)
+            # Mesmo contêiner, bitrate suficiente, menor tamanho; sem bitrate suficiente, o maior
+            return (not same, not enough, size if enough and size else -(audio.get('abr') or 0))
+        preferred = min(audios, key=key)
+        smallest = min(audios, key=lambda audio: (estimate_size(audio, duration) or float('inf'), key(audio)))
+        return [preferred] if smallest is preferred else [preferred, smallest]
+
+    def candidates(self, formats, duration):
+        """Lista de (vídeo, áudio ou None, tamanho estimado) possíveis"""
+        usable = [f for f in formats if not f.get('has_drm') and f.get('protocol') != 'mhtml']
+        if not self.codecs:
+            mp4 = [f for f in usable if self._mp4_compatible(f)]
+            if any(self._has(f, 'vcodec') for f in mp4):
+                usable = mp4
+        videos = [f for f in usable if self._has(f, 'vcodec')]
+        audios = [f for f in usable if self._has(f, 'acodec') and not self._has(f, 'vcodec')]
+        result = []
+        for video in videos:
+            if self._has(video, 'acodec'):
+                result.append((video, None, estimate_size(video, duration)))
+            elif self.can_merge and audios:
+                for audio in self._audios_for(video, audios, duration):
+                    sizes = (estimate_size(video, duration), estimate_size(audio, duration))
+                    result.append((video, audio, sum(sizes) if None not in sizes else None))
+        return result
+
+    def baseline(self, formats, duration):
+        """Tamanho do que o yt-dlp baixaria por padrão ('bv*+ba/b': o melhor vídeo e o melhor áudio)"""
+        videos = [f for f in formats if self._has(f, 'vcodec') and f.get('protocol') != 'mhtml']
+        audios = [f for f in formats if self._has(f, 'acodec') and not self._has(f, 'vcodec')]
+        if not videos:
+            return None
+        # A lista vem ordenada do pior para o melhor formato
+        size = estimate_size(videos[-1], duration)
+        if size is not None and not self._has(videos[-1], 'acodec') and audios:
+            audio_size = estimate_size(audios[-1], duration)
+            size = size + audio_size if audio_size is not None else None
+        return size
+
+    def plan(self, formats, duration):
+        """
+        Escolha para uma lista de formatos (ordenada do pior para o melhor)
+        
+        Returns:
+            (vídeo, áudio ou None, plano) ou None se não houver candidatos
+        """
+        candidates = self.candidates(formats, duration)
+        if not candidates:
+            return None
+        if self.max_height:
+            allowed = [c for c in candidates if (c[0].get('height') or 0) <= self.max_height]
+            if not allowed:
+                # Nada dentro do limite: a menor resolução disponível
+                lowest = min(c[0].get('height') or 0 for c in candidates)
+                allowed = [c for c in candidates if (c[0].get('height') or 0) == lowest]
+            candidates = allowed
+        fits = candidates
+        over_budget = False
+        if self.max_size:
+            fits = [c for c in candidates if c[2] is not None and c[2] <= self.max_size]
+            if not fits:
+                known = [c for c in candidates if c[2] is not None]
+                fits = [min(known, key=lambda c: c[2])] if known else candidates
+                over_budget = bool(known)
+        
+        height = max(c[0].get('height') or 0 for c in fits)
+        tier = [c for c in fits if (c[0].get('height') or 0) == height]
+        
+        def rank(candidate):
+            video, audio, size = candidate
+            family = video_codec_family(video.get('vcodec'))
+            codec_rank = self.codecs.index(family) if family in self.codecs else len(self.codecs)
+            weak_audio = audio is not None and (audio.get('abr') or 0) < TARGET_AUDIO_ABR
+            return (codec_rank, weak_audio, size if size is not None else float('inf'))
+        video, audio, size = min(tier, key=rank)
+        
+        baseline = self.baseline(formats, duration)
+        saved = baseline - size if baseline is not None and size is not None else None
+        plan = {
+            'format_id': video['format_id'] + (f"+{audio['format_id']}" if audio else ''),
+            'height': height or None,
+            'vcodec': video.get('vcodec'),
+            'acodec': (audio or video).get('acodec'),
+            'estimated_bytes': size,
+            'baseline_bytes': baseline,
+            'saved_bytes': max(saved, 0) if saved is not None else None,
+            'over_budget': over_budget,
+        }
+        return video, audio, plan
+
+    def __call__(self, ctx):
+        formats = ctx.get('formats') or []
+        duration = max((f.get('duration') or 0 for f in formats), default=0) or ctx.get('duration')
+        chosen = self.plan(formats, duration)
+        if chosen is None:
+            # Nada reconhecível (ex.: só um link direto): o último é o melhor
+            if formats:
+                yield formats[-1]
+            return
+        video, audio, plan = chosen
+        if audio is None:
+            yield dict(video, _format_plan=plan)
+            return
+        ext = load_yt_dlp().utils.get_compatible_ext(
+            vcodecs=[video.get('vcodec')], acodecs=[audio.get('acodec')],
+            vexts=[video['ext']], aexts=[audio['ext']], preferences=('mp4', 'webm', 'mkv'))
+        yield {
+            'format_id': plan['format_id'],
+            'ext': ext,
+            'requested_formats': [video, audio],
+            'protocol': f"{video.get('protocol')}+{audio.get('protocol')}",
+            'width': video.get('width'),
+            'height': video.get('height'),
+            'fps': video.get('fps'),
+            'vcodec': video.get('vcodec'),
+            'acodec': audio.get('acodec'),
+            'tbr': (video.get('tbr') or 0) + (audio.get('tbr') or 0) or None,
+            'filesize_approx': plan['estimated_bytes'],
+            '_format_plan': plan,
+        }
+
+def format_plan(info):
+    """Plano do FormatSelector de um download já processado (ou None)"""
+    downloads = (info or {}).get('requested_downloads') or [info or {}]
+    return downloads[0].get('_format_plan')
+
+def format_saving(plan):
+    """Texto do formato escolhido ('720p, ~12.0MB, economia estimada de 8.5MB')"""
+    if not plan:
+        return ""
+    parts = [f"{plan['height']}p" if plan['height'] else plan['format_id']]
+    if plan['estimated_bytes']:
+        parts.append(f"~{plan['estimated_bytes'] / 1024 / 1024:.1f}MB")
+    if plan['saved_bytes']:
+        parts.append(f"economia estimada de {plan['saved_bytes'] / 1024 / 1024:.1f}MB")
+    if plan['over_budget']:
+        parts.append("acima do limite de tamanho")
+    return ", ".join(parts)
+
+def build_ydl_opts(profile, outtmpl, progress_hooks=(), ffmpeg_location=None, quality=None, **extra):
+    """
+    Configurações do yt-dlp para um download
+    
+    Args:
+        profile: 'video' (MP4), 'audio' (MP3) ou 'audio-original' (codec original)
+        outtmpl: Modelo do nome do arquivo (com a pasta)
+        progress_hooks: Hooks de progresso
+        ffmpeg_location: Caminho do FFmpeg (opcional)
+        quality: FormatSelector dos vídeos (padrão: até DEFAULT_MAX_HEIGHT)
+        extra: Outras opções do yt-dlp
+    """
+    if profile in AUDIO_CODECS:
+        ydl_opts = {
+            'format': 'bestaudio/best',
+            'postprocessors': [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': AUDIO_CODECS[profile],
+                'preferredquality': '192',
+            }],
+        }
+    else:
+        # Vídeo e áudio separados só podem ser juntados com o FFmpeg
+        can_merge = bool(ffmpeg_location or shutil.which('ffmpeg'))
+        ydl_opts = {
+            'format': (quality or FormatSelector()).with_merge(can_merge),
+            # Deixar o fixup acontecer - ele cria o .temp.mp4 que funciona
+        }
+    ydl_opts['outtmpl'] = outtmpl
+    ydl_opts['progress_hooks'] = list(progress_hooks)
+    ydl_opts['noplaylist'] = True  # Baixar apenas o vídeo, não a playlist inteira
+    if ffmpeg_location:
+        ydl_opts['ffmpeg_location'] = ffmpeg_location
+    ydl_opts.update(extra)
+    return ydl_opts
+
+# Pedaços simultâneos por arquivo no download segmentado (1 = desligado)
+DEFAULT_SEGMENTS = 1
+
+# Tamanho mínimo de cada pedaço; arquivos menores usam menos conexões
+SEGMENT_MIN_SIZE = 1024 * 1024
+
+class SegmentedDownloader:
+    """
+    Baixa um arquivo HTTP em vários pedaços simultâneos (requisições Range)
+    
+    O arquivo temporário (.seg.part) é pré-alocado com o tamanho final e
+    cada pedaço é gravado direto na sua posição. Os pedaços concluídos
+    ficam registrados num arquivo .ytdl ao lado, então uma nova tentativa
+    só baixa os que faltam. No fim, cada pedaço e o tamanho total são
+    conferidos antes do arquivo ser renomeado para o nome final.
+    
+    Args:
+        ydl: YoutubeDL usado nas requisições (mesmo proxy, cookies etc.)
+        segments: Quantidade de pedaços (conexões) simultâneos
+        progress_hooks: Hooks de progresso no formato do yt-dlp
+        retries: Tentativas por pedaço
+        chunk_size: Bytes lidos por vez de cada conexão
+    """
+
+    def __init__(self, ydl, segments=4, progress_hooks=(), retries=3, chunk_size=64 * 1024):
+        self.ydl = ydl
+        self.segments = max(1, int(segments))
+        self.progress_hooks = list(progress_hooks)
+        self.retries = retries
+        self.chunk_size = chunk_size
+        self._lock = threading.Lock()
+        self._downloaded = 0
+        self._hook_error = None
+
+    def _open(self, url, headers, start, end):
+        request = load_yt_dlp().networking.Request(url, headers=dict(headers or {}, Range=f'bytes={start}-{end}'))
+        return self.ydl.urlopen(request)
+
+    def probe(self, url, headers=None):
+        """Tamanho do arquivo, ou None se o servidor não aceitar Range"""
+        with self._open(url, headers, 0, 0) as response:
+            content_range = response.headers.get('Content-Range') or ''
+            if response.status != 206 or '/' not in content_range:
+                return None
+            total = content_range.rsplit('/', 1)[1].strip()
+            return int(total) if total.isdigit() else None
+
+    def _hook(self, status, filename, tmpfilename, total):
+        d = {
+            'status': status,
+            'downloaded_bytes': self._downloaded,
+            'total_bytes': total,
+            'filename': filename,
+            'tmpfilename': tmpfilename,
+        }
+        try:
+            for hook in self.progress_hooks:
+                hook(d)
+        except Exception as e:
+            # Ex.: download cancelado pelo hook; não é falha de rede, não repetir
+            self._hook_error = e
+            raise
+
+    def _fetch(self, url, headers, tmpfilename, start, end, filename, total):
+        """Baixa um pedaço [start, end] para a sua posição no arquivo"""
+        offset = start
+        for attempt in range(self.retries + 1):
+            try:
+                with self._open(url, headers, offset, end) as response, open(tmpfilename, 'r+b') as f:
+                    if response.status != 206:
+                        raise RuntimeError(f"o servidor ignorou o Range (HTTP {response.status})")
+                    f.seek(offset)
+                    while offset <= end:
+                        data = response.read(min(self.chunk_size, end - offset + 1))
+                        if not data:
+                            break
+                        f.write(data)
+                        offset += len(data)
+                        with self._lock:
+                            self._downloaded += len(data)
+                        self._hook('downloading', filename, tmpfilename, total)
+                if offset == end + 1:
+                    return
+                raise RuntimeError(f"pedaço incompleto ({offset - start} de {end - start + 1} bytes)")
+            except Exception as e:
+                if attempt == self.retries or self._hook_error is not None:
+                    raise
+                self.ydl.report_warning(f"{e}. Retrying segment {start}-{end} ({attempt + 1}/{self.retries})...")
+                time.sleep(min(2 ** attempt, 10))
+
+    def download(self, url, filename, headers=None):
+        """
+        Baixa url para filename
+        
+        Returns:
+            True se baixou em pedaços; False se o servidor não aceita Range
+            ou o arquivo é pequeno demais (quem chamou baixa do jeito normal)
+        """
+        total = self.probe(url, headers)
+        segments = min(self.segments, (total or 0) // SEGMENT_MIN_SIZE)
+        if not total or segments < 2:
+            return False
+        
+        tmpfilename = filename + '.seg.part'
+        statefile = filename + '.ytdl'
+        size = -(-total // segments)
+        ranges = [(start, min(start + size, total) - 1) for start in range(0, total, size)]
+        
+        # Retomar de uma tentativa anterior com os mesmos pedaços
+        done = set()
+        if os.path.exists(tmpfilename) and os.path.exists(statefile):
+            try:
+                with open(statefile, encoding='utf-8') as f:
+                    state = json.load(f)
+                if state.get('total') == total and state.get('ranges') == [list(r) for r in ranges]:
+                    done = set(state.get('done', []))
+            except (OSError, ValueError):
+                pass
+        if not done:
+            # Pré-alocar o arquivo com o tamanho final
+            folder = os.path.dirname(tmpfilename)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            with open(tmpfilename, 'wb') as f:
+                f.truncate(total)
+        
+        def save_state():
+            with open(statefile + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'total': total, 'ranges': ranges, 'done': sorted(done)}, f)
+            os.replace(statefile + '.tmp', statefile)
+        
+        save_state()
+        self._downloaded = sum(ranges[i][1] - ranges[i][0] + 1 for i in done)
+        self._hook('downloading', filename, tmpfilename, total)
+        
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            futures = {
+                executor.submit(self._fetch, url, headers, tmpfilename, start, end, filename, total): i
+                for i, (start, end) in enumerate(ranges) if i not in done
+            }
+            error = None
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                with self._lock:
+                    done.add(futures[future])
+                    save_state()
+            if error is not None:
+                raise error
+        
+        # Conferir antes de dar o arquivo como pronto
+        if len(done) != len(ranges) or os.path.getsize(tmpfilename) != total:
+            raise RuntimeError("download segmentado incompleto")
+        os.replace(tmpfilename, filename)
+        os.remove(statefile)
+        self._hook('finished', filename, tmpfilename, total)
+        return True
+
+def segmented_download(ydl, info, segments, progress_hooks=()):
+    """
+    Baixa em pedaços os arquivos do formato que o yt-dlp escolheria para info
+    
+    Vale para cada arquivo HTTP único: o formato com vídeo e áudio juntos
+    ou cada parte (vídeo, áudio) de um formato com junção, gravada com o
+    nome que o yt-dlp daria a ela ('nome.f399.mp4'). Listas de fragmentos
+    (DASH/HLS) ficam com o yt-dlp, que baixa os fragmentos em paralelo com
+    concurrent_fragment_downloads. Depois disso, process_ie_result encontra
+    os arquivos prontos e só faz a junção e o pós-processamento.
+    
+    Args:
+        progress_hooks: Hooks de progresso no formato do yt-dlp
+    
+    Returns:
+        True se algum arquivo foi baixado aqui
+    """
+    selected = ydl.process_ie_result(copy.deepcopy(info), download=False)
+    filename = ydl.prepare_filename(selected)
+    if os.path.exists(filename):
+        return False
+    parts = [(selected, filename)]
+    if selected.get('requested_formats'):
+        # Mesmos nomes que o yt-dlp usa para as partes antes de juntar
+        prepend_extension = load_yt_dlp().utils.prepend_extension
+        base = os.path.splitext(ydl.prepare_filename(selected, 'temp'))[0]
+        parts = [(fmt, prepend_extension(f"{base}.{fmt['ext']}", f"f{fmt['format_id']}", fmt['ext']))
+                 for fmt in selected['requested_formats']]
+    
+    downloaded = False
+    for fmt, path in parts:
+        if fmt.get('protocol') not in ('http', 'https') or os.path.exists(path):
+            continue
+        downloader = SegmentedDownloader(ydl, segments, progress_hooks)
+        downloaded = downloader.download(fmt['url'], path, fmt.get('http_headers')) or downloaded
+    return downloaded
+
+class BandwidthGovernor:
+    """
+    Limite de banda único para todos os downloads do processo (token bucket)
+    
+    Cada job recebe uma fatia do limite total proporcional ao seu peso,
+    dividida só entre os jobs que estão baixando no momento, então um job
+    sozinho usa o limite inteiro e dois jobs de mesmo peso ficam com metade
+    cada. O controle é feito pelos hooks de progresso: a thread que baixou
+    além da sua fatia espera antes de ler o próximo bloco. Isso vale para
+    o yt-dlp (HTTP e fragmentos) e para o download segmentado.
+    
+    Args:
+        rate: Limite total em bytes/s (None ou 0 = sem limite)
+        burst: Segundos de fatia que um job pode acumular parado
+    """
+
+    # Jobs sem baixar nada há mais tempo que isso saem da divisão do limite
+    ACTIVE_WINDOW = 2.0
+
+    def __init__(self, rate=None, burst=0.5):
+        self.rate = rate or None
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def set_rate(self, rate):
+        """Alterar o limite total (vale para os downloads em andamento)"""
+        with self._lock:
+            self.rate = rate or None
+
+    def _job(self, job, now):
+        state = self._jobs.get(job)
+        if state is None:
+            state = self._jobs[job] = {
+                'weight': 1.0, 'tokens': 0.0, 'updated': now, 'seen': now,
+                'window_start': now, 'window_bytes': 0, 'actual': 0.0,
+            }
+        return state
+
+    def register(self, job, weight=1.0):
+        """Registrar um job com seu peso (prioridade)"""
+        with self._lock:
+            self._job(job, time.monotonic())['weight'] = max(float(weight), 0.01)
+
+    def release(self, job):
+        """Tirar um job concluído da divisão do limite"""
+        with self._lock:
+            self._jobs.pop(job, None)
+
+    def _share(self, state, now):
+        weights = sum(other['weight'] for other in self._jobs.values()
+                      if now - other['seen'] <= self.ACTIVE_WINDOW)
+        return self.rate * state['weight'] / max(weights, state['weight'])
+
+    def consume(self, job, nbytes):
+        """Descontar bytes baixados por um job (espera se passou da fatia)"""
+        if nbytes <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            state = self._job(job, now)
+            state['seen'] = now
+            state['window_bytes'] += nbytes
+            if now - state['window_start'] >= 1.0:
+                state['actual'] = state['window_bytes'] / (now - state['window_start'])
+                state['window_start'] = now
+                state['window_bytes'] = 0
+            if not self.rate:
+                return
+            share = self._share(state, now)
+            state['tokens'] = min(state['tokens'] + (now - state['updated']) * share, share * self.burst)
+            state['updated'] = now
+            state['tokens'] -= nbytes
+            wait = -state['tokens'] / share if state['tokens'] < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+    def hook(self, job, weight=1.0):
+        """Hook de progresso que desconta do limite os bytes de cada bloco"""
+        self.register(job, weight)
+        last = {}
+        
+        def hook(d):
+            if d['status'] != 'downloading' or d.get('downloaded_bytes') is None:
+                return
+            name = d.get('tmpfilename') or d.get('filename')
+            with self._lock:
+                previous = last.get(name)
+                last[name] = d['downloaded_bytes']
+            # O primeiro evento de um arquivo pode incluir bytes já baixados antes
+            if previous is not None:
+                self.consume(job, d['downloaded_bytes'] - previous)
+        return hook
+
+    def stats(self):
+        """Limite total, velocidade real e fatia de cada job ativo"""
+        with self._lock:
+            now = time.monotonic()
+            jobs = {}
+            for job, state in self._jobs.items():
+                if now - state['seen'] > self.ACTIVE_WINDOW:
+                    continue
+                jobs[job] = {
+                    'weight': state['weight'],
+                    'allowed': self._share(state, now) if self.rate else None,
+                    'actual': state['actual'],
+                }
+            return {
+                'rate': self.rate,
+                'actual': sum(job['actual'] for job in jobs.values()),
+                'jobs': jobs,
+            }
+
+bandwidth_governor = BandwidthGovernor()
+
+def parse_rate(text):
+    """Converte '5M', '500K' ou '0' (sem limite) em bytes/s"""
+    if text in (None, '', '0'):
+        return None
+    rate = load_yt_dlp().utils.parse_bytes(str(text))
+    if rate is None:
+        raise ValueError(f"Limite de banda inválido: {text}")
+    return rate
+
+def parse_size(text):
+    """Converte '200M', '1.5G' ou '0' (sem limite) em bytes"""
+    if text in (None, '', '0'):
+        return None
+    size = load_yt_dlp().utils.parse_bytes(str(text))
+    if size is None:
+        raise ValueError(f"Tamanho inválido: {text}")
+    return size
+
+class DownloadJournal(SQLiteStore):
+    """
+    Diário persistente dos downloads (SQLite), para retomar após falhas
+    
+    Cada job (link + perfil + modelo de nome) tem um estado ('running',
+    'interrupted', 'failed' ou 'done'), o arquivo final e um manifesto com
+    os seus arquivos temporários: .part e .ytdl dos downloads, os formatos
+    baixados separados para a junção e as saídas .temp.* do
+    pós-processamento. Depois de um fechamento inesperado, os jobs
+    concluídos são pulados e os interrompidos voltam a rodar com o mesmo
+    nome de arquivo, e o yt-dlp continua o .part com requisições HTTP Range.
+    Falhas sem nada baixado (ex.: link que não existe) ficam como 'failed'
+    e não são oferecidas para retomar.
+    
+    A limpeza usa só o manifesto de cada job (nunca varre a pasta), então
+    jobs simultâneos na mesma pasta não mexem nos arquivos uns dos outros:
+    ao concluir, um .temp.* que sobrou vira o arquivo final (os.replace,
+    atômico) e o resto é apagado; ao falhar, só as saídas .temp.* (que não
+    servem para retomar) são apagadas.
+    
+    Args:
+        path: Arquivo do banco (padrão: ~/.ytd/ytd.sqlite3)
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS jobs ("
+        " job_id TEXT PRIMARY KEY,"
+        " url TEXT NOT NULL,"
+        " profile TEXT NOT NULL,"
+        " outtmpl TEXT NOT NULL,"
+        " state TEXT NOT NULL,"
+        " part_files TEXT NOT NULL DEFAULT '[]',"
+        " final_file TEXT,"
+        " error TEXT,"
+        " options TEXT,"
+        " updated REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)",
+    )
+    TABLES = ('jobs',)
+    LEGACY_FILE = "journal.sqlite3"
+
+    def _migrate(self, conn):
+        # Diários de versões anteriores não têm as opções do job
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        if 'options' not in columns:
+            conn.execute("ALTER TABLE jobs ADD COLUMN options TEXT")
+
+    @staticmethod
+    def job_id(url, profile, outtmpl):
+        """Identificador estável de um job"""
+        return f"{profile}|{outtmpl}|{canonical_key(url, playlist=False)}"
+
+    def start(self, url, profile, outtmpl, options=None):
+        """
+        Registrar (ou reabrir) um job como em andamento
+        
+        Args:
+            options: Opções do job para retomar igual (JSON: 'quality', 'segments')
+        """
+        job_id = self.job_id(url, profile, outtmpl)
+        self._execute(
+            "INSERT INTO jobs (job_id, url, profile, outtmpl, state, options, updated) "
+            "VALUES (?, ?, ?, ?, 'running', ?, ?) "
+            "ON CONFLICT(job_id) DO UPDATE SET state = 'running', error = NULL, options = excluded.options, "
+            "updated = excluded.updated",
+            (job_id, url, profile, outtmpl, json.dumps(options or {}), time.time())
+        )
+        return job_id
+
+    def is_done(self, job_id):
+        """Se o job já foi concluído (e o arquivo final ainda existe)"""
+        rows = self._execute("SELECT state, final_file FROM jobs WHERE job_id = ?", (job_id,))
+        if not rows or rows[0][0] != 'done':
+            return False
+        final_file = rows[0][1]
+        return not final_file or os.path.exists(final_file)
+
+    def add_part(self, job_id, path):
+        """Registrar um arquivo parcial do job"""
+        with self._lock:
+            conn = self._connect()
+            with conn:
+                row = conn.execute("SELECT part_files FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+                if row is None:
+                    return
+                part_files = json.loads(row[0])
+                if path not in part_files:
+                    part_files.append(path)
+                    conn.execute(
+                        "UPDATE jobs SET part_files = ?, updated = ? WHERE job_id = ?",
+                        (json.dumps(part_files), time.time(), job_id)
+                    )
+
+    def _parts(self, job_id):
+        rows = self._execute("SELECT part_files FROM jobs WHERE job_id = ?", (job_id,))
+        return json.loads(rows[0][0]) if rows else []
+
+    def _set_parts(self, job_id, part_files):
+        self._execute("UPDATE jobs SET part_files = ?, updated = ? WHERE job_id = ?",
+                      (json.dumps(part_files), time.time(), job_id))
+
+    @staticmethod
+    def _is_temp_output(path):
+        # Saída do pós-processamento do yt-dlp ou do TranscodePool ('nome.temp.mp4')
+        return os.path.splitext(os.path.splitext(path)[0])[1] == '.temp'
+
+    @staticmethod
+    def _remove(paths):
+        """Apaga os arquivos que existirem; devolve os que não puderam ser apagados"""
+        leftovers = []
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                leftovers.append(path)
+        return leftovers
+
+    def _finalize(self, part_files, final_file):
+        """
+        Promove as saídas .temp.* que sobraram e apaga o resto do manifesto
+        
+        Returns:
+            (arquivos promovidos, arquivos que não puderam ser tratados)
+        """
+        promoted = []
+        leftovers = []
+        final_file = os.path.abspath(final_file) if final_file else None
+        for path in part_files:
+            if path == final_file or not os.path.exists(path):
+                continue
+            if self._is_temp_output(path):
+                # 'nome.temp.mp4' -> 'nome.mp4', substituindo um arquivo final quebrado
+                target = os.path.splitext(os.path.splitext(path)[0])[0] + os.path.splitext(path)[1]
+                try:
+                    os.replace(path, target)
+                    promoted.append(target)
+                except OSError:
+                    leftovers.append(path)
+            else:
+                leftovers.extend(self._remove([path]))
+        return promoted, leftovers
+
+    def hook(self, job_id):
+        """Hook de progresso que registra os arquivos parciais do job"""
+        seen = set()
+        
+        def hook(d):
+            if d['status'] != 'downloading':
+                return
+            for path in (d.get('tmpfilename'), d.get('filename') and d['filename'] + '.ytdl'):
+                if path and path not in seen:
+                    seen.add(path)
+                    self.add_part(job_id, os.path.abspath(path))
+        return hook
+
+    def postprocessor_hook(self, job_id):
+        """Hook de pós-processamento que registra a saída .temp.* e os formatos a juntar"""
+        prepend_extension = load_yt_dlp().utils.prepend_extension
+        
+        def hook(d):
+            info = d.get('info_dict') or {}
+            if d['status'] != 'started' or not info.get('filepath'):
+                return
+            paths = [prepend_extension(info['filepath'], 'temp')]
+            if d.get('postprocessor') == 'Merger':
+                paths += [fmt['filepath'] for fmt in info.get('requested_formats') or [] if fmt.get('filepath')]
+            for path in paths:
+                self.add_part(job_id, os.path.abspath(path))
+        return hook
+
+    def finish(self, job_id, final_file=None):
+        """
+        Marcar o job como concluído e finalizar os arquivos do manifesto
+        
+        O que não puder ser promovido ou apagado agora (ex.: arquivo aberto
+        em outro programa no Windows) fica no manifesto para cleanup().
+        
+        Returns:
+            Arquivos .temp.* promovidos a arquivo final
+        """
+        promoted, leftovers = self._finalize(self._parts(job_id), final_file)
+        self._execute(
+            "UPDATE jobs SET state = 'done', part_files = ?, final_file = ?, error = NULL, updated = ? "
+            "WHERE job_id = ?",
+            (json.dumps(leftovers), final_file, time.time(), job_id)
+        )
+        return promoted
+
+    def fail(self, job_id, error):
+        """
+        Marcar o job como interrompido ou, sem arquivo parcial para continuar,
+        como falho (as saídas .temp.* são apagadas nos dois casos)
+        """
+        part_files = self._parts(job_id)
+        temp = [path for path in part_files if self._is_temp_output(path)]
+        leftovers = self._remove(temp)
+        part_files = [path for path in part_files if path not in temp or path in leftovers]
+        state = 'interrupted' if self._resumable(part_files) else 'failed'
+        self._execute(
+            "UPDATE jobs SET state = ?, error = ?, part_files = ?, updated = ? WHERE job_id = ?",
+            (state, error, json.dumps(part_files), time.time(), job_id)
+        )
+
+    def _resumable(self, part_files):
+        # Só vale retomar com algum arquivo parcial ainda no disco
+        return any(not self._is_temp_output(path) and os.path.exists(path) for path in part_files)
+
+    def discard(self, job_id):
+        """Esquecer um job e apagar os seus arquivos temporários"""
+        self._remove(self._parts(job_id))
+        self._execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+
+    def cleanup(self, output_path=None):
+        """
+        Tenta de novo finalizar os jobs concluídos que ficaram com temporários
+        
+        Args:
+            output_path: Só os jobs desta pasta (padrão: todos)
+        
+        Returns:
+            Arquivos .temp.* promovidos a arquivo final
+        """
+        rows = self._execute("SELECT job_id, outtmpl, part_files, final_file FROM jobs "
+                             "WHERE state = 'done' AND part_files != '[]'")
+        folder = os.path.abspath(output_path) if output_path else None
+        promoted = []
+        for job_id, outtmpl, part_files, final_file in rows:
+            if folder and os.path.dirname(os.path.abspath(outtmpl)) != folder:
+                continue
+            done, leftovers = self._finalize(json.loads(part_files), final_file)
+            promoted += done
+            self._set_parts(job_id, leftovers)
+        return promoted
+
+    def interrupted(self):
+        """Jobs que não terminaram e têm arquivos parciais ('running' aqui significa que o app caiu)"""
+        rows = self._execute(
+            "SELECT job_id, url, profile, outtmpl, error, options, part_files FROM jobs "
+            "WHERE state IN ('running', 'interrupted') ORDER BY updated"
+        )
+        return [dict(zip(('job_id', 'url', 'profile', 'outtmpl', 'error'), row[:5]), options=json.loads(row[5] or '{}'))
+                for row in rows if self._resumable(json.loads(row[6]))]
+
+    def protected_files(self):
+        """Arquivos parciais de jobs retomáveis (não devem ser apagados)"""
+        rows = self._execute("SELECT part_files FROM jobs WHERE state IN ('running', 'interrupted')")
+        return {path for row in rows for path in json.loads(row[0])}
+
+download_journal = DownloadJournal()
+
+class DownloadArchive(SQLiteStore):
+    """
+    Índice persistente (SQLite) do que já foi baixado
+    
+    Cada registro é (extrator, id do vídeo, perfil, pasta), com o arquivo
+    final. A consulta usa a chave primária, então continua rápida com
+    centenas de milhares de vídeos, e é feita antes de qualquer extração
+    quando o id já é conhecido (link do YouTube ou entrada de playlist).
+    
+    Args:
+        path: Arquivo do banco (padrão: ~/.ytd/ytd.sqlite3)
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS archive ("
+        " extractor TEXT NOT NULL,"
+        " video_id TEXT NOT NULL,"
+        " profile TEXT NOT NULL,"
+        " output_path TEXT NOT NULL,"
+        " filepath TEXT,"
+        " downloaded REAL NOT NULL,"
+        " PRIMARY KEY (extractor, video_id, profile, output_path))",
+    )
+    TABLES = ('archive',)
+    LEGACY_FILE = "archive.sqlite3"
+
+    @staticmethod
+    def key_for(url, entry=None):
+        """
+        (extrator, id) de um link sem acessar a rede, ou None se não der para saber
+        
+        Args:
+            url: Link do vídeo
+            entry: Entrada da playlist (listagem plana), se houver
+        """
+        if entry and entry.get('id') and entry.get('ie_key'):
+            return entry['ie_key'].lower(), str(entry['id'])
+        key = canonical_key(url, playlist=False)
+        if key.startswith('youtube:video:'):
+            return 'youtube', key[len('youtube:video:'):]
+        return None
+
+    @staticmethod
+    def key_from_info(info):
+        """(extrator, id) das informações extraídas de um vídeo"""
+        if info.get('_type', 'video') != 'video' or not info.get('id'):
+            return None
+        extractor = info.get('extractor_key') or info.get('ie_key') or info.get('extractor') or 'generic'
+        return extractor.lower(), str(info['id'])
+
+    def contains(self, key, profile, output_path):
+        """Se o vídeo já foi baixado nesse perfil e pasta (e o arquivo ainda existe)"""
+        if key is None:
+            return False
+        rows = self._execute(
+            "SELECT filepath FROM archive WHERE extractor = ? AND video_id = ? AND profile = ? AND output_path = ?",
+            (key[0], key[1], profile, os.path.abspath(output_path))
+        )
+        if not rows:
+            return False
+        return not rows[0][0] or os.path.exists(rows[0][0])
+
+    def add(self, key, profile, output_path, filepath=None):
+        """Registrar um download concluído (uma transação só)"""
+        if key is None:
+            return
+        self._execute(
+            "INSERT OR REPLACE INTO archive (extractor, video_id, profile, output_path, filepath, downloaded) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key[0], key[1], profile, os.path.abspath(output_path),
+             filepath and os.path.abspath(filepath), time.time())
+        )
+
+    def remove(self, key, profile, output_path):
+        """Esquecer um download (para baixar de novo)"""
+        if key is None:
+            return
+        self._execute(
+            "DELETE FROM archive WHERE extractor = ? AND video_id = ? AND profile = ? AND output_path = ?",
+            (key[0], key[1], profile, os.path.abspath(output_path))
+        )
+
+    def __len__(self):
+        return self._execute("SELECT COUNT(*) FROM archive")[0][0]
+
+download_archive = DownloadArchive()
+
+class PlaylistSnapshots(SQLiteStore):
+    """
+    Última listagem conhecida de cada playlist sincronizada (SQLite)
+    
+    Guarda os ids das entradas, na ordem da listagem, por playlist, perfil
+    e pasta, para que a próxima sincronização (ver PlaylistSync) baixe só
+    o que apareceu desde então.
+    
+    Args:
+        path: Arquivo do banco (padrão: ~/.ytd/ytd.sqlite3)
+    """
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS snapshots ("
+        " playlist TEXT NOT NULL,"
+        " profile TEXT NOT NULL,"
+        " output_path TEXT NOT NULL,"
+        " entry_ids TEXT NOT NULL,"
+        " updated REAL NOT NULL,"
+        " PRIMARY KEY (playlist, profile, output_path))",
+    )
+    TABLES = ('snapshots',)
+    LEGACY_FILE = "playlists.sqlite3"
+
+    def get(self, playlist, profile, output_path):
+        """Ids da última sincronização, na ordem da listagem (None se nunca sincronizou)"""
+        rows = self._execute(
+            "SELECT entry_ids FROM snapshots WHERE playlist = ? AND profile = ? AND output_path = ?",
+            (playlist, profile, os.path.abspath(output_path))
+        )
+        return json.loads(rows[0][0]) if rows else None
+
+    def save(self, playlist, profile, output_path, entry_ids):
+        self._execute(
+            "INSERT OR REPLACE INTO snapshots (playlist, profile, output_path, entry_ids, updated) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (playlist, profile, os.path.abspath(output_path), json.dumps(entry_ids), time.time())
+        )
+
+    def remove(self, playlist, profile, output_path):
+        """Esquecer a playlist (a próxima sincronização lista tudo de novo)"""
+        self._execute(
+            "DELETE FROM snapshots WHERE playlist = ? AND profile = ? AND output_path = ?",
+            (playlist, profile, os.path.abspath(output_path))
+        )
+
+playlist_snapshots = PlaylistSnapshots()
+
+# Fases de um job nas métricas
+METRIC_PHASES = ('extract', 'download', 'merge', 'postprocess')
+
+# Limites dos histogramas do Prometheus
+PHASE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+THROUGHPUT_BUCKETS = tuple(mb * 1024 * 1024 for mb in (0.1, 0.5, 1, 2, 5, 10, 20, 50, 100))
+
+def error_type(error):
+    """Nome do tipo do erro; para DownloadError do yt-dlp, o da causa original"""
+    cause = getattr(error, 'exc_info', None)
+    if cause and cause[1] is not None:
+        error = cause[1]
+    return type(error).__name__
+
+class JobMetrics:
+    """
+    Métricas de um job: duração de cada fase, bytes, vazão e novas tentativas
+    
+    Alimentada pelos hooks do próprio yt-dlp: progress_hook mede o download
+    (de cada arquivo, do primeiro evento ao 'finished'), postprocessor_hook
+    mede a junção (Merger e Fixup*) e o resto do pós-processamento, e
+    MetricsLogger conta as novas tentativas que o yt-dlp informa. A extração
+    e a conversão fora do yt-dlp são medidas por quem chama (phase()).
+    
+    Os bytes são os recebidos pelos hooks; num download retomado, a parte
+    que já existia também conta.
+    """
+
+    def __init__(self, url, profile):
+        self.url = url
+        self.profile = profile
+        self.started = time.time()
+        self.phases = {}
+        self.bytes = 0
+        self.peak_bps = 0.0
+        self.retries = 0
+        self.format = None  # Plano do FormatSelector (ver format_plan)
+        self._clock = time.monotonic()
+        self._lock = threading.Lock()
+        self._files = {}  # Arquivo -> (bytes baixados, início do download)
+        self._window = (self._clock, 0)
+        self._pp_started = {}
+
+    def add_phase(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, phase):
+        """Mede o bloco como parte da fase (as durações se somam)"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_phase(phase, time.monotonic() - started)
+
+    def progress_hook(self, d):
+        if d['status'] not in ('downloading', 'finished'):
+            return
+        now = time.monotonic()
+        name = d.get('filename')
+        downloaded = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+        with self._lock:
+            if d['status'] == 'finished' and name not in self._files:
+                # Arquivo que já existia ("already downloaded"): nada foi baixado
+                self._files[name] = (downloaded, None)
+                return
+            previous, started = self._files.get(name, (0, now))
+            # Com download segmentado, eventos de threads diferentes podem chegar fora de ordem
+            downloaded = max(downloaded, previous)
+            self.bytes += downloaded - previous
+            window_start, window_bytes = self._window
+            window_bytes += downloaded - previous
+            if now - window_start >= 1.0:
+                self.peak_bps = max(self.peak_bps, window_bytes / (now - window_start))
+                window_start, window_bytes = now, 0
+            self._window = (window_start, window_bytes)
+            if d['status'] == 'finished':
+                self._files[name] = (downloaded, None)
+                if started is not None:
+                    self.phases['download'] = self.phases.get('download', 0.0) + now - started
+            else:
+                self._files[name] = (downloaded, started)
+
+    def postprocessor_hook(self, d):
+        name = d.get('postprocessor') or ''
+        if d['status'] == 'started':
+            self._pp_started[name] = time.monotonic()
+        elif d['status'] == 'finished' and name in self._pp_started:
+            phase = 'merge' if name == 'Merger' or name.startswith('Fixup') else 'postprocess'
+            self.add_phase(phase, time.monotonic() - self._pp_started.pop(name))
+
+    def count_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def to_dict(self, status, error=None):
+        elapsed = time.monotonic() - self._clock
+        download = self.phases.get('download')
+        average = self.bytes / download if download else None
+        return {
+            'url': self.url,
+            'profile': self.profile,
+            'status': status,
+            'error': str(error) if error is not None else None,
+            'error_type': error_type(error) if error is not None else None,
+            'started': round(self.started, 3),
+            'elapsed': round(elapsed, 3),
+            'phases': {phase: round(seconds, 3) for phase, seconds in self.phases.items()},
+            'bytes': self.bytes,
+            'average_bps': round(average) if average else None,
+            # Downloads de menos de 1 s não fecham uma janela: vale a média
+            'peak_bps': round(max(self.peak_bps, average or 0)) or None,
+            'retries': self.retries,
+            'format': self.format,
+        }
+
+class MetricsLogger:
+    """
+    Logger do yt-dlp que conta as novas tentativas ("Retrying (1/10)...")
+    
+    Só é usado com 'quiet', então as mensagens comuns já não apareceriam;
+    avisos e erros continuam indo para o stderr como o yt-dlp faria.
+    """
+
+    def __init__(self, metrics, warnings=True):
+        self.metrics = metrics
+        self.warnings = warnings
+
+    def _count(self, message):
+        if 'Retrying' in message:
+            self.metrics.count_retry()
+
+    def debug(self, message):
+        self._count(message)
+
+    def info(self, message):
+        self._count(message)
+
+    def warning(self, message):
+        self._count(message)
+        if self.warnings:
+            print(f"WARNING: {message}", file=sys.stderr)
+
+    def error(self, message):
+        print(message, file=sys.stderr)
+
+class MetricsRegistry:
+    """
+    Métricas agregadas de todos os jobs do processo
+    
+    Cada job concluído vira uma linha de JSON em path (para analisar
+    milhares de jobs depois) e entra nos contadores e histogramas exportados
+    no formato de texto do Prometheus (prometheus_text, servido em /metrics
+    pelo serviço local).
+    
+    Args:
+        path: Arquivo JSON-lines (padrão: ~/.ytd/metrics.jsonl; None desliga)
+        max_bytes: Tamanho em que o arquivo é rodado para path + '.1'
+    """
+
+    def __init__(self, path=None, max_bytes=10 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.active = 0
+        self.jobs = Counter()  # (perfil, status) -> jobs
+        self.errors = Counter()  # tipo -> erros
+        self.bytes = Counter()  # perfil -> bytes
+        self.retries = Counter()  # perfil -> novas tentativas
+        self.phases = {phase: [0] * (len(PHASE_BUCKETS) + 1) + [0.0] for phase in METRIC_PHASES}
+        self.throughput = [0] * (len(THROUGHPUT_BUCKETS) + 1) + [0.0]
+
+    def job(self, url, profile):
+        """Começa a medir um job"""
+        with self._lock:
+            self.active += 1
+        return JobMetrics(url, profile)
+
+    @staticmethod
+    def _observe(histogram, buckets, value):
+        # Contagem por faixa (não acumulada), total de observações na penúltima
+        # posição e soma dos valores na última
+        for i, limit in enumerate(buckets):
+            if value <= limit:
+                histogram[i] += 1
+                break
+        histogram[-2] += 1
+        histogram[-1] += value
+
+    def finish(self, metrics, status, error=None):
+        """Registra o fim de um job ('done', 'skipped' ou 'error')"""
+        record = metrics.to_dict(status, error)
+        with self._lock:
+            self.active -= 1
+            self.jobs[metrics.profile, status] += 1
+            self.bytes[metrics.profile] += record['bytes']
+            self.retries[metrics.profile] += record['retries']
+            if record['error_type']:
+                self.errors[record['error_type']] += 1
+            for phase, seconds in record['phases'].items():
+                self._observe(self.phases.setdefault(phase, [0] * (len(PHASE_BUCKETS) + 1) + [0.0]),
+                              PHASE_BUCKETS, seconds)
+            if record['average_bps']:
+                self._observe(self.throughput, THROUGHPUT_BUCKETS, record['average_bps'])
+            if self.path:
+                self._write(record)
+        return record
+
+    def _write(self, record):
+        try:
+            folder = os.path.dirname(self.path)
+            if folder and not os.path.exists(folder):
+                os.makedirs(folder)
+            if os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                os.replace(self.path, self.path + '.1')
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError:
+            pass
+
+    @staticmethod
+    def _labels(**labels):
+        text = ",".join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"')
+                                          .replace('\n', '\\n')) for key, value in labels.items())
+        return "{" + text + "}" if text else ""
+
+    def _histogram(self, lines, name, histogram, buckets, **labels):
+        cumulative = 0
+        for limit, count in zip(buckets, histogram):
+            cumulative += count
+            lines.append(f"{name}_bucket{self._labels(**labels, le=limit)} {cumulative}")
+        lines.append(f"{name}_bucket{self._labels(**labels, le='+Inf')} {histogram[-2]}")
+        lines.append(f"{name}_sum{self._labels(**labels)} {histogram[-1]}")
+        lines.append(f"{name}_count{self._labels(**labels)} {histogram[-2]}")
+
+    def prometheus_text(self):
+        """Contadores e histogramas no formato de texto do Prometheus"""
+        with self._lock:
+            lines = [
+                "# HELP ytd_jobs_active Jobs em andamento",
+                "# TYPE ytd_jobs_active gauge",
+                f"ytd_jobs_active {self.active}",
+                "# HELP ytd_jobs_total Jobs concluídos por perfil e resultado",
+                "# TYPE ytd_jobs_total counter",
+            ]
+            lines += [f"ytd_jobs_total{self._labels(profile=profile, status=status)} {count}"
+                      for (profile, status), count in sorted(self.jobs.items())]
+            lines += ["# HELP ytd_downloaded_bytes_total Bytes baixados", "# TYPE ytd_downloaded_bytes_total counter"]
+            lines += [f"ytd_downloaded_bytes_total{self._labels(profile=profile)} {count}"
+                      for profile, count in sorted(self.bytes.items())]
+            lines += ["# HELP ytd_retries_total Novas tentativas informadas pelo yt-dlp",
+                      "# TYPE ytd_retries_total counter"]
+            lines += [f"ytd_retries_total{self._labels(profile=profile)} {count}"
+                      for profile, count in sorted(self.retries.items())]
+            lines += ["# HELP ytd_errors_total Jobs com erro, por tipo", "# TYPE ytd_errors_total counter"]
+            lines += [f"ytd_errors_total{self._labels(type=name)} {count}"
+                      for name, count in sorted(self.errors.items())]
+            lines += ["# HELP ytd_phase_seconds Duração de cada fase dos jobs",
+                      "# TYPE ytd_phase_seconds histogram"]
+            for phase, histogram in self.phases.items():
+                self._histogram(lines, "ytd_phase_seconds", histogram, PHASE_BUCKETS, phase=phase)
+            lines += ["# HELP ytd_download_bytes_per_second Vazão média do download de cada job",
+                      "# TYPE ytd_download_bytes_per_second histogram"]
+            self._histogram(lines, "ytd_download_bytes_per_second", self.throughput, THROUGHPUT_BUCKETS)
+        return "\n".join(lines) + "\n"
+
+job_metrics = MetricsRegistry(os.path.join(APP_DATA_DIR, "metrics.jsonl"))
+
+def final_filename(info):
+    """Arquivo final de um download já processado pelo yt-dlp"""
+    downloads = (info or {}).get('requested_downloads') or [{}]
+    return downloads[0].get('filepath') or downloads[0].get('filename')
+
+def download_with_journal(url, profile, ydl_opts, on_info=None, skip_done=False, journal=None,
+                          entry=None, archive=None, postprocess=None, segments=DEFAULT_SEGMENTS,
+                          priority=1.0, metrics=None, slots=None):
+    """
+    Baixa um link (uma extração só) registrando o job no diário
+    
+    Args:
+        url: Link do vídeo
+        profile: Perfil do pool de YoutubeDL ('video' ou 'audio')
+        ydl_opts: Opções do yt-dlp (precisa de 'outtmpl')
+        on_info: Callback (info) chamado antes de baixar
+        skip_done: Não baixar de novo se o job já estiver concluído ou se o
+            vídeo já estiver no arquivo de downloads (mesmo perfil e pasta)
+        journal: Diário a usar (padrão: download_journal)
+        entry: Entrada da playlist (permite consultar o arquivo sem extrair)
+        archive: Arquivo de downloads a usar (padrão: download_archive)
+        postprocess: Função (info) -> Future com o arquivo final, para
+            converter fora da thread de download (ex.: TranscodePool.submit_info)
+        segments: Conexões simultâneas por arquivo (download segmentado)
+        priority: Peso do job na divisão do limite de banda
+        metrics: Registro das métricas do job (padrão: job_metrics)
+        slots: Semáforo dividido com outros downloads (ex.: todo o modo em
+            lote); a vaga fica ocupada da extração ao fim do download
+    
+    Returns:
+        Informações processadas, ou None se o job foi pulado. Com
+        postprocess, um Future que termina com as informações quando a
+        conversão acabar (o job só é concluído no diário nesse momento).
+    """
+    journal = journal or download_journal
+    archive = archive or download_archive
+    metrics = metrics or job_metrics
+    output_path = os.path.dirname(os.path.abspath(ydl_opts['outtmpl']))
+    job_id = journal.job_id(url, profile, ydl_opts['outtmpl'])
+    measure = metrics.job(url, profile)
+    if skip_done and (journal.is_done(job_id) or
+                      archive.contains(archive.key_for(url, entry), profile, output_path)):
+        metrics.finish(measure, 'skipped')
+        return None
+    
+    # O que é preciso para retomar o job com as mesmas escolhas
+    quality = ydl_opts.get('format')
+    journal.start(url, profile, ydl_opts['outtmpl'], {
+        'quality': quality.to_dict() if isinstance(quality, FormatSelector) else None,
+        'segments': segments,
+    })
+    ydl_opts = dict(ydl_opts)
+    ydl_opts['progress_hooks'] = list(ydl_opts.get('progress_hooks', [])) + [
+        journal.hook(job_id), bandwidth_governor.hook(job_id, priority), measure.progress_hook]
+    ydl_opts['postprocessor_hooks'] = list(ydl_opts.get('postprocessor_hooks', [])) + [
+        journal.postprocessor_hook(job_id), measure.postprocessor_hook]
+    if ydl_opts.get('quiet') and not ydl_opts.get('logger'):
+        ydl_opts['logger'] = MetricsLogger(measure, warnings=not ydl_opts.get('no_warnings'))
+    if segments > 1:
+        ydl_opts['concurrent_fragment_downloads'] = segments
+    try:
+        with slots if slots is not None else nullcontext(), ydl_pool.session(profile, ydl_opts) as ydl:
+            with measure.phase('extract'):
+                info = extract_info_once(ydl, url)
+            # Links sem id conhecido só podem ser consultados depois da extração
+            key = archive.key_from_info(info)
+            if skip_done and archive.contains(key, profile, output_path):
+                journal.finish(job_id)
+                metrics.finish(measure, 'skipped')
+                return None
+            if on_info:
+                on_info(info)
+            if segments > 1:
+                segmented_download(ydl, info, segments, ydl_opts['progress_hooks'])
+            info = ydl.process_ie_result(info, download=True)
+            measure.format = format_plan(info)
+    except BaseException as e:
+        journal.fail(job_id, str(e))
+        metrics.finish(measure, 'error', e)
+        raise
+    finally:
+        bandwidth_governor.release(job_id)
+    
+    if postprocess is None:
+        filepath = final_filename(info)
+        archive.add(key, profile, output_path, filepath)
+        journal.finish(job_id, filepath)
+        metrics.finish(measure, 'done')
+        return info
+    
+    try:
+        converted = postprocess(info)
+    except BaseException as e:
+        journal.fail(job_id, str(e))
+        metrics.finish(measure, 'error', e)
+        raise
+    done = Future()
+    submitted = time.monotonic()
+    
+    def finished(future):
+        measure.add_phase('postprocess', time.monotonic() - submitted)
+        error = future.exception()
+        if error is not None:
+            journal.fail(job_id, str(error))
+            metrics.finish(measure, 'error', error)
+            done.set_exception(error)
+            return
+        archive.add(key, profile, output_path, future.result())
+        journal.finish(job_id, future.result())
+        metrics.finish(measure, 'done')
+        done.set_result(info)
+    
+    converted.add_done_callback(finished)
+    return done
+
+def resume_interrupted(progress_hooks=(), ffmpeg_location=None, journal=None):
+    """
+    Retoma os downloads interrompidos do diário
+    
+    Cada job volta com as opções gravadas no diário (limites de formato e
+    conexões) e, nos perfis de áudio, com a conversão no TranscodePool,
+    como nos downloads normais.
+    
+    Returns:
+        Lista de (job, True/False) com o resultado de cada job
+    """
+    journal = journal or download_journal
+    results = []
+    for job in journal.interrupted():
+        options = job['options']
+        quality = FormatSelector(**options['quality']) if options.get('quality') else None
+        profile = job['profile']
+        extra = {}
+        postprocess = None
+        if profile in AUDIO_CODECS:
+            transcoder = transcode_pool(ffmpeg_location)
+            extra['postprocessors'] = []
+            
+            def postprocess(info, codec=AUDIO_CODECS[profile]):
+                return transcoder.submit_info(info, codec)
+        ydl_opts = build_ydl_opts(profile, job['outtmpl'], progress_hooks, ffmpeg_location, quality, **extra)
+        try:
+            result = download_with_journal(job['url'], profile, ydl_opts, journal=journal, postprocess=postprocess,
+                                           segments=options.get('segments') or DEFAULT_SEGMENTS)
+            if isinstance(result, Future):
+                result.result()
+            results.append((job, True))
+        except Exception:
+            results.append((job, False))
+    return results
+
+class TranscodePool:
+    """
+    Converte os áudios baixados enquanto os próximos são baixados
+    
+    Em vez do FFmpegExtractAudio rodar dentro de cada download (deixando a
+    rede parada durante a conversão), os arquivos baixados entram numa fila
+    e cada conversão roda num processo ffmpeg próprio, no máximo um por
+    núcleo de CPU. submit() bloqueia quando a fila enche, segurando os
+    downloads até o ffmpeg alcançar.
+    
+    Quando o codec de origem já serve (sempre, com codec='best'; só se já
+    for MP3, com codec='mp3'), o áudio é apenas copiado para o contêiner
+    do codec (aac -> .m4a, opus -> .opus, ...), sem reconverter.
+    
+    Args:
+        ffmpeg_location: Caminho do ffmpeg (padrão: 'ffmpeg' do PATH)
+        max_workers: Conversões simultâneas (padrão: núcleos de CPU)
+        bitrate: Taxa do MP3 (mesma do FFmpegExtractAudio: 192k)
+        max_pending: Conversões na fila antes de bloquear (padrão: 2 por processo)
+    """
+
+    def __init__(self, ffmpeg_location=None, max_workers=None, bitrate='192k', max_pending=None):
+        self.ffmpeg = ffmpeg_location or 'ffmpeg'
+        if os.path.isdir(self.ffmpeg):
+            self.ffmpeg = os.path.join(self.ffmpeg, 'ffmpeg')
+        self.max_workers = max(1, int(max_workers or os.cpu_count() or 1))
+        self.bitrate = bitrate
+        self._slots = threading.BoundedSemaphore(max_pending or self.max_workers * 2)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._lock = threading.Lock()
+        self._running = {}  # Conversões em andamento -> fração concluída
+        self._ids = itertools.count()
+        self.queued = 0
+        self.done = 0
+        self.failed = 0
+        self.copied = 0
+        self.transcoded = 0
+
+    def stats(self):
+        """Progresso da etapa de conversão (fila, em andamento, concluídas)"""
+        with self._lock:
+            running = list(self._running.values())
+            return {
+                'queued': self.queued,
+                'active': len(running),
+                'done': self.done,
+                'failed': self.failed,
+                'copied': self.copied,
+                'transcoded': self.transcoded,
+                # Fração média das conversões em andamento
+                'progress': sum(running) / len(running) if running else 0.0,
+            }
+
+    def submit(self, source, duration=None, codec='mp3', acodec=None, on_file=None):
+        """
+        Enfileira a conversão de um arquivo (bloqueia se a fila estiver cheia)
+        
+        Args:
+            source: Arquivo baixado
+            duration: Duração em segundos (para o progresso), se conhecida
+            codec: 'mp3' ou 'best' (manter o codec original quando possível)
+            acodec: Codec de origem, se conhecido (senão o ffmpeg descobre)
+            on_file: Callback (origem, destino, 'copy' ou 'transcode', codec de
+                origem) chamado para cada arquivo concluído
+        
+        Returns:
+            Future com o caminho do arquivo final; o baixado é apagado no fim
+        """
+        self._slots.acquire()
+        with self._lock:
+            self.queued += 1
+        try:
+            future = self._executor.submit(self._transcode, next(self._ids), source, duration,
+                                           codec, audio_codec_name(acodec), on_file)
+        except BaseException:
+            with self._lock:
+                self.queued -= 1
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def submit_info(self, info, codec='mp3', on_file=None):
+        """submit() a partir das informações de um download concluído"""
+        return self.submit(final_filename(info), info.get('duration'), codec, info.get('acodec'), on_file)
+
+    def probe_codec(self, source):
+        """Codec do primeiro fluxo de áudio do arquivo (lido do ffmpeg -i)"""
+        result = subprocess.run([self.ffmpeg, '-nostdin', '-hide_banner', '-i', source],
+                                stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                universal_newlines=True, errors='replace')
+        for line in result.stdout.splitlines():
+            # "Stream #0:0(und): Audio: aac (LC) (mp4a / 0x6134706D), 44100 Hz, ..."
+            if 'Stream #' in line and 'Audio:' in line:
+                return audio_codec_name(line.split('Audio:', 1)[1].strip())
+        return None
+
+    def _transcode(self, job, source, duration, codec, acodec, on_file):
+        with self._lock:
+            self.queued -= 1
+            self._running[job] = 0.0
+        temp = None
+        try:
+            acodec = acodec or self.probe_codec(source)
+            copy = acodec in COPY_CONTAINERS and codec in ('best', acodec)
+            if copy:
+                ext = COPY_CONTAINERS[acodec]
+                arguments = ['-vn', '-codec:a', 'copy']
+            else:
+                ext = 'mp3'
+                arguments = ['-vn', '-codec:a', 'libmp3lame', '-b:a', self.bitrate]
+            target = os.path.splitext(source)[0] + '.' + ext
+            temp = os.path.splitext(source)[0] + '.temp.' + ext
+            command = [
+                self.ffmpeg, '-y', '-nostdin', '-hide_banner', '-nostats', '-i', source,
+            ] + arguments + ['-progress', 'pipe:1', temp]
+            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                       universal_newlines=True, errors='replace')
+            log = []
+            for line in process.stdout:
+                line = line.strip()
+                if line.startswith('Duration:') and not duration:
+                    # "Duration: 00:01:00.00, ..." quando o extrator não informou a duração
+                    try:
+                        hours, minutes, seconds = line[9:].split(',')[0].strip().split(':')
+                        duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+                    except ValueError:
+                        pass
+                elif line.startswith('out_time_us='):
+                    # Linhas "out_time_us=..." de -progress indicam o quanto já foi convertido
+                    if duration and line[12:].isdigit():
+                        self._running[job] = min(int(line[12:]) / (duration * 1e6), 1.0)
+                elif '=' not in line:
+                    log = (log + [line])[-5:]
+            if process.wait() != 0:
+                raise RuntimeError(f"ffmpeg falhou ({process.returncode}): {' '.join(log)[-300:]}")
+            os.replace(temp, target)
+            if os.path.abspath(source) != os.path.abspath(target):
+                os.remove(source)
+        except BaseException:
+            if temp and os.path.exists(temp):
+                os.remove(temp)
+            with self._lock:
+                del self._running[job]
+                self.failed += 1
+            raise
+        with self._lock:
+            del self._running[job]
+            self.done += 1
+            if copy:
+                self.copied += 1
+            else:
+                self.transcoded += 1
+        if on_file:
+            on_file(source, target, 'copy' if copy else 'transcode', acodec)
+        return target
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+_transcode_pool = None
+_transcode_pool_lock = threading.Lock()
+
+def transcode_pool(ffmpeg_location=None):
+    """Pool de conversão para MP3 compartilhado (criado no primeiro uso)"""
+    global _transcode_pool
+    with _transcode_pool_lock:
+        if _transcode_pool is None:
+            _transcode_pool = TranscodePool(ffmpeg_location)
+        return _transcode_pool
+
+# Quantas vezes por segundo as barras de progresso são redesenhadas
+PROGRESS_FPS = 15
+
+class ProgressAggregator:
+    """
+    Junta os eventos de progresso do yt-dlp para exibição em taxa fixa
+    
+    Os hooks só gravam o estado mais recente no slot de cada download (uma
+    atribuição, sem lock; cada slot tem um único escritor). Quem exibe chama
+    poll() a PROGRESS_FPS vezes por segundo e desenha só o último valor,
+    com velocidade suavizada e tempo restante. Os eventos que chegaram entre
+    duas leituras são contados em 'coalesced'.
+    
+    Args:
+        smoothing: Peso da nova medida na média móvel da velocidade (0 a 1)
+    """
+
+    def __init__(self, smoothing=0.3):
+        self.smoothing = smoothing
+        self._slots = {}
+        self._finished_events = 0
+        # Estado de quem lê (só usado por poll)
+        self._speeds = {}
+        self._seen = {}
+        self.coalesced = 0
+
+    def update(self, key, d):
+        """Guardar o último evento do download 'key' (chamado pelo hook)"""
+        previous = self._slots.get(key)
+        self._slots[key] = (
+            time.monotonic(),
+            d.get('downloaded_bytes') or 0,
+            d.get('total_bytes') or d.get('total_bytes_estimate'),
+            d.get('status'),
+            previous[4] + 1 if previous else 1,
+        )
+
+    def hook(self, key):
+        """Hook de progresso do yt-dlp que alimenta o slot 'key'"""
+        return lambda d: self.update(key, d)
+
+    def latest(self, key):
+        """Último estado do slot: (momento, baixado, total, status, eventos) ou None"""
+        return self._slots.get(key)
+
+    def finish(self, key):
+        """Remover o slot de um download encerrado"""
+        slot = self._slots.pop(key, None)
+        if slot:
+            self._finished_events += slot[4]
+
+    @property
+    def events(self):
+        """Total de eventos recebidos"""
+        return self._finished_events + sum(slot[4] for slot in list(self._slots.values()))
+
+    def poll(self):
+        """
+        Ler o estado atual de todos os downloads (para quem desenha)
+        
+        Returns:
+            Dicionário com 'items' (por download) e os totais
+            'downloaded_bytes', 'total_bytes', 'speed', 'eta' e 'coalesced'
+        """
+        items = {}
+        for key, (moment, downloaded, total, status, count) in list(self._slots.items()):
+            last = self._speeds.get(key)
+            speed = last[2] if last else None
+            if last and moment > last[0]:
+                measured = max(0.0, (downloaded - last[1]) / (moment - last[0]))
+                speed = measured if speed is None else speed + self.smoothing * (measured - speed)
+            if not last or moment > last[0]:
+                self._speeds[key] = (moment, downloaded, speed)
+            
+            seen = self._seen.get(key, 0)
+            if count > seen:
+                self.coalesced += count - seen - 1
+                self._seen[key] = count
+            
+            eta = None
+            if speed and total:
+                eta = max(0.0, (total - downloaded) / speed)
+            items[key] = {
+                'status': status,
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'progress': downloaded / total if total else None,
+                'speed': speed,
+                'eta': eta,
+            }
+        
+        for key in list(self._speeds):
+            if key not in items:
+                del self._speeds[key]
+                self._seen.pop(key, None)
+        
+        speeds = [item['speed'] for item in items.values() if item['speed']]
+        known_totals = [item['total_bytes'] for item in items.values() if item['total_bytes']]
+        downloaded = sum(item['downloaded_bytes'] for item in items.values())
+        total = sum(known_totals) if len(known_totals) == len(items) and items else None
+        speed = sum(speeds) if speeds else None
+        return {
+            'items': items,
+            'downloaded_bytes': downloaded,
+            'total_bytes': total,
+            'speed': speed,
+            'eta': max(0.0, (total - downloaded) / speed) if total and speed else None,
+            'coalesced': self.coalesced,
+        }
+
+class ProgressTicker:
+    """
+    Chama render() em taxa fixa numa thread enquanto o 'with' estiver ativo
+    (e uma última vez ao sair), para exibir progresso no terminal
+    """
+
+    def __init__(self, render, fps=PROGRESS_FPS):
+        self.render = render
+        self.interval = 1.0 / fps
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.render()
+
+    def __enter__(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+        self.render()
+
+def format_bandwidth():
+    """Texto do limite de banda global ('limite 5.0MB/s, usando 4.8MB/s'), se houver"""
+    stats = bandwidth_governor.stats()
+    if not stats['rate']:
+        return ""
+    return f"limite {stats['rate'] / 1024 / 1024:.1f}MB/s, usando {stats['actual'] / 1024 / 1024:.1f}MB/s"
+
+def format_speed(speed, eta=None):
+    """Texto de velocidade e tempo restante ('2.5MB/s, 0:42 restantes')"""
+    if not speed:
+        return ""
+    text = f"{speed / 1024 / 1024:.1f}MB/s"
+    if eta is not None:
+        eta = int(eta)
+        text += f", {eta // 60}:{eta % 60:02d} restantes"
+    return text
+
+# Limite de entradas para guardar a listagem de uma playlist no cache
+PLAYLIST_CACHE_MAX_ENTRIES = 5000
+
+# Opções da instância usada para analisar links (listagem flat)
+PROBE_OPTS = {'quiet': True, 'no_warnings': True, 'extract_flat': 'in_playlist'}
+
+def warm_up(ie_keys=('Youtube', 'YoutubeTab')):
+    """
+    Prepara a análise do primeiro link em segundo plano
+    
+    Importa o yt-dlp, cria a instância 'probe' do pool e inicializa os
+    extractors do YouTube, que é o que a primeira análise pagaria. Feito
+    enquanto o usuário cola o link, a análise já começa com tudo pronto.
+    
+    Args:
+        ie_keys: Extractors a inicializar
+    """
+    load_yt_dlp()
+    with ydl_pool.session('probe', PROBE_OPTS) as ydl:
+        for ie_key in ie_keys:
+            ydl.get_info_extractor(ie_key)
+
+def stream_playlist(url, on_info=None, use_cache=True):
+    """
+    Enumera uma playlist conforme o yt-dlp busca as páginas
+    
+    A lista nunca é montada inteira: cada entrada (flat) é entregue assim
+    que chega, para que a interface e a fila de downloads comecem antes do
+    fim da listagem. Links que não são playlist não geram entradas.
+    
+    Args:
+        url: Link da playlist
+        on_info: Callback (info) chamado uma vez, antes da primeira entrada,
+            com as informações da playlist (sem 'entries') ou do vídeo
+        use_cache: Ler/gravar a listagem no metadata_cache
+    
+    Yields:
+        (idx, entry) com o índice da entrada na playlist (a partir de 0) e
+        a entrada compactada (PlaylistEntry)
+    """
+    key = canonical_key(url)
+    cached = metadata_cache.get(key) if use_cache else None
+    if cached is not None:
+        entries = cached.pop('entries', None)
+        if on_info:
+            on_info(cached)
+        for idx, entry in enumerate(entries or []):
+            if entry:
+                yield idx, PlaylistEntry.from_info(idx, entry)
+        return
+    
+    with ydl_pool.session('probe', PROBE_OPTS) as ydl:
+        info = ydl.extract_info(url, download=False, process=False)
+        # Links como watch?v=...&list=... apontam para a playlist
+        while info.get('_type') in ('url', 'url_transparent'):
+            info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+        
+        entries = info.pop('entries', None)
+        if on_info:
+            on_info(info)
+        if entries is None:
+            if use_cache:
+                metadata_cache.put(key, info)
+            return
+        
+        # Guardar no cache só listagens completas e de tamanho razoável
+        collected = []
+        for idx, entry in enumerate(entries):
+            entry = PlaylistEntry.from_info(idx, entry) if entry else None
+            if collected is not None:
+                collected.append(entry)
+                if len(collected) > PLAYLIST_CACHE_MAX_ENTRIES:
+                    collected = None
+            if entry:
+                yield idx, entry
+    
+    if use_cache and collected is not None:
+        metadata_cache.put(key, dict(info, entries=[entry and entry.to_dict() for entry in collected]))
+
+# Links analisados ao mesmo tempo quando vários são colados de uma vez
+ANALYZE_CONCURRENCY = 8
+
+# Tempo máximo de análise de um link, em segundos (os outros não esperam por ele)
+ANALYZE_TIMEOUT = 60
+
+def split_links(text):
+    """
+    Links de um texto colado (um por linha ou separados por espaço)
+    
+    Links repetidos (mesma chave canônica) aparecem uma vez só, na ordem
+    em que foram colados.
+    """
+    links = []
+    seen = set()
+    for token in text.split():
+        link = token.strip(',;<>"\'')
+        key = canonical_key(link) if link else None
+        if key and key not in seen:
+            seen.add(key)
+            links.append(link)
+    return links
+
+def probe_link(url):
+    """
+    Analisa um link para a fila: as informações e as entradas a baixar
+    
+    Um vídeo vira uma entrada com o próprio link; uma playlist traz as
+    entradas da listagem (flat). Usa o metadata_cache como stream_playlist.
+    
+    Returns:
+        (info sem 'entries', lista de PlaylistEntry)
+    """
+    found = {}
+    entries = [entry for _, entry in stream_playlist(url, on_info=lambda info: found.setdefault('info', info))]
+    info = found.get('info') or {}
+    if info.get('_type', 'video') == 'video':
+        entries = [PlaylistEntry.from_info(0, dict(info, url=url, ie_key=info.get('extractor_key')))]
+    return info, entries
+
+async def analyze_links_async(urls, on_result, concurrency=ANALYZE_CONCURRENCY, timeout=ANALYZE_TIMEOUT):
+    """
+    Analisa vários links ao mesmo tempo (no máximo 'concurrency' de cada vez)
+    
+    Cada extração roda numa thread do executor; o loop só distribui os
+    links e entrega os resultados conforme ficam prontos, sem esperar os
+    mais lentos. Um link que falha ou passa de 'timeout' é entregue com o
+    erro e não atrapalha os outros.
+    
+    Args:
+        urls: Links a analisar
+        on_result: Callback (posição, link, info, entradas, erro) chamado
+            na ordem em que as análises terminam; erro é None no sucesso
+        concurrency: Análises simultâneas
+        timeout: Tempo máximo de cada análise, em segundos (None: sem limite)
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='analyze')
+    
+    def release(task):
+        semaphore.release()
+        if not task.cancelled():
+            task.exception()  # Falha depois do tempo esgotado: já foi entregue como erro
+    
+    async def analyze(position, url):
+        # A vaga só volta quando a thread termina (mesmo depois do tempo
+        # esgotado), então nenhuma análise espera na fila do executor e o
+        # tempo de cada uma conta a partir de quando ela começa a rodar
+        await semaphore.acquire()
+        task = loop.run_in_executor(executor, probe_link, url)
+        task.add_done_callback(release)
+        try:
+            info, entries = await asyncio.wait_for(asyncio.shield(task), timeout)
+            error = None
+        except asyncio.TimeoutError:
+            info, entries, error = None, [], f"tempo esgotado ({timeout}s)"
+        except Exception as e:
+            info, entries, error = None, [], str(e)
+        on_result(position, url, info, entries, error)
+    
+    try:
+        await asyncio.gather(*(analyze(position, url) for position, url in enumerate(urls)))
+    finally:
+        # Análises que passaram do tempo terminam sozinhas, sem segurar o retorno
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def analyze_links(urls, on_result, concurrency=ANALYZE_CONCURRENCY, timeout=ANALYZE_TIMEOUT):
+    """Roda analyze_links_async num loop próprio (retorna quando todos os links terminarem)"""
+    asyncio.run(analyze_links_async(urls, on_result, concurrency, timeout))
+
+# Entradas já conhecidas seguidas que encerram a listagem de uma sincronização
+# (tolera alguns vídeos removidos ou reordenados no topo da lista)
+SYNC_STOP_AFTER = 3
+
+def entry_id(entry):
+    """Identificador de uma entrada (flat) de playlist, para comparar listagens"""
+    return str(entry.get('id') or entry_url(entry))
+
+def lists_newest_first(url):
+    """
+    Se a listagem do link começa pelos vídeos mais novos
+    
+    Canais (/@nome, /channel/..., abas /videos, /shorts, /streams) e as
+    playlists de envios ('UU...') sim; playlists comuns recebem os vídeos
+    novos no fim, então precisam ser listadas inteiras.
+    """
+    key = canonical_key(url)
+    if key.startswith('youtube:playlist:'):
+        return key[len('youtube:playlist:'):].startswith('UU')
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+    if host.startswith('www.') or host.startswith('m.'):
+        host = host.split('.', 1)[1]
+    parts = [part for part in parsed.path.split('/') if part]
+    return host == 'youtube.com' and bool(parts) and (
+        parts[0].startswith('@') or parts[0] in ('channel', 'c', 'user'))
+
+class PlaylistSync:
+    """
+    Sincronização incremental de uma playlist: só as entradas novas
+    
+    Compara a listagem (flat) com a última sincronização guardada em
+    PlaylistSnapshots. Em listagens que começam pelos mais novos (canais),
+    a paginação para depois de SYNC_STOP_AFTER entradas conhecidas
+    seguidas, então uma sincronização diária custa só as primeiras páginas;
+    nas outras, a listagem vai até o fim e só as entradas novas saem. Na
+    primeira vez, tudo é novo (o arquivo de downloads ainda pula o que já
+    estiver na pasta).
+    
+    A nova listagem só é gravada por commit(), com as entradas que deram
+    certo: as que falharam continuam novas na próxima sincronização.
+    
+    Args:
+        url: Link da playlist ou canal
+        profile: Perfil dos downloads ('video', 'audio'...)
+        output_path: Pasta da playlist
+        snapshots: Onde guardar as listagens (padrão: playlist_snapshots)
+        newest_first: Se a listagem começa pelos mais novos (padrão: pelo link)
+    """
+
+    def __init__(self, url, profile, output_path, snapshots=None, newest_first=None):
+        self.url = url
+        self.profile = profile
+        self.output_path = output_path
+        self.snapshots = snapshots or playlist_snapshots
+        self.key = canonical_key(url)
+        self.newest_first = lists_newest_first(url) if newest_first is None else newest_first
+        self.known = self.snapshots.get(self.key, profile, output_path)
+        self.listed = 0  # Entradas vistas na listagem
+        self.stopped_early = False
+        self._seen = []  # Ids na ordem da listagem
+        self._new = {}  # idx -> id das entradas novas
+
+    def entries(self, on_info=None):
+        """
+        Gera (idx, entry) só das entradas novas, conforme a listagem avança
+        
+        Args:
+            on_info: Callback (info) com as informações da playlist
+        """
+        known = set(self.known or ())
+        streak = 0
+        # Sem cache: a sincronização precisa da listagem atual
+        for idx, entry in stream_playlist(self.url, on_info=on_info, use_cache=False):
+            self.listed += 1
+            eid = entry_id(entry)
+            self._seen.append(eid)
+            if eid in known:
+                streak += 1
+                if self.newest_first and streak >= SYNC_STOP_AFTER:
+                    self.stopped_early = True
+                    return
+                continue
+            streak = 0
+            self._new[idx] = eid
+            yield idx, entry
+
+    @property
+    def new_count(self):
+        return len(self._new)
+
+    def filename(self, idx):
+        """
+        Modelo do nome de uma entrada nova
+        
+        Nas playlists comuns os vídeos novos entram no fim e a numeração da
+        pasta continua valendo; nas listagens dos mais novos primeiro a
+        posição muda a cada vídeo novo, então fica só o título.
+        """
+        return '%(title)s.%(ext)s' if self.newest_first else f'{idx+1} - %(title)s.%(ext)s'
+
+    def record(self, listing, results):
+        """
+        Grava uma listagem feita por outro caminho (ex.: a análise da interface)
+        
+        Args:
+            listing: Entradas na ordem da playlist (None = entrada indisponível)
+            results: Dicionário idx -> True/False das entradas baixadas; as
+                novas que não foram baixadas continuam novas
+        """
+        known = set(self.known or ())
+        self._seen = [entry_id(entry) for entry in listing if entry]
+        self._new = {idx: entry_id(entry) for idx, entry in enumerate(listing)
+                     if entry and entry_id(entry) not in known}
+        self.listed = len(self._seen)
+        self.commit(results)
+
+    def commit(self, results):
+        """
+        Grava a nova listagem
+        
+        Args:
+            results: Dicionário idx -> True/False (como DownloadScheduler.run)
+        """
+        failed = {eid for idx, eid in self._new.items() if not results.get(idx)}
+        seen = [eid for eid in self._seen if eid not in failed]
+        if self.stopped_early:
+            # O resto da lista não foi buscado: continua o da última vez
+            listed = set(self._seen)
+            seen += [eid for eid in self.known or () if eid not in listed]
+        self.snapshots.save(self.key, self.profile, self.output_path, seen)
+
+class DownloadScheduler:
+    """
+    Baixa várias entradas de uma playlist em paralelo com um pool limitado
+
+    Cada item recebe seu próprio YoutubeDL e seu próprio hook de progresso,
+    então o nome do arquivo ('{idx+1} - %(title)s') não depende da ordem
+    em que os downloads terminam. As entradas podem chegar aos poucos (de
+    um gerador): só algumas ficam na fila por vez e os itens concluídos
+    viram apenas contadores, então a memória não cresce com a playlist.
+
+    Args:
+        build_opts: Função (idx, entry, hook) -> ydl_opts de um item
+        max_workers: Quantidade de downloads simultâneos
+        on_progress: Callback (idx, item, aggregate) chamado quando um item
+            muda de estado (na fila, baixando, processando, concluído, erro)
+        profile: Perfil do pool de YoutubeDL ('video' ou 'audio')
+        postprocess: Etapa depois do download, fora das threads de download
+            (ex.: TranscodePool.submit_info); o item fica 'processing' até ela
+            terminar, enquanto a vaga de download já passa para o próximo
+        segments: Conexões simultâneas por arquivo (download segmentado)
+        slots: Semáforo dividido com outros downloads além de max_workers
+            (ex.: as playlists do modo em lote não somam vagas)
+    
+    Os bytes baixados vão para um ProgressAggregator (self.progress), lido
+    em taxa fixa por aggregate(), em vez de gerar um callback por evento.
+    A economia estimada pela escolha de formato (FormatSelector) dos itens
+    concluídos é somada em self.saved_bytes.
+    """
+
+    def __init__(self, build_opts, max_workers=DEFAULT_WORKERS, on_progress=None, profile='video',
+                 postprocess=None, segments=DEFAULT_SEGMENTS, slots=None):
+        self.build_opts = build_opts
+        self.postprocess = postprocess
+        self.segments = segments
+        self.slots = slots
+        self.profile = profile
+        self.max_workers = max(1, int(max_workers))
+        self.on_progress = on_progress
+        self.progress = ProgressAggregator()
+        self._lock = threading.Lock()
+        self.items = {}  # Itens na fila ou em andamento
+        self.done = 0
+        self.failed = 0
+        self.total = 0
+        self.saved_bytes = 0
+
+    def aggregate(self):
+        """
+        Progresso agregado de todos os itens (para quem desenha, em taxa fixa)
+        
+        Além do progresso (0.0 a 1.0) e das contagens, traz a velocidade
+        total suavizada e quantos eventos de progresso foram agrupados.
+        """
+        with self._lock:
+            aggregate = self._aggregate()
+        state = self.progress.poll()
+        aggregate['speed'] = state['speed']
+        aggregate['coalesced'] = state['coalesced']
+        return aggregate
+
+    def _item_progress(self, idx, item):
+        if item['status'] == 'processing':
+            return 0.99
+        slot = self.progress.latest(idx)
+        if not slot or not slot[2]:
+            return 0.0
+        # O 100% fica reservado para o fim do item inteiro
+        return min(slot[1] / slot[2], 0.99)
+
+    def _aggregate(self):
+        if not self.total:
+            return {'progress': 0.0, 'done': 0, 'failed': 0, 'total': 0, 'active': 0, 'saved_bytes': 0}
+        active = sum(1 for item in self.items.values() if item['status'] in ('downloading', 'processing'))
+        finished = self.done + self.failed
+        running = sum(self._item_progress(idx, item) for idx, item in self.items.items())
+        return {'progress': (finished + running) / self.total, 'done': self.done, 'failed': self.failed,
+                'total': self.total, 'active': active, 'saved_bytes': self.saved_bytes}
+
+    def _update(self, idx, **changes):
+        with self._lock:
+            item = self.items[idx]
+            item.update(changes)
+            snapshot = dict(item)
+            if item['status'] in ('done', 'error'):
+                del self.items[idx]
+                self.progress.finish(idx)
+                if item['status'] == 'done':
+                    self.done += 1
+                    self.saved_bytes += (item.get('format') or {}).get('saved_bytes') or 0
+                else:
+                    self.failed += 1
+            aggregate = self._aggregate()
+        if self.on_progress:
+            self.on_progress(idx, snapshot, aggregate)
+
+    def _make_hook(self, idx):
+        def hook(d):
+            self.progress.update(idx, d)
+            if d['status'] == 'finished':
+                self._update(idx, status='processing')
+            elif d['status'] == 'downloading' and self.items.get(idx, {}).get('status') == 'processing':
+                # Segundo arquivo do mesmo item (ex.: áudio depois do vídeo)
+                self._update(idx, status='downloading')
+        return hook
+
+    def _run_one(self, idx, entry):
+        self._update(idx, status='downloading')
+        try:
+            # Itens já baixados (diário ou arquivo de downloads) são pulados
+            ydl_opts = self.build_opts(idx, entry, self._make_hook(idx))
+            result = download_with_journal(entry_url(entry), self.profile, ydl_opts, skip_done=True,
+                                           entry=entry, postprocess=self.postprocess,
+                                           segments=self.segments, slots=self.slots)
+        except Exception as e:
+            self._update(idx, status='error', error=str(e))
+            return False
+        if isinstance(result, Future):
+            self._update(idx, status='processing')
+            result.add_done_callback(lambda future: self._finish_postprocess(idx, future))
+            return result
+        self._update(idx, status='done', format=format_plan(result))
+        return True
+
+    def _finish_postprocess(self, idx, future):
+        error = future.exception()
+        if error is not None:
+            self._update(idx, status='error', error=str(error))
+        else:
+            self._update(idx, status='done', format=format_plan(future.result()))
+
+    def run(self, jobs):
+        """
+        Executa os downloads
+
+        Args:
+            jobs: Lista ou gerador de (idx, entry) com o índice original na
+                playlist; é consumido aos poucos, conforme há vaga na fila
+
+        Returns:
+            Dicionário idx -> True/False indicando sucesso de cada item
+        """
+        with self._lock:
+            self.items = {}
+            self.done = self.failed = self.total = self.saved_bytes = 0
+
+        # Limitar quantos itens ficam esperando na fila
+        slots = threading.BoundedSemaphore(self.max_workers * 2)
+        futures = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for idx, entry in jobs:
+                slots.acquire()
+                with self._lock:
+                    self.items[idx] = {
+                        'idx': idx,
+                        'title': entry.get('title') or f'Video {idx+1}',
+                        'status': 'queued',
+                    }
+                    self.total += 1
+                future = executor.submit(self._run_one, idx, entry)
+                future.add_done_callback(lambda _: slots.release())
+                futures[idx] = future
+        
+        # Esperar as etapas de pós-processamento que ainda estão rodando
+        results = {}
+        for idx, future in futures.items():
+            result = future.result()
+            if isinstance(result, Future):
+                result = result.exception() is None
+            results[idx] = result
+        return results
+
+def download_video(url, output_path="downloads", progress_hooks=None, on_error=None,
+                   segments=DEFAULT_SEGMENTS, quality=None, slots=None):
     """
     Baixa um vídeo do YouTube
     
     Args:
         url: Link do vídeo do YouTube
         output_path: Pasta onde salvar o vídeo
+        progress_hooks: Hooks de progresso no lugar da barra do terminal
+            (modo em lote, sem interação)
+        on_error: Callback (mensagem) chamado se o download falhar
+        segments: Conexões simultâneas (pedaços com Range) para baixar o arquivo
+        quality: FormatSelector com os limites de resolução, tamanho e codecs
+        slots: Semáforo dos downloads simultâneos do modo em lote
     """
     # Criar pasta de downloads se não existir
     if not os.path.exists(output_path):
         os.makedirs(output_path)
     
     # Tentar encontrar FFmpeg
-    ffmpeg_location = None
-    possible_paths = [
-        os.path.expanduser(r"~\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\ffmpeg-8.0.1-full_build\bin\ffmpeg.exe"),
-        r"C:\ffmpeg\bin\ffmpeg.exe",
-        r"C:\Program Files\ffmpeg\bin\ffmpeg.exe",
-        os.path.expanduser(r"~\scoop\apps\ffmpeg\current\bin\ffmpeg.exe"),
-    ]
-    
-    for path in possible_paths:
-        if os.path.exists(path):
-            ffmpeg_location = path
-            break
+    ffmpeg_location = find_ffmpeg()
     
     # Configurações do download
-    ydl_opts = {
-        'format': 'best[ext=mp4]/best',
-        'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s'),
-        'progress_hooks': [progress_hook],
-        'noplaylist': True,
-        # Deixar o fixup acontecer - ele cria o .temp.mp4 que funciona
-    }
+    ydl_opts = build_ydl_opts('video', os.path.join(output_path, '%(title)s.%(ext)s'),
+                              progress_hooks if progress_hooks is not None else [progress_hook],
+                              ffmpeg_location, quality, quiet=progress_hooks is not None)
     
     if ffmpeg_location:
-        ydl_opts['ffmpeg_location'] = ffmpeg_location
         print(f"✓ FFmpeg disponível")
     else:
         print("⚠️  FFmpeg não encontrado")
@@ -60,215 +2833,493 @@ def download_video(url, output_path="downloads"):
         print(f"\n🎬 Baixando vídeo de: {url}")
         print(f"📁 Salvando em: {os.path.abspath(output_path)}\n")
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # Obter informações do vídeo
-            info = ydl.extract_info(url, download=False)
+        def show_info(info):
             print(f"📺 Título: {info['title']}")
-            print(f"⏱️  Duração: {info['duration'] // 60}:{info['duration'] % 60:02d}")
+            duration = int(info.get('duration') or 0)
+            print(f"⏱️  Duração: {duration // 60}:{duration % 60:02d}")
             print(f"👁️  Views: {info.get('view_count', 'N/A')}")
             print()
-            
-            # Fazer o download
-            ydl.download([url])
+        
+        # Uma única extração; o download fica no diário e pode ser retomado
+        with cli_ticker(progress_hooks):
+            info = download_with_journal(url, 'video', ydl_opts, on_info=show_info, skip_done=True,
+                                         segments=segments, slots=slots)
+        if info is None:
+            print("⏭️  Já baixado nesta pasta, pulando.")
+            return True
+        if (format_plan(info) or {}).get('estimated_bytes'):
+            print(f"\n🎞️  Formato: {format_saving(format_plan(info))}")
             
         print("\n✅ Download concluído com sucesso!")
         print(f"📂 Arquivo salvo em: {os.path.abspath(output_path)}")
         
     except Exception as e:
         print(f"\n❌ Erro ao baixar o vídeo: {str(e)}")
+        if on_error:
+            on_error(str(e))
         
-        # Tentar limpar arquivos temporários mesmo em caso de erro
-        import glob
-        temp_files = glob.glob(os.path.join(output_path, "*.temp.mp4")) + \
-                     glob.glob(os.path.join(output_path, "*.part")) + \
-                     glob.glob(os.path.join(output_path, "*.ytdl"))
-        
-        for temp_file in temp_files:
-            try:
-                if os.path.exists(temp_file):
-                    os.remove(temp_file)
-            except Exception:
-                pass
+        # Os temporários que não servem para retomar já foram apagados pelo
+        # diário (só os deste job); os .part/.ytdl ficam para a próxima tentativa
+        print("↩️  O download poderá ser retomado na próxima execução.")
         
         return False
     
     return True
 
+# Progresso do download atual no terminal (desenhado por print_progress)
+cli_progress = ProgressAggregator()
+
 def progress_hook(d):
-    """Mostra o progresso do download"""
+    """Registra o progresso do download (exibido em taxa fixa por print_progress)"""
     if d['status'] == 'downloading':
-        # Calcular porcentagem
-        if 'total_bytes' in d:
-            percent = (d['downloaded_bytes'] / d['total_bytes']) * 100
-            print(f"\r⬇️  Baixando: {percent:.1f}% - {d['downloaded_bytes'] / 1024 / 1024:.1f}MB / {d['total_bytes'] / 1024 / 1024:.1f}MB", end='')
-        else:
-            print(f"\r⬇️  Baixando: {d['downloaded_bytes'] / 1024 / 1024:.1f}MB", end='')
+        cli_progress.update('cli', d)
     elif d['status'] == 'finished':
-        print(f"\n✓ Download finalizado, processando...")
+        cli_progress.finish('cli')
+        print(f"\r⬇️  Baixando: 100.0%{' ' * 40}")
+        print(f"✓ Download finalizado, processando...")
+
+def print_progress():
+    """Mostra o progresso do download"""
+    item = cli_progress.poll()['items'].get('cli')
+    if not item:
+        return
+    speed = format_speed(item['speed'], item['eta'])
+    if speed:
+        speed = f" - {speed}"
+    if item['total_bytes']:
+        percent = item['progress'] * 100
+        print(f"\r⬇️  Baixando: {percent:.1f}% - {item['downloaded_bytes'] / 1024 / 1024:.1f}MB / {item['total_bytes'] / 1024 / 1024:.1f}MB{speed}    ", end='')
+    else:
+        print(f"\r⬇️  Baixando: {item['downloaded_bytes'] / 1024 / 1024:.1f}MB{speed}    ", end='')
+
+def cli_ticker(progress_hooks=None):
+    """Barra de progresso do terminal, a menos que o chamador tenha seus próprios hooks"""
+    return ProgressTicker(print_progress if progress_hooks is None else lambda: None)
 
-def download_audio_only(url, output_path="downloads"):
+def download_audio_only(url, output_path="downloads", progress_hooks=None, on_error=None,
+                        keep_codec=False, on_file=None, slots=None):
     """
     Baixa apenas o áudio do vídeo (MP3)
     
     Args:
         url: Link do vídeo do YouTube
         output_path: Pasta onde salvar o áudio
+        progress_hooks: Hooks de progresso no lugar da barra do terminal
+        on_error: Callback (mensagem) chamado se o download falhar
+        keep_codec: Manter o codec original (AAC/Opus...) copiando o fluxo,
+            em vez de reconverter para MP3
+        on_file: Callback (origem, destino, 'copy' ou 'transcode', codec)
+        slots: Semáforo dos downloads simultâneos do modo em lote
     """
     if not os.path.exists(output_path):
         os.makedirs(output_path)
     
-    ydl_opts = {
-        'format': 'bestaudio/best',
-        'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s'),
-        'postprocessors': [{
-            'key': 'FFmpegExtractAudio',
-            'preferredcodec': 'mp3',
-            'preferredquality': '192',
-        }],
-        'progress_hooks': [progress_hook],
-        'noplaylist': True,  # Baixar apenas o vídeo, não a playlist inteira
-    }
+    # A conversão roda no pool de conversão, não dentro do download
+    profile = 'audio-original' if keep_codec else 'audio'
+    ydl_opts = build_ydl_opts(profile, os.path.join(output_path, '%(title)s.%(ext)s'),
+                              progress_hooks if progress_hooks is not None else [progress_hook],
+                              quiet=progress_hooks is not None, postprocessors=[])
+    transcoder = transcode_pool(find_ffmpeg())
+    
+    def file_done(source, target, method, acodec):
+        if method == 'copy':
+            print(f"🎛️  {os.path.basename(target)}: fluxo {acodec} copiado, sem reconverter")
+        else:
+            print(f"🎛️  {os.path.basename(target)}: convertido de {acodec or '?'} para MP3")
+        if on_file:
+            on_file(source, target, method, acodec)
+    
+    def postprocess(info):
+        return transcoder.submit_info(info, AUDIO_CODECS[profile], on_file=file_done)
     
     try:
         print(f"\n🎵 Baixando áudio de: {url}")
         print(f"📁 Salvando em: {os.path.abspath(output_path)}\n")
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+        def show_info(info):
             print(f"📺 Título: {info['title']}")
             print()
-            ydl.download([url])
+        
+        with cli_ticker(progress_hooks):
+            info = download_with_journal(url, profile, ydl_opts, on_info=show_info, skip_done=True,
+                                         postprocess=postprocess, slots=slots)
+        if info is None:
+            print("⏭️  Já baixado nesta pasta, pulando.")
+            return True
+        print("🎛️  Processando áudio...")
+        info.result()
             
         print("\n✅ Download de áudio concluído!")
         print(f"📂 Arquivo salvo em: {os.path.abspath(output_path)}")
         
     except Exception as e:
         print(f"\n❌ Erro ao baixar o áudio: {str(e)}")
+        if on_error:
+            on_error(str(e))
         return False
     
     return True
 
-def download_playlist(url, output_path="downloads"):
+def download_playlist(url, output_path="downloads", max_workers=DEFAULT_WORKERS,
+                      progress_hooks=None, on_error=None, segments=DEFAULT_SEGMENTS, quality=None,
+                      sync=False, slots=None):
     """
     Baixa uma playlist inteira do YouTube
     
     Args:
         url: Link da playlist do YouTube
         output_path: Pasta onde salvar os vídeos
+        max_workers: Quantidade de vídeos baixados ao mesmo tempo
+        progress_hooks: Hooks de progresso de cada vídeo; se informados, não
+            pede confirmação nem desenha a barra do terminal (modo em lote)
+        on_error: Callback (mensagem) chamado se a playlist ou algum vídeo falhar
+        segments: Conexões simultâneas por vídeo (download segmentado)
+        quality: FormatSelector com os limites de resolução, tamanho e codecs
+        sync: Baixar só as entradas novas desde a última sincronização
+            desta playlist nesta pasta (ver PlaylistSync)
+        slots: Semáforo dos downloads simultâneos do modo em lote
     """
     if not os.path.exists(output_path):
         os.makedirs(output_path)
     
     # Tentar encontrar FFmpeg
-    ffmpeg_location = None
-    possible_paths = [
-        os.path.expanduser(r"~\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\ffmpeg-8.0.1-full_build\bin\ffmpeg.exe"),
-        r"C:\ffmpeg\bin\ffmpeg.exe",
-        r"C:\Program Files\ffmpeg\bin\ffmpeg.exe",
-        os.path.expanduser(r"~\scoop\apps\ffmpeg\current\bin\ffmpeg.exe"),
-    ]
-    
-    for path in possible_paths:
-        if os.path.exists(path):
-            ffmpeg_location = path
-            break
-    
-    # Configurações do download para playlist
-    ydl_opts = {
-        'format': 'best[ext=mp4]/best',
-        'outtmpl': os.path.join(output_path, '%(playlist_index)s - %(title)s.%(ext)s'),
-        'progress_hooks': [progress_hook],
-        'noplaylist': False,  # Permitir download de playlist
-        'ignoreerrors': True,  # Continuar mesmo se algum vídeo falhar
-    }
+    ffmpeg_location = find_ffmpeg()
     
     if ffmpeg_location:
-        ydl_opts['ffmpeg_location'] = ffmpeg_location
         print(f"✓ FFmpeg disponível")
     else:
         print("⚠️  FFmpeg não encontrado")
     
+    syncer = PlaylistSync(url, 'video', output_path) if sync else None
+    
+    # Configurações de cada vídeo da playlist
+    def build_opts(idx, entry, hook):
+        name = syncer.filename(idx) if syncer is not None else f'{idx+1} - %(title)s.%(ext)s'
+        return build_ydl_opts('video', os.path.join(output_path, name),
+                              [hook] + list(progress_hooks or []), ffmpeg_location, quality,
+                              quiet=True, no_warnings=True, noprogress=True)
+    
+    def on_progress(idx, item, aggregate):
+        if item['status'] == 'error':
+            print(f"\n❌ Falha em {idx+1} - {item['title']}: {item.get('error')}")
+    
+    def print_playlist_progress():
+        aggregate = scheduler.aggregate()
+        speed = format_bandwidth() or format_speed(aggregate['speed'])
+        print(f"\r⬇️  Playlist: {aggregate['progress'] * 100:.1f}% - "
+              f"{aggregate['done']}/{aggregate['total']} concluídos, "
+              f"{aggregate['active']} em andamento{' - ' + speed if speed else ''}    ", end='')
+    
     try:
         print(f"\n🎬 Baixando playlist de: {url}")
         print(f"📁 Salvando em: {os.path.abspath(output_path)}\n")
         
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # Obter informações da playlist
-            info = ydl.extract_info(url, download=False)
-            
-            if 'entries' in info:
-                playlist_title = info.get('title', 'Playlist')
-                video_count = len(list(info['entries']))
-                print(f"📺 Playlist: {playlist_title}")
-                print(f"📊 Total de vídeos: {video_count}")
-                print()
-                
-                # Confirmar download
-                confirm = input(f"Deseja baixar {video_count} vídeos? (s/n): ").strip().lower()
-                if confirm != 's':
-                    print("❌ Download cancelado.")
-                    return False
-                
-                # Fazer o download
-                ydl.download([url])
+        # Listar a playlist aos poucos, sem resolver cada vídeo
+        playlist = {}
+        if syncer is not None:
+            entries = syncer.entries(on_info=playlist.update)
+        else:
+            entries = stream_playlist(url, on_info=playlist.update)
+        first = next(entries, None)
+        
+        if playlist.get('_type') != 'playlist':
+            print("⚠️  Não foi possível detectar a playlist. Verifique o link.")
+            if on_error:
+                on_error("Não foi possível detectar a playlist")
+            return False
+        
+        playlist_title = playlist.get('title', 'Playlist')
+        video_count = playlist.get('playlist_count') or '?'
+        print(f"📺 Playlist: {playlist_title}")
+        print(f"📊 Total de vídeos: {video_count}")
+        if syncer is not None:
+            if syncer.known is None:
+                print("🔄 Primeira sincronização: todos os vídeos são novos")
             else:
-                print("⚠️  Não foi possível detectar a playlist. Verifique o link.")
+                print(f"🔄 Sincronizando: {len(syncer.known)} vídeo(s) conhecido(s) da última vez")
+            if first is None:
+                syncer.commit({})
+                print("\n✅ Nenhum vídeo novo.")
+                return True
+            video_count = "os novos"  # A quantidade só se sabe no fim da listagem
+        print()
+        
+        # Confirmar download (só no modo interativo)
+        if progress_hooks is None:
+            confirm = input(f"Deseja baixar {video_count} vídeos? (s/n): ").strip().lower()
+            if confirm != 's':
+                print("❌ Download cancelado.")
                 return False
-            
-        print("\n✅ Download da playlist concluído!")
+        
+        # Fazer o download enquanto o resto da playlist ainda é listado
+        # (continua mesmo se algum vídeo falhar)
+        scheduler = DownloadScheduler(build_opts, max_workers=max_workers, on_progress=on_progress,
+                                      segments=segments, slots=slots)
+        with ProgressTicker(print_playlist_progress if progress_hooks is None else lambda: None):
+            results = scheduler.run(itertools.chain([first] if first else [], entries))
+        
+        failed = sum(1 for ok in results.values() if not ok)
+        if syncer is not None:
+            syncer.commit(results)
+            print(f"\n\n🔄 {syncer.new_count} vídeo(s) novo(s) em {syncer.listed} entrada(s) listada(s)"
+                  f"{' (listagem interrompida nos já conhecidos)' if syncer.stopped_early else ''}", end='')
+        print(f"\n\n✅ Download da playlist concluído! ({len(results) - failed}/{len(results)} vídeos)")
+        if scheduler.saved_bytes:
+            print(f"🎞️  Economia estimada pela escolha de formato: {scheduler.saved_bytes / 1024 / 1024:.1f}MB")
         print(f"📂 Arquivos salvos em: {os.path.abspath(output_path)}")
         
     except Exception as e:
         print(f"\n❌ Erro ao baixar a playlist: {str(e)}")
+        if on_error:
+            on_error(str(e))
         return False
     
+    if failed and on_error:
+        on_error(f"{failed} de {len(results)} vídeo(s) falharam")
     return True
 
 def cleanup_temp_files(output_path="downloads"):
-    """Limpa arquivos temporários e renomeia .temp.mp4 para .mp4"""
-    import glob
-    import time
+    """
+    Organiza os temporários que sobraram de downloads concluídos nesta pasta
     
+    Cada job já finaliza os próprios arquivos ao terminar (ver
+    DownloadJournal); aqui só se tenta de novo o que não pôde ser tratado
+    na hora (ex.: arquivo aberto em outro programa), pelo manifesto de
+    cada job, sem varrer a pasta nem mexer em downloads em andamento.
+    """
     print("\n🧹 Organizando arquivos...")
-    time.sleep(1)  # Pequena pausa
+    for final_name in download_journal.cleanup(output_path):
+        print(f"✓ Arquivo organizado: {os.path.basename(final_name)}")
+
+# Modos aceitos no modo em lote e a função de cada um
+BATCH_MODES = {
+    'video': download_video,
+    'audio': download_audio_only,
+    'audio-original': lambda url, output_path, **kwargs: download_audio_only(
+        url, output_path, keep_codec=True, **kwargs),
+    'playlist': download_playlist,
+    'sync': lambda url, output_path, **kwargs: download_playlist(url, output_path, sync=True, **kwargs),
+}
+
+def read_batch_jobs(lines, default_mode='video'):
+    """
+    Lê os jobs do modo em lote, um por linha: "[modo] link"
     
-    # Procurar arquivos .temp.mp4 (esses funcionam)
-    temp_files = glob.glob(os.path.join(output_path, "*.temp.mp4"))
+    Linhas vazias e comentários (#) são ignorados. Sem modo, usa default_mode.
+    É um gerador, então listas enormes (ou stdin) não são carregadas inteiras.
+    """
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        parts = line.split(None, 1)
+        if len(parts) == 2 and parts[0].lower() in BATCH_MODES:
+            yield parts[0].lower(), parts[1].strip()
+        else:
+            yield default_mode, line
+
+class BatchItem:
+    """
+    Resultado de um job do modo em lote (uma linha de JSON ao terminar)
     
-    if temp_files:
-        for temp_file in temp_files:
-            try:
-                # Nome final sem .temp
-                final_name = temp_file.replace('.temp.mp4', '.mp4')
-                
-                # Remover o arquivo .mp4 quebrado se existir
-                if os.path.exists(final_name):
-                    try:
-                        os.remove(final_name)
-                        print(f"🗑️  Removido arquivo quebrado: {os.path.basename(final_name)}")
-                    except Exception as e:
-                        print(f"⚠️  Não foi possível remover: {os.path.basename(final_name)}")
-                        print(f"   Delete manualmente e renomeie {os.path.basename(temp_file)} para .mp4")
-                        continue
-                
-                # Renomear o .temp.mp4 (que funciona) para .mp4
-                try:
-                    os.rename(temp_file, final_name)
-                    print(f"✓ Arquivo organizado: {os.path.basename(final_name)}")
-                except Exception as e:
-                    print(f"⚠️  Use o arquivo: {os.path.basename(temp_file)}")
-            except Exception as e:
-                print(f"⚠️  Erro ao processar: {str(e)}")
+    Os bytes são contados pelos hooks de progresso de cada arquivo baixado,
+    que também trazem o formato escolhido (FormatSelector) de cada vídeo.
+    """
+
+    def __init__(self, mode, url):
+        self.mode = mode
+        self.url = url
+        self.errors = []
+        self.audio = []  # Caminho de cada áudio: cópia do fluxo ou reconversão
+        self._lock = threading.Lock()
+        self._files = {}  # Arquivo -> bytes baixados
+        self._plans = {}  # Vídeo -> plano do FormatSelector
+
+    def hook(self, d):
+        if d['status'] not in ('downloading', 'finished'):
+            return
+        size = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+        info = d.get('info_dict') or {}
+        with self._lock:
+            self._files[d.get('filename')] = max(size, self._files.get(d.get('filename'), 0))
+            if info.get('_format_plan'):
+                self._plans[info.get('id')] = info['_format_plan']
+
+    def run(self, output_path, max_workers, segments=DEFAULT_SEGMENTS, quality=None, slots=None):
+        started = time.time()
+        clock = time.monotonic()
+        kwargs = {'progress_hooks': [self.hook], 'on_error': self.errors.append, 'slots': slots}
+        if self.mode in ('video', 'playlist', 'sync'):
+            kwargs['segments'] = segments
+            kwargs['quality'] = quality
+        if self.mode in ('playlist', 'sync'):
+            kwargs['max_workers'] = max_workers
+        elif self.mode.startswith('audio'):
+            kwargs['on_file'] = lambda source, target, method, acodec: self.audio.append(
+                {'file': target, 'method': method, 'codec': acodec})
+        ok = BATCH_MODES[self.mode](self.url, output_path, **kwargs)
+        elapsed = time.monotonic() - clock
+        downloaded = sum(self._files.values())
+        result = {
+            'url': self.url,
+            'mode': self.mode,
+            'ok': bool(ok) and not self.errors,
+            'error': '; '.join(self.errors) or None,
+            'files': len(self._files),
+            'bytes': downloaded,
+            'started': round(started, 3),
+            'elapsed': round(elapsed, 3),
+            'bytes_per_second': round(downloaded / elapsed) if elapsed > 0 else None,
+        }
+        if self.audio:
+            result['audio'] = self.audio
+        if self._plans:
+            plans = list(self._plans.values())
+            result['formats'] = [plan['format_id'] for plan in plans]
+            result['saved_bytes'] = sum(plan['saved_bytes'] or 0 for plan in plans)
+        return result
+
+def run_batch(jobs, output_path="downloads", concurrency=DEFAULT_WORKERS, out=None,
+              segments=DEFAULT_SEGMENTS, quality=None):
+    """
+    Baixa vários links sem interação, vários ao mesmo tempo
+    
+    Args:
+        jobs: Lista ou gerador de (modo, link)
+        output_path: Pasta onde salvar
+        concurrency: Quantidade de downloads ao mesmo tempo, no lote todo
+            (os vídeos das playlists dividem as mesmas vagas)
+        out: Onde escrever uma linha de JSON por link (padrão: sys.stdout)
+        segments: Conexões simultâneas por arquivo de vídeo
+        quality: FormatSelector dos vídeos (resolução, tamanho e codecs)
     
-    # Limpar outros temporários
-    other_temp = glob.glob(os.path.join(output_path, "*.part")) + \
-                 glob.glob(os.path.join(output_path, "*.ytdl"))
+    Returns:
+        Quantidade de links que falharam
+    """
+    out = out or sys.stdout
+    concurrency = max(1, int(concurrency))
+    write_lock = threading.Lock()
+    failed = 0
+    # Vagas de download do lote todo: uma playlist não abre mais 'concurrency'
+    # downloads além dos outros links (as listagens não ocupam vaga)
+    downloads = threading.BoundedSemaphore(concurrency)
     
-    for temp_file in other_temp:
+    def run_one(mode, url):
+        nonlocal failed
         try:
-            os.remove(temp_file)
-        except:
-            pass
+            result = BatchItem(mode, url).run(output_path, concurrency, segments, quality, downloads)
+        except Exception as e:
+            result = {'url': url, 'mode': mode, 'ok': False, 'error': str(e)}
+        with write_lock:
+            if not result['ok']:
+                failed += 1
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+    
+    if not os.path.exists(output_path):
+        os.makedirs(output_path)
+    
+    # Limitar quantos jobs ficam esperando na fila (a lista pode ser enorme)
+    slots = threading.BoundedSemaphore(concurrency * 2)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for mode, url in jobs:
+            slots.acquire()
+            future = executor.submit(run_one, mode, url)
+            future.add_done_callback(lambda _: slots.release())
+    return failed
+
+def batch_main(argv):
+    """
+    Modo em lote (sem perguntas), para scripts e agendadores
+    
+    Os resultados saem em JSON (uma linha por link) no stdout; as mensagens
+    de andamento vão para o stderr.
+    """
+    parser = argparse.ArgumentParser(
+        prog="youtube_downloader.py",
+        description="Baixa vídeos, áudios e playlists do YouTube sem interação."
+    )
+    parser.add_argument('urls', nargs='*', help="links (opcionalmente 'modo link', ex.: 'audio URL')")
+    parser.add_argument('-i', '--input', help="arquivo com um link por linha ('-' para stdin)")
+    parser.add_argument('-m', '--mode', choices=sorted(BATCH_MODES), default='video',
+                        help="modo das linhas sem modo (padrão: video)")
+    parser.add_argument('-o', '--output', default="downloads", help="pasta de destino (padrão: downloads)")
+    parser.add_argument('-j', '--concurrency', type=int, default=DEFAULT_WORKERS,
+                        help=f"downloads simultâneos (padrão: {DEFAULT_WORKERS})")
+    parser.add_argument('-r', '--rate', type=parse_rate, default=None,
+                        help="limite de banda total, ex.: 5M ou 500K (padrão: sem limite)")
+    parser.add_argument('-s', '--segments', type=int, default=DEFAULT_SEGMENTS,
+                        help=f"conexões simultâneas por arquivo de vídeo (padrão: {DEFAULT_SEGMENTS})")
+    parser.add_argument('--max-height', type=int, default=DEFAULT_MAX_HEIGHT,
+                        help=f"resolução máxima dos vídeos, 0 = sem limite (padrão: {DEFAULT_MAX_HEIGHT})")
+    parser.add_argument('--max-size', type=parse_size, default=None,
+                        help="tamanho máximo de cada vídeo, ex.: 200M (padrão: sem limite)")
+    parser.add_argument('--codec', action='append', dest='codecs', default=None,
+                        help="codec de vídeo preferido, ex.: av01, vp9, avc1 (pode repetir; "
+                             "padrão: só H.264 + AAC em MP4)")
+    parser.add_argument('--local', action='store_true',
+                        help="baixar neste processo mesmo com o serviço local rodando "
+                             "(com o serviço, -j é ignorado e -r muda o limite do serviço)")
+    args = parser.parse_args(argv)
+    
+    if not args.urls and not args.input:
+        parser.error("informe links ou --input")
+    quality = FormatSelector(args.max_height or None, args.max_size, args.codecs)
+    
+    lines = iter(args.urls)
+    input_file = None
+    if args.input == '-':
+        lines = itertools.chain(lines, sys.stdin)
+    elif args.input:
+        input_file = open(args.input, encoding='utf-8')
+        lines = itertools.chain(lines, input_file)
+    
+    # Com o serviço local rodando, os downloads entram na fila dele
+    client = None
+    if not args.local:
+        from youtube_downloader_daemon import ServiceClient
+        client = ServiceClient.find()
+    
+    # Manter o stdout só com o JSON
+    results = sys.stdout
+    sys.stdout = sys.stderr
+    try:
+        if client is not None:
+            print(f"📡 Usando o serviço local em {client.url}")
+            if args.rate is not None:
+                client.set_rate(args.rate)
+            failed = client.run_batch(read_batch_jobs(lines, args.mode), args.output, out=results,
+                                      segments=args.segments, quality=quality)
+        else:
+            bandwidth_governor.set_rate(args.rate)
+            failed = run_batch(read_batch_jobs(lines, args.mode), args.output, args.concurrency, out=results,
+                               segments=args.segments, quality=quality)
+    finally:
+        sys.stdout = results
+        if input_file:
+            input_file.close()
+    return 1 if failed else 0
+
+def offer_resume():
+    """Oferece retomar os downloads que ficaram pela metade"""
+    jobs = download_journal.interrupted()
+    if not jobs:
+        return
+    
+    print(f"↩️  {len(jobs)} download(s) interrompido(s) encontrado(s):")
+    for job in jobs:
+        print(f"   - {job['url']} ({'áudio' if job['profile'] == 'audio' else 'vídeo'})")
+    answer = input("Retomar agora? (s = sim, n = descartar, Enter = depois): ").strip().lower()
+    
+    if answer == 's':
+        with ProgressTicker(print_progress):
+            results = resume_interrupted([progress_hook], find_ffmpeg())
+        resumed = sum(1 for _, ok in results if ok)
+        print(f"\n✅ {resumed}/{len(results)} download(s) retomado(s)")
+    elif answer == 'n':
+        for job in jobs:
+            download_journal.discard(job['job_id'])
+        print("🗑️  Downloads interrompidos descartados.")
 
 def main():
     """Função principal - interface do usuário"""
@@ -277,6 +3328,8 @@ def main():
     print("=" * 60)
     print()
     
+    offer_resume()
+    
     while True:
         print("\n📋 MENU:")
         print("1. Baixar vídeo (melhor qualidade)")
@@ -314,7 +3367,9 @@ def main():
         if choice == '1':
             download_video(url, output_path)
         elif choice == '2':
-            download_audio_only(url, output_path)
+            # Sem MP3, o áudio é só copiado no formato original (mais rápido, sem perda)
+            to_mp3 = input("🎵 Converter para MP3? (s/n, Enter = s): ").strip().lower()
+            download_audio_only(url, output_path, keep_codec=(to_mp3 == 'n'))
         elif choice == '3':
             download_playlist(url, output_path)
         
@@ -328,4 +3383,7 @@ def main():
             break
 
 if __name__ == "__main__":
+    ensure_yt_dlp()
+    if len(sys.argv) > 1:
+        sys.exit(batch_main(sys.argv[1:]))
     main()
@@ -0,0 +1,993 @@
+#!/usr/bin/env python3
+"""
+Serviço local de downloads do YouTube Downloader
+Uma fila de jobs, um pool de downloads e um limite de banda para o CLI e a interface
+
+O serviço escuta só em 127.0.0.1 (HTTP + JSON) e grava a porta e um token
+de acesso em ~/.ytd/daemon.json, de onde os clientes (modo em lote e
+interface gráfica) descobrem que ele está rodando. Sem o serviço, os
+clientes continuam baixando no próprio processo.
+
+Rotas (todas pedem o token, no cabeçalho X-YTD-Token ou em
+"Authorization: Bearer <token>"):
+    GET    /status            fila, downloads ativos e limite de banda
+    GET    /jobs              todos os jobs
+    POST   /jobs              novo job: {"url", "mode", "output", "priority", "name", "segments",
+                              "quality": {"max_height", "max_size", "codecs"}}
+    GET    /jobs/<id>         um job
+    PATCH  /jobs/<id>         nova prioridade: {"priority": 2}
+    DELETE /jobs/<id>         cancelar
+    PATCH  /settings          limite de banda total: {"rate": 5242880}
+    GET    /events?since=N    progresso: uma linha de JSON com os jobs que mudaram
+    GET    /metrics           métricas dos jobs no formato de texto do Prometheus
+
+Uso:
+    python youtube_downloader_daemon.py
+    python youtube_downloader_daemon.py --port 0 -w 4 --rate 5M
+"""
+
+import argparse
+import heapq
+import http.server
+import itertools
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+
+from youtube_downloader import (
+    APP_DATA_DIR, AUDIO_CODECS, DEFAULT_SEGMENTS, DEFAULT_WORKERS, PROGRESS_FPS, FormatSelector,
+    PlaylistSync, ProgressAggregator, bandwidth_governor, build_ydl_opts, download_journal, download_with_journal, entry_url,
+    ensure_yt_dlp, find_ffmpeg, job_metrics, parse_rate, stream_playlist, transcode_pool, ydl_pool
+)
+
+# Porta padrão do serviço (0 = qualquer porta livre)
+DEFAULT_PORT = 8754
+
+# Onde o serviço publica a porta e o token para os clientes
+SERVICE_FILE = os.path.join(APP_DATA_DIR, "daemon.json")
+
+JOB_MODES = ('video', 'audio', 'audio-original', 'playlist', 'sync')
+
+# Modos que listam uma playlist e viram jobs filhos ('sync' só baixa as entradas novas)
+PLAYLIST_MODES = ('playlist', 'sync')
+
+# Estados finais de um job
+FINAL_STATES = ('done', 'error', 'cancelled')
+
+# Jobs concluídos guardados para consulta (os mais antigos saem primeiro)
+MAX_FINISHED = 1000
+
+# Campos de um job no resultado do modo em lote (mesmo formato de BatchItem)
+BATCH_FIELDS = ('url', 'mode', 'ok', 'error', 'files', 'bytes', 'started', 'elapsed', 'bytes_per_second', 'audio',
+                'formats', 'saved_bytes')
+
+# Intervalo das linhas vazias do /events, para o cliente perceber conexões mortas
+HEARTBEAT_INTERVAL = 15.0
+
+class ServiceError(Exception):
+    """Erro de uma operação do serviço, com o código HTTP correspondente"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+class JobCancelled(Exception):
+    """Levantada pelo hook de progresso para interromper um download cancelado"""
+
+class ServiceJob:
+    """
+    Um job da fila: um link baixado num modo, ou uma playlist
+
+    Playlists não baixam nada diretamente: a listagem vira jobs filhos
+    ('video'), um por entrada, que disputam a fila com os outros jobs e
+    herdam a prioridade. A playlist termina quando todos os filhos terminam.
+    No modo 'sync', só as entradas novas viram filhos (ver PlaylistSync).
+    """
+
+    def __init__(self, job_id, url, mode, output, priority, name=None, segments=DEFAULT_SEGMENTS, parent=None,
+                 quality=None):
+        self.id = job_id
+        self.url = url
+        self.mode = mode
+        self.output = output
+        self.name = name
+        self.priority = priority
+        self.segments = segments
+        self.quality = quality  # FormatSelector dos vídeos (None = padrão)
+        self.parent = parent
+        self.title = None
+        self.status = 'queued'
+        self.error = None
+        self.skipped = False
+        self.cancel_requested = False
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0
+        self.journal_id = None
+        self.progress = None  # Último estado do ProgressAggregator
+        self.children = []
+        self.listed = False
+        self.sync = None  # PlaylistSync do modo 'sync'
+        self.sync_entries = {}  # Filho -> índice da entrada na playlist
+        self.audio = []  # Caminho de cada áudio: cópia do fluxo ou reconversão
+        self._files = {}  # Arquivo -> bytes baixados
+        self._plans = {}  # Vídeo -> plano do FormatSelector
+
+    def hook(self, d):
+        """Hook de progresso: conta os bytes e interrompe se o job foi cancelado"""
+        if self.cancel_requested:
+            raise JobCancelled("Cancelado")
+        if d['status'] not in ('downloading', 'finished'):
+            return
+        size = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+        self._files[d.get('filename')] = max(size, self._files.get(d.get('filename'), 0))
+        info = d.get('info_dict') or {}
+        if info.get('_format_plan'):
+            self._plans[info.get('id')] = info['_format_plan']
+
+    def set_info(self, info):
+        self.title = info.get('title')
+
+    def file_done(self, source, target, method, acodec):
+        self.audio.append({'file': target, 'method': method, 'codec': acodec})
+
+    def to_dict(self, jobs=None):
+        """Estado do job em JSON; com 'jobs', playlists somam os filhos"""
+        children = [jobs[child] for child in self.children if child in jobs] if jobs else []
+        files = dict(self._files)
+        audio = list(self.audio)
+        plans = dict(self._plans)
+        for child in children:
+            files.update(child._files)
+            audio.extend(child.audio)
+            plans.update(child._plans)
+        downloaded = sum(files.values())
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else None
+        data = {
+            'id': self.id,
+            'url': self.url,
+            'mode': self.mode,
+            'output': self.output,
+            'name': self.name,
+            'title': self.title,
+            'priority': self.priority,
+            'parent': self.parent,
+            'status': self.status,
+            'ok': self.status == 'done' and not self.error,
+            'error': self.error,
+            'skipped': self.skipped,
+            'files': len(files),
+            'bytes': downloaded,
+            'created': round(self.created, 3),
+            'started': round(self.started, 3) if self.started else None,
+            'elapsed': round(elapsed, 3) if elapsed is not None else None,
+            'bytes_per_second': round(downloaded / elapsed) if elapsed else None,
+            'progress': self.progress,
+            'version': self.version,
+        }
+        if audio:
+            data['audio'] = audio
+        if self.quality is not None:
+            data['quality'] = self.quality.to_dict()
+        if plans:
+            data['formats'] = [plan['format_id'] for plan in plans.values()]
+            data['saved_bytes'] = sum(plan['saved_bytes'] or 0 for plan in plans.values())
+        if self.mode in PLAYLIST_MODES:
+            states = [child.status for child in children]
+            data['children'] = {
+                'total': len(self.children),
+                'listed': self.listed,
+                'done': states.count('done'),
+                'failed': states.count('error'),
+                'cancelled': states.count('cancelled'),
+                'active': sum(1 for state in states if state in ('downloading', 'processing')),
+            }
+        return data
+
+class DownloadService:
+    """
+    Fila única de downloads com prioridade, para todos os clientes
+
+    Os workers pegam sempre o job na fila de maior prioridade (e, no
+    empate, o mais antigo). Mudar a prioridade de um job em andamento muda
+    o peso dele na divisão do limite de banda. Cancelar um job em
+    andamento interrompe o download no próximo evento de progresso; o
+    arquivo parcial deixa de ser protegido pelo diário.
+
+    O progresso dos downloads vai para um ProgressAggregator, lido em taxa
+    fixa (PROGRESS_FPS) por uma thread que publica as mudanças para /events.
+
+    Args:
+        max_workers: Downloads simultâneos
+        segments: Conexões por arquivo quando o job não informa
+        ffmpeg_location: Caminho do FFmpeg (padrão: procurar)
+        max_finished: Jobs concluídos guardados para consulta (os que algum
+            cliente conectado a /events ainda não recebeu esperam por ele)
+    """
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, segments=DEFAULT_SEGMENTS, ffmpeg_location=None,
+                 max_finished=MAX_FINISHED):
+        self.max_workers = max(1, int(max_workers))
+        self.segments = segments
+        self.ffmpeg_location = ffmpeg_location or find_ffmpeg()
+        self.max_finished = max_finished
+        self.jobs = {}
+        self.version = 0
+        self.progress = ProgressAggregator()
+        self._cond = threading.Condition()
+        self._queue = []  # Heap de (-prioridade, ordem, id)
+        self._order = itertools.count()
+        self._ids = itertools.count(1)
+        self._finished = []  # Ids de jobs de primeiro nível concluídos, em ordem
+        self._streams = {}  # Assinatura de /events -> última versão entregue
+        self._stream_ids = itertools.count(1)
+        self._stopping = False
+        self._threads = []
+        self._lister = ThreadPoolExecutor(max_workers=2)
+
+    def start(self):
+        for _ in range(self.max_workers):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._ticker, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self):
+        """Para os workers; downloads em andamento são cancelados (e ficam retomáveis)"""
+        with self._cond:
+            self._stopping = True
+            for job in self.jobs.values():
+                if job.status == 'downloading':
+                    job.cancel_requested = True
+            self._cond.notify_all()
+        self._lister.shutdown(wait=False)
+
+    # Chamar com o lock nos métodos abaixo que terminam em _locked
+
+    def _changed_locked(self, job):
+        self.version += 1
+        job.version = self.version
+        self._cond.notify_all()
+
+    def _enqueue_locked(self, job):
+        heapq.heappush(self._queue, (-job.priority, next(self._order), job.id))
+
+    def _get(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise ServiceError(f"Job {job_id} não encontrado", 404)
+        return job
+
+    def submit(self, url, mode='video', output='downloads', priority=1.0, name=None, segments=None,
+               parent=None, quality=None):
+        """
+        Coloca um job na fila e devolve o seu estado
+        
+        'quality' são os limites do FormatSelector, como FormatSelector ou em
+        JSON ({"max_height", "max_size", "codecs"}); vale para os vídeos.
+        """
+        if not url or not isinstance(url, str):
+            raise ServiceError("Informe o link ('url')")
+        if mode not in JOB_MODES:
+            raise ServiceError(f"Modo inválido: {mode} (use {', '.join(JOB_MODES)})")
+        if name is not None and (os.path.isabs(name) or os.pardir in name.replace('\\', '/').split('/')):
+            raise ServiceError("'name' deve ser só o nome do arquivo")
+        try:
+            priority = max(float(priority), 0.01)
+            segments = max(1, int(segments or self.segments))
+        except (TypeError, ValueError):
+            raise ServiceError("'priority' e 'segments' devem ser números")
+        if isinstance(quality, dict):
+            if not isinstance(quality.get('codecs') or [], list):
+                raise ServiceError("'codecs' deve ser uma lista")
+            try:
+                quality = FormatSelector(**quality)
+            except (TypeError, ValueError):
+                raise ServiceError("'quality' aceita só 'max_height' e 'max_size' (números) e 'codecs'")
+        elif quality is not None and not isinstance(quality, FormatSelector):
+            raise ServiceError("'quality' deve ser um objeto")
+
+        with self._cond:
+            if self._stopping:
+                raise ServiceError("O serviço está sendo encerrado", 503)
+            job = ServiceJob(str(next(self._ids)), url.strip(), mode, os.path.abspath(output or 'downloads'),
+                             priority, name, segments, parent, quality)
+            self.jobs[job.id] = job
+            if parent is not None:
+                self.jobs[parent].children.append(job.id)
+            if mode in PLAYLIST_MODES:
+                job.status = 'listing'
+                job.started = time.time()
+                self._lister.submit(self._list_playlist, job)
+            else:
+                self._enqueue_locked(job)
+            self._changed_locked(job)
+            return job.to_dict(self.jobs)
+
+    def list(self):
+        with self._cond:
+            return [job.to_dict(self.jobs) for job in self.jobs.values()]
+
+    def get(self, job_id):
+        with self._cond:
+            return self._get(job_id).to_dict(self.jobs)
+
+    def cancel(self, job_id):
+        """Cancela um job (e os filhos, se for playlist)"""
+        with self._cond:
+            job = self._get(job_id)
+            if job.status in FINAL_STATES:
+                raise ServiceError(f"Job {job_id} já terminou ({job.status})", 409)
+            if job.status == 'processing':
+                raise ServiceError(f"Job {job_id} já está convertendo o áudio", 409)
+            self._cancel_locked(job)
+            return job.to_dict(self.jobs)
+
+    def _cancel_locked(self, job):
+        job.cancel_requested = True
+        for child_id in job.children:
+            child = self.jobs[child_id]
+            if child.status in ('queued', 'downloading'):
+                self._cancel_locked(child)
+        if job.status == 'queued':
+            # Sai da fila na próxima vez que um worker passar por ele
+            self._finish_locked(job, 'cancelled')
+        elif job.mode in PLAYLIST_MODES and job.listed:
+            self._check_playlist_locked(job)
+        self._changed_locked(job)
+
+    def set_priority(self, job_id, priority):
+        """Muda a prioridade na fila e o peso na divisão da banda (filhos inclusos)"""
+        try:
+            priority = max(float(priority), 0.01)
+        except (TypeError, ValueError):
+            raise ServiceError("'priority' deve ser um número")
+        with self._cond:
+            job = self._get(job_id)
+            self._set_priority_locked(job, priority)
+            return job.to_dict(self.jobs)
+
+    def _set_priority_locked(self, job, priority):
+        if job.status in FINAL_STATES:
+            return
+        job.priority = priority
+        if job.status == 'queued':
+            # A entrada antiga fica no heap e é ignorada ao sair
+            self._enqueue_locked(job)
+        elif job.journal_id is not None:
+            bandwidth_governor.register(job.journal_id, priority)
+        for child_id in job.children:
+            self._set_priority_locked(self.jobs[child_id], priority)
+        self._changed_locked(job)
+
+    def set_rate(self, rate):
+        bandwidth_governor.set_rate(rate)
+        return self.status()
+
+    def status(self):
+        with self._cond:
+            states = [job.status for job in self.jobs.values() if job.mode not in PLAYLIST_MODES]
+            return {
+                'version': self.version,
+                'workers': self.max_workers,
+                'queued': states.count('queued'),
+                'active': sum(1 for state in states if state in ('downloading', 'processing')),
+                'jobs': len(self.jobs),
+                'bandwidth': bandwidth_governor.stats(),
+            }
+
+    def subscribe(self, since):
+        """
+        Registra um leitor de mudanças a partir da versão 'since'
+
+        Enquanto a assinatura existir, jobs concluídos que ele ainda não
+        recebeu não são descartados (ver _evict_locked).
+        """
+        with self._cond:
+            stream = next(self._stream_ids)
+            self._streams[stream] = since
+            return stream
+
+    def unsubscribe(self, stream):
+        with self._cond:
+            self._streams.pop(stream, None)
+            self._evict_locked()
+
+    def changes(self, since, timeout=None, stream=None):
+        """
+        Espera algum job mudar depois da versão 'since'
+
+        Args:
+            stream: Assinatura (subscribe) que recebe as mudanças, se houver
+
+        Returns:
+            (versão atual, lista dos jobs que mudaram); a lista vem vazia se
+            passou o timeout sem mudanças
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > since or self._stopping, timeout)
+            changed = [job.to_dict(self.jobs) for job in self.jobs.values() if job.version > since]
+            if stream is not None:
+                self._streams[stream] = self.version
+                self._evict_locked()
+            return self.version, changed
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                while not self._queue and not self._stopping:
+                    self._cond.wait()
+                if self._stopping:
+                    return None
+                priority, _, job_id = heapq.heappop(self._queue)
+                job = self.jobs.get(job_id)
+                # Entradas de jobs cancelados ou com prioridade trocada são ignoradas
+                if job is None or job.status != 'queued' or -priority != job.priority:
+                    continue
+                job.status = 'downloading'
+                job.started = time.time()
+                self._changed_locked(job)
+                return job
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                self._run(job)
+            except Exception as e:
+                self._finish(job, 'error', str(e))
+
+    def _run(self, job):
+        """Baixa um job de vídeo ou áudio (a conversão de áudio fica no TranscodePool)"""
+        profile = job.mode
+        outtmpl = os.path.join(job.output, job.name or '%(title)s.%(ext)s')
+        extra = {'quiet': True, 'no_warnings': True, 'noprogress': True}
+        postprocess = None
+        if profile in AUDIO_CODECS:
+            transcoder = transcode_pool(self.ffmpeg_location)
+            extra['postprocessors'] = []
+
+            def postprocess(info):
+                return transcoder.submit_info(info, AUDIO_CODECS[profile], on_file=job.file_done)
+
+        ydl_opts = build_ydl_opts(profile, outtmpl, [job.hook, self.progress.hook(job.id)],
+                                  self.ffmpeg_location, job.quality, **extra)
+        job.journal_id = download_journal.job_id(job.url, profile, outtmpl)
+        os.makedirs(job.output, exist_ok=True)
+        try:
+            result = download_with_journal(job.url, profile, ydl_opts, on_info=job.set_info, skip_done=True,
+                                           postprocess=postprocess, segments=job.segments, priority=job.priority)
+        except JobCancelled:
+            # Cancelado pelo usuário: não oferecer retomar depois (ao encerrar
+            # o serviço, o job continua no diário para ser retomado)
+            if not self._stopping:
+                download_journal.discard(job.journal_id)
+            self._finish(job, 'cancelled')
+            return
+
+        if isinstance(result, Future):
+            with self._cond:
+                job.status = 'processing'
+                self._changed_locked(job)
+            result.add_done_callback(lambda future: self._finish(
+                job, 'error' if future.exception() else 'done',
+                str(future.exception()) if future.exception() else None))
+            return
+        job.skipped = result is None
+        self._finish(job, 'done')
+
+    def _finish(self, job, status, error=None):
+        with self._cond:
+            self._finish_locked(job, status, error)
+
+    def _finish_locked(self, job, status, error=None):
+        job.status = status
+        job.error = error
+        job.finished = time.time()
+        self.progress.finish(job.id)
+        self._changed_locked(job)
+        if job.parent is not None:
+            self._check_playlist_locked(self.jobs[job.parent])
+        else:
+            self._finished.append(job.id)
+            self._evict_locked()
+
+    def _check_playlist_locked(self, job):
+        """Conclui a playlist quando a listagem e todos os filhos terminaram"""
+        if job.status in FINAL_STATES or not job.listed:
+            return
+        states = [self.jobs[child].status for child in job.children]
+        if any(state not in FINAL_STATES for state in states):
+            return
+        failed = states.count('error')
+        if job.sync is not None and not job.cancel_requested:
+            # Gravar a listagem: os filhos que falharam continuam novos na próxima vez
+            job.sync.commit({idx: self.jobs[child].status == 'done' for child, idx in job.sync_entries.items()})
+        if job.cancel_requested:
+            self._finish_locked(job, 'cancelled')
+        elif failed:
+            self._finish_locked(job, 'done', f"{failed} de {len(states)} vídeo(s) falharam")
+        else:
+            self._finish_locked(job, 'done', job.error)
+
+    def _evict_locked(self):
+        # Um job só sai depois que todos os leitores de /events viram o estado final
+        delivered = min(self._streams.values(), default=None)
+        while len(self._finished) > self.max_finished:
+            job = self.jobs.get(self._finished[0])
+            if job is not None and delivered is not None and job.version > delivered:
+                return
+            self.jobs.pop(self._finished.pop(0), None)
+            for child in job.children if job else ():
+                self.jobs.pop(child, None)
+
+    def _list_playlist(self, job):
+        """Lista a playlist e cria um job filho por entrada, conforme as páginas chegam"""
+        playlist = {}
+        sync = PlaylistSync(job.url, 'video', job.output) if job.mode == 'sync' else None
+        try:
+            if sync is not None:
+                entries = sync.entries(on_info=playlist.update)
+            else:
+                entries = stream_playlist(job.url, on_info=playlist.update)
+            for idx, entry in entries:
+                if job.cancel_requested or self._stopping:
+                    break
+                job.title = playlist.get('title')
+                child = self.submit(entry_url(entry), 'video', job.output, job.priority,
+                                    name=sync.filename(idx) if sync else f'{idx+1} - %(title)s.%(ext)s',
+                                    segments=job.segments, parent=job.id, quality=job.quality)
+                if sync is not None:
+                    job.sync_entries[child['id']] = idx
+            if playlist.get('_type') != 'playlist':
+                raise ServiceError("Não foi possível detectar a playlist")
+        except Exception as e:
+            sync = None
+            with self._cond:
+                job.error = str(e)
+                if not job.children:
+                    job.listed = True
+                    self._finish_locked(job, 'error', str(e))
+                    return
+        with self._cond:
+            job.title = job.title or playlist.get('title')
+            # Listagem incompleta (cancelada ou interrompida) não vira a nova referência
+            job.sync = sync if not job.cancel_requested and not self._stopping else None
+            job.listed = True
+            job.status = 'downloading' if job.status == 'listing' else job.status
+            self._changed_locked(job)
+            self._check_playlist_locked(job)
+
+    def _ticker(self):
+        """Publica o progresso dos downloads em taxa fixa"""
+        interval = 1.0 / PROGRESS_FPS
+        while not self._stopping:
+            time.sleep(interval)
+            items = self.progress.poll()['items']
+            if not items:
+                continue
+            with self._cond:
+                for job_id, item in items.items():
+                    job = self.jobs.get(job_id)
+                    if job is None or job.progress == item:
+                        continue
+                    job.progress = item
+                    self._changed_locked(job)
+                    if job.parent is not None and job.parent in self.jobs:
+                        self._changed_locked(self.jobs[job.parent])
+
+class ServiceHandler(http.server.BaseHTTPRequestHandler):
+    """Rotas HTTP do DownloadService (ver o início do arquivo)"""
+
+    service = None
+    token = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return {}
+        try:
+            data = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise ServiceError("JSON inválido")
+        if not isinstance(data, dict):
+            raise ServiceError("O corpo deve ser um objeto JSON")
+        return data
+
+    def _authorized(self):
+        token = self.headers.get('X-YTD-Token') or ''
+        authorization = self.headers.get('Authorization') or ''
+        if authorization.startswith('Bearer '):
+            token = authorization[len('Bearer '):].strip()
+        return secrets.compare_digest(token, self.token)
+
+    def _send_metrics(self):
+        body = job_metrics.prometheus_text().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        if not self._authorized():
+            self._send(401, {'error': "Token inválido"})
+            return
+        parsed = urlparse(self.path)
+        parts = [part for part in parsed.path.split('/') if part]
+        service = self.service
+        try:
+            if method == 'GET' and parts == ['metrics']:
+                self._send_metrics()
+                return
+            if method == 'GET' and parts == ['events']:
+                since = int(parse_qs(parsed.query).get('since', ['0'])[0])
+                self._stream_events(since)
+                return
+            if method == 'GET' and parts == ['status']:
+                result = service.status()
+            elif method == 'PATCH' and parts == ['settings']:
+                result = service.set_rate(self._body().get('rate'))
+            elif parts == ['jobs'] and method == 'GET':
+                result = {'jobs': service.list()}
+            elif parts == ['jobs'] and method == 'POST':
+                body = self._body()
+                result = service.submit(body.get('url'), body.get('mode', 'video'), body.get('output', 'downloads'),
+                                        body.get('priority', 1.0), body.get('name'), body.get('segments'),
+                                        quality=body.get('quality'))
+                self._send(201, result)
+                return
+            elif len(parts) == 2 and parts[0] == 'jobs' and method == 'GET':
+                result = service.get(parts[1])
+            elif len(parts) == 2 and parts[0] == 'jobs' and method == 'PATCH':
+                result = service.set_priority(parts[1], self._body().get('priority'))
+            elif len(parts) == 2 and parts[0] == 'jobs' and method == 'DELETE':
+                result = service.cancel(parts[1])
+            else:
+                self._send(404, {'error': "Rota não encontrada"})
+                return
+        except ServiceError as e:
+            self._send(e.status, {'error': str(e)})
+            return
+        except Exception as e:
+            self._send(500, {'error': str(e)})
+            return
+        self._send(200, result)
+
+    def _stream_events(self, since):
+        """Uma linha de JSON por mudança ({"version", "jobs"}), no máximo PROGRESS_FPS por segundo"""
+        # Assinar antes de responder: quando o cliente recebe os cabeçalhos,
+        # nenhum job concluído depois de 'since' pode mais sumir sem ser visto
+        stream = self.service.subscribe(since)
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            interval = 1.0 / PROGRESS_FPS
+            while not self.service._stopping:
+                since, jobs = self.service.changes(since, HEARTBEAT_INTERVAL, stream)
+                line = json.dumps({'version': since, 'jobs': jobs}, ensure_ascii=False)
+                self.wfile.write(line.encode('utf-8') + b"\n")
+                self.wfile.flush()
+                time.sleep(interval)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.service.unsubscribe(stream)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+class DownloadServer:
+    """
+    Servidor HTTP do serviço em 127.0.0.1
+
+    Ao iniciar, grava a porta e o token em service_file (só o usuário lê)
+    para os clientes; o arquivo é apagado ao encerrar.
+
+    Args:
+        service: DownloadService a expor
+        port: Porta (0 = qualquer porta livre)
+        service_file: Arquivo de descoberta (padrão: ~/.ytd/daemon.json)
+    """
+
+    def __init__(self, service, port=DEFAULT_PORT, service_file=None):
+        self.service = service
+        self.service_file = service_file or SERVICE_FILE
+        self.token = secrets.token_urlsafe(24)
+        handler = type('Handler', (ServiceHandler,), {'service': service, 'token': self.token})
+        self.httpd = http.server.ThreadingHTTPServer(('127.0.0.1', port), handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.url = f'http://127.0.0.1:{self.port}'
+
+    def _publish(self):
+        os.makedirs(os.path.dirname(self.service_file), exist_ok=True)
+        temp_path = f"{self.service_file}.{os.getpid()}.tmp"
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'url': self.url, 'token': self.token, 'pid': os.getpid()}, f)
+        os.replace(temp_path, self.service_file)
+
+    def serve_forever(self):
+        self.service.start()
+        self._publish()
+        try:
+            self.httpd.serve_forever()
+        finally:
+            self.close()
+
+    def start(self):
+        """Roda o servidor numa thread (para testes e para o benchmark)"""
+        self.service.start()
+        self._publish()
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        self.service.stop()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        try:
+            with open(self.service_file, encoding='utf-8') as f:
+                if json.load(f).get('token') == self.token:
+                    os.remove(self.service_file)
+        except (OSError, ValueError):
+            pass
+
+class ServiceClient:
+    """
+    Cliente do serviço local (usado pelo modo em lote e pela interface)
+
+    Args:
+        url: Endereço do serviço ('http://127.0.0.1:8754')
+        token: Token de acesso publicado pelo serviço
+        timeout: Timeout das requisições, em segundos
+    """
+
+    def __init__(self, url, token, timeout=10):
+        self.url = url.rstrip('/')
+        self.token = token
+        self.timeout = timeout
+        # Conexão direta: proxies do sistema não devem ver o 127.0.0.1
+        self._opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+    @classmethod
+    def find(cls, service_file=None):
+        """Cliente do serviço em execução, ou None se não houver serviço respondendo"""
+        try:
+            with open(service_file or SERVICE_FILE, encoding='utf-8') as f:
+                data = json.load(f)
+            client = cls(data['url'], data['token'], timeout=2)
+            client.status()
+        except (OSError, ValueError, KeyError, ServiceError):
+            return None
+        client.timeout = 10
+        return client
+
+    def _open(self, method, path, body=None, timeout=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method, headers={
+            'X-YTD-Token': self.token, 'Content-Type': 'application/json'})
+        try:
+            return self._opener.open(request, timeout=timeout or self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.load(e).get('error') or str(e)
+            except ValueError:
+                message = str(e)
+            raise ServiceError(message, e.code)
+        except (urllib.error.URLError, OSError) as e:
+            raise ServiceError(f"Serviço indisponível: {e}", 503)
+
+    def _request(self, method, path, body=None):
+        with self._open(method, path, body) as response:
+            return json.load(response)
+
+    def status(self):
+        return self._request('GET', '/status')
+
+    def jobs(self):
+        return self._request('GET', '/jobs')['jobs']
+
+    def job(self, job_id):
+        return self._request('GET', f'/jobs/{job_id}')
+
+    def submit(self, url, mode='video', output='downloads', priority=1.0, name=None, segments=None,
+               quality=None):
+        """Coloca um link na fila (a pasta é resolvida aqui, não no serviço)"""
+        return self._request('POST', '/jobs', {
+            'url': url, 'mode': mode, 'output': os.path.abspath(output), 'priority': priority,
+            'name': name, 'segments': segments, 'quality': quality.to_dict() if quality else None,
+        })
+
+    def cancel(self, job_id):
+        return self._request('DELETE', f'/jobs/{job_id}')
+
+    def set_priority(self, job_id, priority):
+        return self._request('PATCH', f'/jobs/{job_id}', {'priority': priority})
+
+    def set_rate(self, rate):
+        return self._request('PATCH', '/settings', {'rate': rate})
+
+    def events(self, since=0):
+        """
+        Gera (versão, jobs que mudaram) conforme o serviço publica
+
+        A conexão é aberta já na chamada (não na primeira leitura), então as
+        mudanças a partir de 'since' ficam garantidas desde o retorno.
+        """
+        response = self._open('GET', f'/events?since={since}', timeout=HEARTBEAT_INTERVAL * 2)
+
+        def read():
+            with response:
+                for line in response:
+                    event = json.loads(line)
+                    yield event['version'], event['jobs']
+        return read()
+
+    def subscribe(self):
+        """Eventos a partir de agora, para passar a wait() depois de enviar os jobs"""
+        return self.events(self.status()['version'])
+
+    def wait(self, job_ids, on_update=None, events=None):
+        """
+        Acompanha os jobs até todos terminarem
+
+        Args:
+            job_ids: Ids dos jobs (os filhos de playlists são acompanhados
+                pelo job da playlist)
+            on_update: Callback (job) chamado a cada mudança de qualquer job,
+                inclusive filhos das playlists acompanhadas
+            events: Eventos assinados antes de enviar os jobs (subscribe());
+                sem eles, jobs já descartados pelo serviço não chegam
+
+        Returns:
+            Dicionário id -> estado final do job
+        """
+        job_ids = set(job_ids)
+        pending = set(job_ids)
+        results = {}
+        for _, jobs in events if events is not None else self.events():
+            for job in jobs:
+                if on_update and (job['id'] in job_ids or job['parent'] in job_ids):
+                    on_update(job)
+                if job['id'] in pending and job['status'] in FINAL_STATES:
+                    pending.discard(job['id'])
+                    results[job['id']] = job
+            if not pending:
+                return results
+        raise ServiceError("O serviço encerrou a conexão", 503)
+
+    def run_batch(self, jobs, output_path="downloads", out=None, segments=None, quality=None):
+        """
+        Modo em lote pelo serviço: coloca os links na fila dele e espera
+
+        Escreve uma linha de JSON por link, no mesmo formato de run_batch
+        (a concorrência é a do serviço).
+
+        Returns:
+            Quantidade de links que falharam
+        """
+        out = out or sys.stdout
+        jobs = list(jobs)
+        if not jobs:
+            return 0
+        # Assinar antes de enviar: com muitos links, os primeiros podem acabar
+        # (e sair da lista do serviço) antes de o último ser enviado
+        events = self.subscribe()
+        submitted = {self.submit(url, mode, output_path, segments=segments, quality=quality)['id']
+                     for mode, url in jobs}
+        failed = 0
+        
+        def write(job):
+            nonlocal failed
+            if job['id'] not in submitted or job['status'] not in FINAL_STATES:
+                return
+            result = {key: job.get(key) for key in BATCH_FIELDS if key in job}
+            if not result['ok']:
+                failed += 1
+            out.write(json.dumps(result, ensure_ascii=False) + "\n")
+            out.flush()
+        
+        self.wait(submitted, on_update=write, events=events)
+        return failed
+
+class RemoteJobs:
+    """
+    Progresso de jobs do serviço no formato de DownloadScheduler.aggregate()
+
+    Alimentado por ServiceClient.wait(on_update=...), para a interface
+    desenhar jobs remotos com o mesmo código dos downloads locais.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+
+    def update(self, job):
+        self._jobs[job['id']] = job
+
+    def aggregate(self):
+        jobs = [job for job in list(self._jobs.values()) if job['mode'] not in PLAYLIST_MODES]
+        if not jobs:
+            return {'progress': 0.0, 'done': 0, 'failed': 0, 'total': 0, 'active': 0, 'speed': None,
+                    'saved_bytes': 0}
+        running = 0.0
+        for job in jobs:
+            if job['status'] in FINAL_STATES:
+                running += 1.0
+            elif job['status'] == 'processing':
+                running += 0.99
+            elif job['progress'] and job['progress']['progress']:
+                running += min(job['progress']['progress'], 0.99)
+        speeds = [job['progress']['speed'] for job in jobs
+                  if job['status'] == 'downloading' and job['progress'] and job['progress']['speed']]
+        return {
+            'progress': running / len(jobs),
+            'done': sum(1 for job in jobs if job['status'] == 'done'),
+            'failed': sum(1 for job in jobs if job['status'] in ('error', 'cancelled')),
+            'total': len(jobs),
+            'active': sum(1 for job in jobs if job['status'] in ('downloading', 'processing')),
+            'speed': sum(speeds) if speeds else None,
+            'saved_bytes': sum(job.get('saved_bytes') or 0 for job in jobs if job['status'] == 'done'),
+        }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serviço local de downloads do YouTube Downloader.")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"porta (padrão: {DEFAULT_PORT})")
+    parser.add_argument('-w', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"downloads simultâneos (padrão: {DEFAULT_WORKERS})")
+    parser.add_argument('-r', '--rate', type=parse_rate, default=None,
+                        help="limite de banda total, ex.: 5M ou 500K (padrão: sem limite)")
+    parser.add_argument('-s', '--segments', type=int, default=DEFAULT_SEGMENTS,
+                        help=f"conexões simultâneas por arquivo (padrão: {DEFAULT_SEGMENTS})")
+    args = parser.parse_args(argv)
+
+    ensure_yt_dlp()
+    bandwidth_governor.set_rate(args.rate)
+    server = DownloadServer(DownloadService(args.workers, args.segments), args.port)
+    print(f"📡 Serviço de downloads em {server.url} ({args.workers} downloads simultâneos)")
+    print("   Ctrl+C para encerrar")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Serviço encerrado.")
+    finally:
+        ydl_pool.close_all()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
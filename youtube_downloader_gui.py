@@ -5,21 +5,88 @@ Interface gráfica moderna para download de vídeos do YouTube
 Design baseado em mockups com tema neon green
 """
 
+import time
+
+# Início da contagem do tempo de abertura (relatório de inicialização)
+STARTUP_T0 = time.perf_counter()
+
 import customtkinter as ctk
 import tkinter as tk
 from tkinter import filedialog, messagebox
-import yt_dlp
 import os
 import sys
+import json
 import threading
 from pathlib import Path
 from PIL import Image, ImageTk
 import urllib.request
 import io
+import hashlib
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from youtube_downloader import (
+    DownloadScheduler, DEFAULT_WORKERS, ydl_pool, extract_info_once,
+    APP_DATA_DIR, entry_url, entry_thumbnail, stream_playlist, ProgressAggregator, PROGRESS_FPS,
+    format_speed, find_ffmpeg, build_ydl_opts, download_with_journal, download_journal, resume_interrupted,
+    transcode_pool, AUDIO_CODECS, DEFAULT_SEGMENTS, bandwidth_governor, format_bandwidth,
+    warm_up, DEFAULT_MAX_HEIGHT, FormatSelector, format_plan, PlaylistSync, entry_id,
+    split_links, analyze_links
+)
+from youtube_downloader_daemon import FINAL_STATES, RemoteJobs, ServiceClient, ServiceError
+
+# Opções de limite de banda total (MB/s; 0 = sem limite)
+RATE_LIMITS = (0, 1, 2, 5, 10)
+
+# Opções de resolução máxima dos vídeos (0 = sem limite)
+QUALITY_LIMITS = (0, 2160, 1440, 1080, 720, 480, 360)
+
+# Peso de um download único na divisão da banda (playlists têm peso 1)
+INTERACTIVE_PRIORITY = 2.0
+
+# Entradas da playlist entregues à interface de cada vez durante a listagem
+PLAYLIST_BATCH_SIZE = 50
+
+# Campos da análise que a interface mostra (o resto, como formatos e
+# thumbnails em todos os tamanhos, não fica na memória)
+INFO_FIELDS = ('_type', 'id', 'title', 'uploader', 'duration', 'view_count')
 
 # Configurar tema
 ctk.set_appearance_mode("dark")
 
+class StartupTimer:
+    """
+    Marca os tempos da abertura do aplicativo, desde STARTUP_T0
+    
+    Marcas usadas: 'imports' (módulos carregados), 'window' (interface
+    montada), 'first_paint' (janela desenhada) e 'ready' (yt-dlp carregado,
+    pronto para analisar). Só a primeira de cada marca vale.
+    """
+
+    def __init__(self, t0=STARTUP_T0):
+        self.t0 = t0
+        self.marks = {}
+
+    def mark(self, name):
+        self.marks.setdefault(name, time.perf_counter() - self.t0)
+
+    def report(self):
+        """Marcas em milissegundos, na ordem em que aconteceram"""
+        return {name: round(seconds * 1000, 1) for name, seconds in self.marks.items()}
+
+    def save(self, path=None):
+        """Grava o relatório (padrão: ~/.ytd/startup.json); erros são ignorados"""
+        path = path or os.path.join(APP_DATA_DIR, "startup.json")
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(self.report(), f, indent=2)
+        except OSError:
+            pass
+
+startup_timer = StartupTimer()
+startup_timer.mark('imports')
+
 def resource_path(relative_path):
     """Obter caminho absoluto para recursos (funciona no PyInstaller)"""
     try:
@@ -39,8 +106,283 @@ try:
 except:
     pass
 
+class ThumbnailLoader:
+    """
+    Carrega thumbnails em segundo plano, sem travar a interface
+    
+    O download e o redimensionamento rodam em um pool de threads. As imagens
+    já redimensionadas ficam em um cache LRU em memória e em disco
+    (~/.ytd/thumbnails), e o resultado volta para a thread do Tk via
+    window.after, onde o PhotoImage é criado.
+    
+    Args:
+        window: Janela principal (para agendar o retorno na thread do Tk)
+        size: Tamanho máximo da thumbnail
+        max_workers: Downloads de thumbnail simultâneos
+        max_memory: Quantidade de imagens guardadas em memória
+        cache_dir: Pasta do cache em disco
+    """
+
+    def __init__(self, window, size=(320, 180), max_workers=2, max_memory=64, cache_dir=None):
+        self.window = window
+        self.size = size
+        self.max_memory = max_memory
+        self.cache_dir = cache_dir or os.path.join(APP_DATA_DIR, "thumbnails")
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def load(self, url, callback):
+        """
+        Pede uma thumbnail; callback(photo) é chamado na thread do Tk
+        (photo é None se não for possível carregar)
+        """
+        image = self._memory_get(url)
+        if image is not None:
+            self.window.after(0, lambda: callback(ImageTk.PhotoImage(image)))
+            return
+        self._executor.submit(self._fetch, url, callback)
+
+    def _fetch(self, url, callback):
+        try:
+            image = self._disk_get(url)
+            if image is None:
+                with urllib.request.urlopen(url, timeout=15) as response:
+                    image_data = response.read()
+                image = Image.open(io.BytesIO(image_data))
+                image = image.convert("RGB")
+                image.thumbnail(self.size, Image.Resampling.LANCZOS)
+                self._disk_put(url, image)
+            self._memory_put(url, image)
+        except Exception:
+            image = None
+        
+        if image is None:
+            self.window.after(0, lambda: callback(None))
+        else:
+            self.window.after(0, lambda: callback(ImageTk.PhotoImage(image)))
+
+    def _memory_get(self, url):
+        with self._lock:
+            image = self._memory.get(url)
+            if image is not None:
+                self._memory.move_to_end(url)
+            return image
+
+    def _memory_put(self, url, image):
+        with self._lock:
+            self._memory[url] = image
+            self._memory.move_to_end(url)
+            while len(self._memory) > self.max_memory:
+                self._memory.popitem(last=False)
+
+    def _disk_path(self, url):
+        name = hashlib.sha1(f"{url}|{self.size[0]}x{self.size[1]}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.jpg")
+
+    def _disk_get(self, url):
+        path = self._disk_path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            image = Image.open(path)
+            image.load()
+            return image
+        except Exception:
+            return None
+
+    def _disk_put(self, url, image):
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir, exist_ok=True)
+            path = self._disk_path(url)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            image.save(temp_path, "JPEG", quality=90)
+            os.replace(temp_path, path)
+        except Exception:
+            pass
+
+class PlaylistSelection:
+    """
+    Seleção compacta das entradas da playlist (1 bit por linha)
+    
+    Guarda um valor padrão e um bitset das linhas que fogem dele, então
+    marcar/desmarcar todos não percorre as linhas.
+    """
+
+    def __init__(self, size=0, selected=True):
+        self.reset(size, selected)
+
+    def reset(self, size, selected=True):
+        """Nova lista com 'size' linhas, todas com o mesmo estado"""
+        self.size = size
+        self.set_all(selected)
+
+    def set_all(self, selected):
+        """Marcar ou desmarcar todas as linhas"""
+        self._default = bool(selected)
+        self._flipped = bytearray((self.size + 7) // 8)
+        self._flipped_count = 0
+
+    def resize(self, size):
+        """Aumentar a lista; as novas linhas seguem o estado padrão"""
+        if size > self.size:
+            self._flipped.extend(bytes((size + 7) // 8 - len(self._flipped)))
+            self.size = size
+
+    def is_selected(self, row):
+        # Linhas que ainda não chegaram seguem o estado padrão
+        if row >= self.size:
+            return self._default
+        flipped = (self._flipped[row >> 3] >> (row & 7)) & 1
+        return self._default != bool(flipped)
+
+    def set(self, row, selected):
+        if self.is_selected(row) == bool(selected):
+            return
+        self._flipped[row >> 3] ^= 1 << (row & 7)
+        flipped = (self._flipped[row >> 3] >> (row & 7)) & 1
+        self._flipped_count += 1 if flipped else -1
+
+    def count(self):
+        """Quantidade de linhas marcadas"""
+        if self._default:
+            return self.size - self._flipped_count
+        return self._flipped_count
+
+    def selected_rows(self):
+        """Linhas marcadas, em ordem"""
+        return [row for row in range(self.size) if self.is_selected(row)]
+
+class VirtualPlaylistList(ctk.CTkFrame):
+    """
+    Lista de checkboxes virtualizada para playlists grandes
+    
+    Só existem checkboxes para as linhas visíveis; ao rolar, os mesmos
+    widgets são reaproveitados com o texto e o estado de outras linhas.
+    O estado de seleção fica em um PlaylistSelection.
+    
+    Args:
+        master: Widget pai
+        label_for: Função (row) -> texto da linha
+        on_visible: Callback (start, end) com as linhas visíveis
+        row_height: Altura de cada linha
+        checkbox_style: Opções repassadas aos CTkCheckBox
+    """
+
+    def __init__(self, master, label_for, on_visible=None, row_height=34, checkbox_style=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.label_for = label_for
+        self.on_visible = on_visible
+        self.row_height = row_height
+        self.checkbox_style = checkbox_style or {}
+        self.selection = PlaylistSelection()
+        self.offset = 0
+        self._slots = []  # Checkboxes reaproveitados
+        
+        self.rows_frame = ctk.CTkFrame(self, fg_color="transparent", corner_radius=0)
+        self.rows_frame.pack(side="left", fill="both", expand=True)
+        
+        self.scrollbar = ctk.CTkScrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        
+        self.rows_frame.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.rows_frame)
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", self._on_mouse_wheel)
+        widget.bind("<Button-4>", self._on_mouse_wheel)
+        widget.bind("<Button-5>", self._on_mouse_wheel)
+
+    def set_size(self, size, selected=True):
+        """Mostrar uma nova lista com 'size' linhas"""
+        self.selection.reset(size, selected)
+        self.offset = 0
+        self.refresh()
+
+    def set_all(self, selected):
+        """Marcar ou desmarcar todas as linhas"""
+        self.selection.set_all(selected)
+        self.refresh()
+
+    def resize(self, size):
+        """Acrescentar linhas mantendo a seleção e a posição atuais"""
+        self.selection.resize(size)
+        self.refresh()
+
+    def _on_resize(self, event):
+        row_height = self._apply_widget_scaling(self.row_height)
+        needed = max(1, int(event.height // row_height))
+        
+        while len(self._slots) < needed:
+            slot = len(self._slots)
+            checkbox = ctk.CTkCheckBox(
+                self.rows_frame,
+                text="",
+                command=lambda slot=slot: self._on_toggle(slot),
+                **self.checkbox_style
+            )
+            self._bind_wheel(checkbox)
+            self._slots.append(checkbox)
+        while len(self._slots) > needed:
+            self._slots.pop().destroy()
+        
+        self.scroll_to(self.offset)
+
+    def _on_toggle(self, slot):
+        row = self.offset + slot
+        if row < self.selection.size:
+            self.selection.set(row, self._slots[slot].get() == 1)
+
+    def _on_scrollbar(self, action, *args):
+        if action == "moveto":
+            self.scroll_to(round(float(args[0]) * self.selection.size))
+        elif action == "scroll":
+            amount = int(args[0])
+            if len(args) > 1 and args[1] == "pages":
+                amount *= len(self._slots)
+            self.scroll_to(self.offset + amount)
+
+    def _on_mouse_wheel(self, event):
+        if getattr(event, "num", None) == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.offset - 3)
+        else:
+            self.scroll_to(self.offset + 3)
+        return "break"
+
+    def scroll_to(self, offset):
+        """Rolar até que a linha 'offset' seja a primeira visível"""
+        max_offset = max(0, self.selection.size - len(self._slots))
+        self.offset = max(0, min(int(offset), max_offset))
+        self.refresh()
+
+    def refresh(self):
+        """Redesenhar as linhas visíveis"""
+        size = self.selection.size
+        for slot, checkbox in enumerate(self._slots):
+            row = self.offset + slot
+            if row < size:
+                checkbox.configure(text=self.label_for(row))
+                if self.selection.is_selected(row):
+                    checkbox.select()
+                else:
+                    checkbox.deselect()
+                checkbox.place(x=10, y=slot * self.row_height + 5)
+            else:
+                checkbox.place_forget()
+        
+        visible_end = min(size, self.offset + len(self._slots))
+        if size:
+            self.scrollbar.set(self.offset / size, visible_end / size)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        
+        if self.on_visible and visible_end > self.offset:
+            self.on_visible(self.offset, visible_end)
+
 class YouTubeDownloaderGUI:
-    def __init__(self):
+    def __init__(self, startup_report=False):
+        self.startup_report = startup_report
         self.window = ctk.CTk()
         self.window.title("YTD - YouTube Downloader")
         self.window.geometry("800x750")
@@ -65,7 +407,36 @@ class YouTubeDownloaderGUI:
         self.video_info = None
         self.download_path = str(Path.home() / "Downloads")
         self.is_downloading = False
-        self.playlist_videos = []
+        self.max_workers = DEFAULT_WORKERS  # Downloads simultâneos em playlists
+        self.segments = DEFAULT_SEGMENTS  # Conexões simultâneas por arquivo
+        self.max_height = DEFAULT_MAX_HEIGHT  # Resolução máxima dos vídeos
+        self.thumbnail_loader = ThumbnailLoader(self.window)
+        self._thumbnail_url = None  # Thumbnail esperada no momento
+        
+        # Enriquecimento (extração completa) das entradas visíveis da playlist
+        self.playlist_rows = array('I')  # Linha da lista -> índice na playlist
+        self._playlist_generation = 0
+        self._enrich_requested = set()
+        self._enrich_executor = ThreadPoolExecutor(max_workers=2)
+        # Chamadas ao serviço local fora da thread do Tk, uma de cada vez e na ordem
+        self._service_executor = ThreadPoolExecutor(max_workers=1)
+        
+        # Progresso dos downloads (desenhado em taxa fixa por _render_progress)
+        self.progress = ProgressAggregator()
+        self._scheduler = None
+        self._transcoder = None
+        self._audio_methods = Counter()  # Áudios copiados x reconvertidos
+        self._last_audio = ""  # Resultado do último áudio concluído
+        self._saved_bytes = 0  # Economia estimada pela escolha de formato
+        self._last_playlist_item = ""
+        
+        # Listagem da playlist em andamento (as entradas chegam aos poucos)
+        self._entries_cond = threading.Condition()
+        self._entries_done = True
+        
+        # Análise de vários links colados de uma vez (fila única)
+        self._links_done = 0
+        self._link_errors = []  # (link, erro)
         
         # Cores do novo design
         self.color_neon = "#C8FF00"  # Verde neon
@@ -74,6 +445,45 @@ class YouTubeDownloaderGUI:
         self.color_text = "#FFFFFF"   # Texto branco
         
         self.setup_ui()
+        startup_timer.mark('window')
+        
+        # O resto da inicialização espera a janela ser desenhada
+        self.window.after_idle(self._on_first_paint)
+        
+        # Oferecer retomar downloads interrompidos (depois de a janela aparecer)
+        self.window.after(500, self._offer_resume)
+    
+    def _on_first_paint(self):
+        """Janela já na tela: carregar a logo e preparar a análise em segundo plano"""
+        startup_timer.mark('first_paint')
+        self._load_initial_logo()
+        threading.Thread(target=self._warm_up_thread, daemon=True).start()
+    
+    def _warm_up_thread(self):
+        """Importa o yt-dlp e prepara os extractors enquanto o usuário cola o link"""
+        try:
+            warm_up()
+        except ImportError as e:
+            self.window.after(0, lambda: self._missing_dependency(e.name))
+            return
+        except Exception:
+            # Falhas aqui não impedem a análise, que prepara tudo de novo
+            pass
+        self.window.after(0, self._startup_ready)
+    
+    def _startup_ready(self):
+        startup_timer.mark('ready')
+        startup_timer.save()
+        if self.startup_report:
+            print(json.dumps(startup_timer.report(), indent=2))
+    
+    def _missing_dependency(self, name):
+        self.analyze_btn.configure(state="disabled")
+        messagebox.showerror(
+            "Erro",
+            f"Biblioteca '{name}' não encontrada!\n\n"
+            f"Instale as dependências com:\n{sys.executable} -m pip install -r requirements.txt"
+        )
         
     def setup_ui(self):
         """Configurar interface do usuário"""
@@ -118,13 +528,19 @@ class YouTubeDownloaderGUI:
             )
         title_label.pack(pady=(30, 20))
         
-        # Campo de entrada URL
-        self.url_entry = ctk.CTkEntry(
+        # Campo de entrada URL (várias linhas: um link por linha)
+        url_hint = ctk.CTkLabel(
             self.window,
-            height=50,
+            text="Cole seu link (ou vários, um por linha)",
+            font=("Montserrat", 11),
+            text_color="#666666"
+        )
+        url_hint.pack(anchor="w", padx=50)
+        self.url_entry = ctk.CTkTextbox(
+            self.window,
+            height=80,
             font=("Montserrat", 12),
-            placeholder_text="Cole seu link",
-            placeholder_text_color="#666666",
+            wrap="none",
             border_color=self.color_neon,
             border_width=2,
             corner_radius=0,  # Sem arredondamento
@@ -180,6 +596,57 @@ class YouTubeDownloaderGUI:
         )
         self.folder_btn.pack(side="right", padx=10, pady=10)
         
+        # Conexões simultâneas por arquivo (download segmentado)
+        self.segments_menu = ctk.CTkOptionMenu(
+            folder_frame,
+            values=[self._segments_label(n) for n in (1, 2, 4, 8)],
+            command=self._set_segments,
+            height=30,
+            width=130,
+            font=("Montserrat", 10, "bold"),
+            fg_color=self.color_neon,
+            button_color=self.color_neon,
+            button_hover_color="#a0cc00",
+            text_color="#000000",
+            corner_radius=0
+        )
+        self.segments_menu.set(self._segments_label(self.segments))
+        self.segments_menu.pack(side="right", pady=10)
+        
+        # Limite de banda total, dividido entre os downloads em andamento
+        self.rate_menu = ctk.CTkOptionMenu(
+            folder_frame,
+            values=[self._rate_label(rate) for rate in RATE_LIMITS],
+            command=self._set_rate,
+            height=30,
+            width=120,
+            font=("Montserrat", 10, "bold"),
+            fg_color=self.color_neon,
+            button_color=self.color_neon,
+            button_hover_color="#a0cc00",
+            text_color="#000000",
+            corner_radius=0
+        )
+        self.rate_menu.set(self._rate_label(0))
+        self.rate_menu.pack(side="right", padx=10, pady=10)
+        
+        # Resolução máxima (o formato mais leve que atende é o escolhido)
+        self.quality_menu = ctk.CTkOptionMenu(
+            folder_frame,
+            values=[self._quality_label(height) for height in QUALITY_LIMITS],
+            command=self._set_quality,
+            height=30,
+            width=110,
+            font=("Montserrat", 10, "bold"),
+            fg_color=self.color_neon,
+            button_color=self.color_neon,
+            button_hover_color="#a0cc00",
+            text_color="#000000",
+            corner_radius=0
+        )
+        self.quality_menu.set(self._quality_label(self.max_height))
+        self.quality_menu.pack(side="right", pady=10)
+        
         # Frame de informações (container principal)
         self.info_container = ctk.CTkFrame(
             self.window,
@@ -202,9 +669,6 @@ class YouTubeDownloaderGUI:
         )
         self.logo_label.place(relx=0.5, rely=0.5, anchor="center")
         
-        # Carregar logo
-        self._load_initial_logo()
-        
         # Frame esquerdo para thumbnail
         self.thumbnail_frame = ctk.CTkFrame(
             self.content_frame,
@@ -239,8 +703,20 @@ class YouTubeDownloaderGUI:
         self.info_label.pack(fill="both", expand=True)
         
         # Frame scrollável para lista de vídeos da playlist
-        self.playlist_scroll_frame = ctk.CTkScrollableFrame(
+        # (virtualizado: só as linhas visíveis têm widgets)
+        self.playlist_scroll_frame = VirtualPlaylistList(
             self.info_container,
+            label_for=self._row_label,
+            on_visible=self._enrich_visible_entries,
+            checkbox_style={
+                'font': ("Montserrat", 11),
+                'text_color': self.color_text,
+                'fg_color': self.color_neon,
+                'hover_color': "#a0cc00",
+                'checkmark_color': "#000000",
+                'border_color': self.color_neon,
+                'corner_radius': 0,
+            },
             fg_color=self.color_bg,
             height=150,  # Alterado para 150
             corner_radius=0
@@ -281,6 +757,21 @@ class YouTubeDownloaderGUI:
         )
         self.deselect_all_btn.pack(side="left", padx=5)
         
+        # Só os vídeos que entraram desde o último download desta playlist
+        self.select_new_btn = ctk.CTkButton(
+            self.playlist_controls_frame,
+            text="Só novos",
+            command=self.select_new_videos,
+            height=40,
+            width=140,
+            font=("Montserrat", 11, "bold"),
+            fg_color=self.color_neon,
+            hover_color="#a0cc00",
+            text_color="#000000",
+            corner_radius=0
+        )
+        self.select_new_btn.pack(side="left", padx=5)
+        
         # Botões MP4/MP3 para playlist
         self.mp4_playlist_btn = ctk.CTkButton(
             self.playlist_controls_frame,
@@ -310,6 +801,21 @@ class YouTubeDownloaderGUI:
         )
         self.mp3_playlist_btn.pack(side="left", padx=5)
         
+        # Áudio no codec original (cópia do fluxo, sem reconverter)
+        self.original_playlist_btn = ctk.CTkButton(
+            self.playlist_controls_frame,
+            text="Áudio original",
+            command=lambda: self.start_download("audio-original"),
+            height=40,
+            width=140,
+            font=("Montserrat", 11, "bold"),
+            fg_color=self.color_neon,
+            hover_color="#a0cc00",
+            text_color="#000000",
+            corner_radius=0
+        )
+        self.original_playlist_btn.pack(side="left", padx=5)
+        
         # Frame de botões de download (vídeo único)
         self.download_frame = ctk.CTkFrame(self.window, fg_color="transparent")
         # self.download_frame.pack(pady=(0, 20))  # Removido pack inicial
@@ -344,6 +850,21 @@ class YouTubeDownloaderGUI:
         )
         self.mp3_btn.pack(side="left", padx=10)
         
+        self.original_btn = ctk.CTkButton(
+            self.download_frame,
+            text="Áudio original",
+            command=lambda: self.start_download("audio-original"),
+            height=50,
+            width=180,
+            font=("Montserrat", 13, "bold"),
+            fg_color=self.color_neon,
+            hover_color="#a0cc00",
+            text_color="#000000",
+            corner_radius=0,
+            state="disabled"
+        )
+        self.original_btn.pack(side="left", padx=10)
+        
         # Barra de progresso
         self.progress_bar = ctk.CTkProgressBar(
             self.window,
@@ -364,13 +885,59 @@ class YouTubeDownloaderGUI:
     
     def select_all_videos(self):
         """Marcar todos os vídeos"""
-        for checkbox_var in self.playlist_videos:
-            checkbox_var.set(True)
+        self.playlist_scroll_frame.set_all(True)
     
     def deselect_all_videos(self):
         """Desmarcar todos os vídeos"""
-        for checkbox_var in self.playlist_videos:
-            checkbox_var.set(False)
+        self.playlist_scroll_frame.set_all(False)
+    
+    def _pasted_url(self):
+        """Link colado no campo (o texto inteiro, se houver vários)"""
+        text = self.url_entry.get("1.0", "end").strip()
+        links = split_links(text)
+        return links[0] if len(links) == 1 else text
+    
+    def select_new_videos(self):
+        """Marcar só os vídeos que não estavam no último download desta playlist (nesta pasta)"""
+        if not self.video_info or 'entries' not in self.video_info:
+            return
+        if self.video_info.get('links'):
+            messagebox.showinfo("Só novos", "Esta opção vale para uma playlist, não para vários links.")
+            return
+        url = self._pasted_url()
+        folder = self._playlist_folder()
+        known = set()
+        for profile in ('video',) + tuple(AUDIO_CODECS):
+            known.update(PlaylistSync(url, profile, folder).known or ())
+        if not known:
+            messagebox.showinfo("Só novos", "Nenhum download anterior desta playlist nesta pasta: "
+                                            "todos os vídeos são novos.")
+        
+        # As entradas que ainda vão chegar contam como novas
+        frame = self.playlist_scroll_frame
+        frame.selection.set_all(True)
+        with self._entries_cond:
+            entries = self.video_info['entries']
+            for row, idx in enumerate(self.playlist_rows):
+                if entry_id(entries[idx]) in known:
+                    frame.selection.set(row, False)
+        frame.refresh()
+    
+    def _playlist_folder(self):
+        """Pasta da playlist analisada (dentro da pasta de downloads)"""
+        if self.video_info.get('links'):
+            return self.download_path
+        playlist_title = self.video_info.get('title', 'Playlist')
+        safe_title = "".join(c for c in playlist_title if c.isalnum() or c in (' ', '-', '_')).strip()
+        return os.path.join(self.download_path, safe_title)
+    
+    def _record_sync(self, url, download_type, output_path, results):
+        """Guardar a listagem da playlist com o que foi baixado (para 'Só novos' e o modo sync)"""
+        if self.video_info.get('links'):
+            return
+        with self._entries_cond:
+            listing = list(self.video_info['entries'])
+        PlaylistSync(url, download_type, output_path).record(listing, results)
         
     def _load_initial_logo(self):
         """Carregar logo inicial"""
@@ -392,6 +959,47 @@ class YouTubeDownloaderGUI:
         except Exception as e:
             print(f"Erro ao carregar logo: {e}")
 
+    @staticmethod
+    def _segments_label(segments):
+        return "1 conexão" if segments == 1 else f"{segments} conexões"
+    
+    def _set_segments(self, label):
+        """Escolher quantas conexões usar por arquivo"""
+        self.segments = int(label.split()[0])
+    
+    @staticmethod
+    def _quality_label(height):
+        return "Máxima" if not height else f"Até {height}p"
+    
+    def _set_quality(self, label):
+        """Escolher a resolução máxima dos vídeos"""
+        self.max_height = 0 if label == "Máxima" else int(label.split()[1].rstrip('p'))
+    
+    def _quality(self):
+        return FormatSelector(self.max_height or None)
+    
+    @staticmethod
+    def _rate_label(rate):
+        return "Sem limite" if not rate else f"{rate} MB/s"
+    
+    def _set_rate(self, label):
+        """Escolher o limite de banda total (vale também para downloads em andamento)"""
+        rate = 0 if label == "Sem limite" else int(label.split()[0])
+        bandwidth_governor.set_rate(rate * 1024 * 1024)
+        # Com o serviço local, o limite que vale é o dele
+        self._service_executor.submit(self._set_service_rate, rate * 1024 * 1024)
+    
+    def _set_service_rate(self, rate):
+        """Repassa o limite ao serviço local, se houver (roda no _service_executor)"""
+        service = ServiceClient.find()
+        if service is None:
+            return
+        try:
+            service.set_rate(rate)
+        except ServiceError as e:
+            message = f"Não foi possível mudar o limite do serviço: {e}"
+            self.window.after(0, lambda: messagebox.showerror("Erro", message))
+    
     def choose_folder(self):
         """Escolher pasta de download"""
         folder = filedialog.askdirectory(initialdir=self.download_path)
@@ -400,60 +1008,178 @@ class YouTubeDownloaderGUI:
             self.folder_label.configure(text=f"PASTA: {self.download_path}")
     
     def analyze_url(self):
-        """Analisar URL e obter informações"""
-        url = self.url_entry.get().strip()
+        """Analisar URL (ou vários, um por linha) e obter informações"""
+        links = split_links(self.url_entry.get("1.0", "end"))
         
-        if not url:
+        if not links:
             messagebox.showwarning("Aviso", "Por favor, cole um link do YouTube!")
             return
         
-        if 'youtube.com' not in url and 'youtu.be' not in url:
-            messagebox.showerror("Erro", "Link inválido! Use um link do YouTube.")
+        invalid = [link for link in links if 'youtube.com' not in link and 'youtu.be' not in link]
+        if invalid:
+            messagebox.showerror("Erro", "Link inválido! Use um link do YouTube.\n\n" + "\n".join(invalid[:5]))
             return
         
         # Desabilitar botão durante análise
         self.analyze_btn.configure(state="disabled", text="Analisando...")
-        self.info_label.configure(text="Analisando link, aguarde...")
+        self.info_label.configure(text="Analisando link, aguarde..." if len(links) == 1
+                                  else f"Analisando {len(links)} links, aguarde...")
         
         # Executar em thread separada
-        thread = threading.Thread(target=self._analyze_url_thread, args=(url,))
+        if len(links) == 1:
+            thread = threading.Thread(target=self._analyze_url_thread, args=(links[0],))
+        else:
+            thread = threading.Thread(target=self._analyze_links_thread, args=(links,))
         thread.daemon = True
         thread.start()
     
     def _analyze_url_thread(self, url):
-        """Thread para análise de URL"""
+        """Thread para análise de URL (a playlist chega aos poucos)"""
+        with self._entries_cond:
+            self._entries_done = False
+        
+        def on_info(info):
+            summary = {key: info[key] for key in INFO_FIELDS if info.get(key) is not None}
+            summary['thumbnail'] = entry_thumbnail(info)
+            with self._entries_cond:
+                if info.get('_type') == 'playlist':
+                    summary['entries'] = []
+                self.video_info = summary
+                self.playlist_rows = array('I')
+                self._playlist_generation += 1
+            self.window.after(0, self._display_info)
+        
         try:
-            ydl_opts = {
-                'quiet': True,
-                'no_warnings': True,
-                'extract_flat': 'in_playlist'
-            }
+            batch = []
+            for idx, entry in stream_playlist(url, on_info=on_info):
+                batch.append((idx, entry))
+                if len(batch) >= PLAYLIST_BATCH_SIZE:
+                    self._add_entries(batch)
+                    batch = []
+            self._add_entries(batch)
+            self.window.after(0, self._analysis_finished)
             
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                self.video_info = ydl.extract_info(url, download=False)
-            
-            # Se for playlist, pegar thumbnail do primeiro vídeo
-            if 'entries' in self.video_info:
-                entries = list(self.video_info.get('entries', []))
-                if entries and entries[0]:
-                    first_video_url = entries[0].get('url') or f"https://www.youtube.com/watch?v={entries[0].get('id')}"
-                    try:
-                        ydl_opts_single = {'quiet': True, 'no_warnings': True}
-                        with yt_dlp.YoutubeDL(ydl_opts_single) as ydl_single:
-                            first_video_info = ydl_single.extract_info(first_video_url, download=False)
-                            self.video_info['entries'][0]['thumbnail'] = first_video_info.get('thumbnail')
-                    except:
-                        pass
-            
-            # Atualizar UI
-            self.window.after(0, self._display_info)
+        except Exception as e:
+            self.window.after(0, lambda: self._show_error(str(e)))
+        
+        finally:
+            with self._entries_cond:
+                self._entries_done = True
+                self._entries_cond.notify_all()
+    
+    def _analyze_links_thread(self, links):
+        """Thread de análise de vários links (cada um entra na fila assim que fica pronto)"""
+        with self._entries_cond:
+            self._entries_done = False
+            self.video_info = {'_type': 'playlist', 'title': f"{len(links)} links", 'entries': [], 'links': links}
+            self.playlist_rows = array('I')
+            self._playlist_generation += 1
+            generation = self._playlist_generation
+            self._links_done = 0
+            self._link_errors = []
+        self.window.after(0, self._display_info)
+        
+        def on_result(position, url, info, entries, error):
+            with self._entries_cond:
+                if generation != self._playlist_generation:
+                    return
+                self._links_done += 1
+                if error:
+                    self._link_errors.append((url, error))
+                # As entradas ganham o índice da fila (ordem de chegada)
+                start = len(self.video_info['entries'])
+                batch = []
+                for offset, entry in enumerate(entries):
+                    entry.index = start + offset
+                    batch.append((entry.index, entry))
+            if batch:
+                self._add_entries(batch)
+            else:
+                self.window.after(0, self._on_entries_added)
+        
+        try:
+            analyze_links(links, on_result)
+            self.window.after(0, self._analysis_finished)
             
         except Exception as e:
             self.window.after(0, lambda: self._show_error(str(e)))
+        
+        finally:
+            with self._entries_cond:
+                self._entries_done = True
+                self._entries_cond.notify_all()
+    
+    def _add_entries(self, batch):
+        """Acrescentar entradas recém-listadas (chamado pela thread de análise)"""
+        if not batch:
+            return
+        with self._entries_cond:
+            entries = self.video_info['entries']
+            for idx, entry in batch:
+                while len(entries) < idx:
+                    entries.append(None)
+                entries.append(entry)
+                self.playlist_rows.append(idx)
+            self._entries_cond.notify_all()
+        self.window.after(0, self._on_entries_added)
+    
+    def _on_entries_added(self):
+        """Atualizar lista, contagem e thumbnail com as novas entradas"""
+        if not self.video_info or 'entries' not in self.video_info:
+            return
+        self.playlist_scroll_frame.resize(len(self.playlist_rows))
+        self.info_label.configure(text=self._playlist_info_text())
+        
+        # A thumbnail da playlist é a da primeira entrada
+        if self._thumbnail_url is None and self.playlist_rows:
+            first_entry = self.video_info['entries'][self.playlist_rows[0]]
+            self._load_thumbnail(entry_thumbnail(first_entry))
+    
+    def _analysis_finished(self):
+        """Listagem concluída"""
+        if not self.is_downloading:
+            self.analyze_btn.configure(state="normal", text="Analisar link")
+        if self.video_info and 'entries' in self.video_info:
+            self.info_label.configure(text=self._playlist_info_text())
+        if self.video_info and self.video_info.get('links') and self._link_errors:
+            failed = "\n".join(f"{url}\n  {error}" for url, error in self._link_errors[:10])
+            if len(self._link_errors) > 10:
+                failed += f"\n... e mais {len(self._link_errors) - 10}"
+            messagebox.showwarning("Aviso", f"{len(self._link_errors)} link(s) não puderam ser analisados:\n\n{failed}")
+    
+    def _playlist_info_text(self):
+        """Texto de informações da playlist (ou da fila de vários links)"""
+        video_count = f"{len(self.playlist_rows)} vídeos"
+        if not self._entries_done:
+            video_count += " (carregando...)"
+        
+        links = self.video_info.get('links')
+        if links:
+            analyzed = f"{self._links_done} de {len(links)}"
+            if self._link_errors:
+                analyzed += f" ({len(self._link_errors)} com erro)"
+            return f"Vários links\n{len(links)} links colados\n\nAnalisados\n{analyzed}\n\nDuração\n-\n\nVisualização\n{video_count}"
+        
+        title = self.video_info.get('title', 'Playlist')
+        uploader = self.video_info.get('uploader', 'Desconhecido')
+        return f"Título da playlist do youtube\n{title}\n\nNome do Canal\n{uploader}\n\nDuração\n-\n\nVisualização\n{video_count}"
+    
+    def _load_thumbnail(self, thumbnail_url):
+        """Baixar e exibir thumbnail (em segundo plano)"""
+        self._thumbnail_url = thumbnail_url
+        if thumbnail_url:
+            self.thumbnail_label.configure(text="Carregando...", image="")
+            self.thumbnail_loader.load(
+                thumbnail_url,
+                lambda photo, u=thumbnail_url: self._show_thumbnail(u, photo)
+            )
+        else:
+            self.thumbnail_label.configure(text="Sem thumbnail", image="")
     
     def _display_info(self):
         """Exibir informações do vídeo/playlist"""
-        self.analyze_btn.configure(state="normal", text="Analisar link")
+        if self._entries_done:
+            self.analyze_btn.configure(state="normal", text="Analisar link")
         
         # Alterar cor do container para destacar
         self.info_container.configure(fg_color=self.color_container)
@@ -467,67 +1193,20 @@ class YouTubeDownloaderGUI:
         
         is_playlist = 'entries' in self.video_info
         
-        # Carregar thumbnail
-        thumbnail_url = None
+        # Carregar thumbnail (a da playlist vem com a primeira entrada)
         if is_playlist:
-            entries = list(self.video_info.get('entries', []))
-            if entries and entries[0]:
-                thumbnail_url = entries[0].get('thumbnail')
+            self._thumbnail_url = None
+            self.thumbnail_label.configure(text="Carregando...", image="")
         else:
-            thumbnail_url = self.video_info.get('thumbnail')
-        
-        # Baixar e exibir thumbnail
-        if thumbnail_url:
-            try:
-                with urllib.request.urlopen(thumbnail_url) as url:
-                    image_data = url.read()
-                image = Image.open(io.BytesIO(image_data))
-                image.thumbnail((320, 180), Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(image)
-                self.thumbnail_label.configure(image=photo, text="")
-                self.thumbnail_label.image = photo
-            except:
-                self.thumbnail_label.configure(text="Sem thumbnail", image="")
-        else:
-            self.thumbnail_label.configure(text="Sem thumbnail", image="")
+            self._load_thumbnail(entry_thumbnail(self.video_info))
         
         if is_playlist:
             # Informações da playlist
-            title = self.video_info.get('title', 'Playlist')
-            video_count = len(list(self.video_info.get('entries', [])))
-            uploader = self.video_info.get('uploader', 'Desconhecido')
-            
-            info_text = f"Título da playlist do youtube\n{title}\n\nNome do Canal\n{uploader}\n\nDuração\n-\n\nVisualização\n{video_count} vídeos"
-            
-            self.info_label.configure(text=info_text)
+            self.info_label.configure(text=self._playlist_info_text())
             
-            # Limpar lista anterior
-            for widget in self.playlist_scroll_frame.winfo_children():
-                widget.destroy()
-            self.playlist_videos.clear()
-            
-            # Criar checkboxes para cada vídeo
-            entries = list(self.video_info.get('entries', []))
-            for idx, entry in enumerate(entries, 1):
-                if entry:
-                    video_title = entry.get('title', f'Vídeo {idx}')
-                    
-                    var = tk.BooleanVar(value=True)
-                    self.playlist_videos.append(var)
-                    
-                    checkbox = ctk.CTkCheckBox(
-                        self.playlist_scroll_frame,
-                        text=f"{idx}. {video_title}",
-                        variable=var,
-                        font=("Montserrat", 11),
-                        text_color=self.color_text,
-                        fg_color=self.color_neon,
-                        hover_color="#a0cc00",
-                        checkmark_color="#000000",
-                        border_color=self.color_neon,
-                        corner_radius=0
-                    )
-                    checkbox.pack(anchor="w", pady=5, padx=10)
+            # Montar a lista (só as linhas visíveis ganham widgets)
+            self._enrich_requested.clear()
+            self.playlist_scroll_frame.set_size(len(self.playlist_rows))
             
             # Mostrar lista e controles de playlist
             self.playlist_scroll_frame.pack(fill="both", expand=True, padx=20, pady=(10, 20))
@@ -539,8 +1218,8 @@ class YouTubeDownloaderGUI:
         else:
             # Informações do vídeo
             title = self.video_info.get('title', 'Sem título')
-            duration = self.video_info.get('duration', 0)
-            views = self.video_info.get('view_count', 0)
+            duration = int(self.video_info.get('duration') or 0)
+            views = self.video_info.get('view_count') or 0
             uploader = self.video_info.get('uploader', 'Desconhecido')
             
             mins = duration // 60
@@ -562,6 +1241,71 @@ class YouTubeDownloaderGUI:
             # Habilitar botões
             self.mp4_btn.configure(state="normal")
             self.mp3_btn.configure(state="normal")
+            self.original_btn.configure(state="normal")
+    
+    def _entry_label(self, idx, entry):
+        """Texto do checkbox de uma entrada da playlist"""
+        label = f"{idx}. {entry.get('title') or f'Vídeo {idx}'}"
+        duration = entry.get('duration')
+        if duration:
+            duration = int(duration)
+            label += f" ({duration // 60}:{duration % 60:02d})"
+        return label
+    
+    def _row_label(self, row):
+        """Texto de uma linha da lista da playlist"""
+        idx = self.playlist_rows[row]
+        return self._entry_label(idx + 1, self.video_info['entries'][idx])
+    
+    def _enrich_visible_entries(self, start, end):
+        """Buscar em segundo plano os detalhes das entradas visíveis"""
+        if not self.video_info:
+            return
+        entries = self.video_info.get('entries') or []
+        
+        for idx in self.playlist_rows[start:end]:
+            entry = entries[idx]
+            # A listagem flat normalmente já traz título e duração
+            if idx in self._enrich_requested or (entry.get('title') and entry.get('duration')):
+                continue
+            self._enrich_requested.add(idx)
+            self._enrich_executor.submit(
+                self._enrich_entry_thread, self._playlist_generation, idx, entry_url(entry)
+            )
+    
+    def _enrich_entry_thread(self, generation, idx, video_url):
+        """Thread de extração completa de uma entrada da playlist"""
+        if generation != self._playlist_generation:
+            return
+        try:
+            with ydl_pool.session('probe', {'quiet': True, 'no_warnings': True, 'noplaylist': True}) as ydl:
+                info = extract_info_once(ydl, video_url)
+        except Exception:
+            return
+        
+        details = {k: info[k] for k in ('title', 'duration') if info.get(k) is not None}
+        # Sem process=True, só a lista 'thumbnails' está preenchida
+        thumbnail = entry_thumbnail(info)
+        if thumbnail:
+            details['thumbnail'] = thumbnail
+        self.window.after(0, lambda: self._apply_entry_details(generation, idx, details))
+    
+    def _apply_entry_details(self, generation, idx, details):
+        """Atualizar a entrada e seu checkbox com os detalhes obtidos"""
+        if generation != self._playlist_generation:
+            return
+        self.video_info['entries'][idx].update(details)
+        self.playlist_scroll_frame.refresh()
+    
+    def _show_thumbnail(self, thumbnail_url, photo):
+        """Exibir thumbnail carregada (ignora respostas de análises antigas)"""
+        if thumbnail_url != self._thumbnail_url:
+            return
+        if photo is None:
+            self.thumbnail_label.configure(text="Sem thumbnail", image="")
+            return
+        self.thumbnail_label.configure(image=photo, text="")
+        self.thumbnail_label.image = photo
     
     def _show_error(self, error_msg):
         """Mostrar erro"""
@@ -580,22 +1324,26 @@ class YouTubeDownloaderGUI:
             return
         
         is_playlist = 'entries' in self.video_info
-        selected_indices = []
+        selected_entries = None
         
         if is_playlist:
-            selected_indices = [i for i, var in enumerate(self.playlist_videos) if var.get()]
+            selection = self.playlist_scroll_frame.selection
+            # Com a listagem em andamento, as próximas entradas seguem o "Marcar todos"
+            pending = not self._entries_done and selection.is_selected(selection.size)
+            video_count = selection.count()
             
-            if not selected_indices:
+            if not video_count and not pending:
                 messagebox.showwarning("Aviso", "Selecione pelo menos um vídeo para baixar!")
                 return
             
-            video_count = len(selected_indices)
-            confirm = messagebox.askyesno(
-                "Confirmar Download",
-                f"Deseja baixar {video_count} vídeo(s) selecionado(s)?"
-            )
+            message = f"Deseja baixar {video_count} vídeo(s) selecionado(s)?"
+            if pending:
+                message += "\n\nA playlist ainda está carregando: os próximos vídeos entram na fila."
+            confirm = messagebox.askyesno("Confirmar Download", message)
             if not confirm:
                 return
+            
+            selected_entries = self._iter_selected_entries()
         
         # Esconder botões de download
         if is_playlist:
@@ -612,113 +1360,120 @@ class YouTubeDownloaderGUI:
         self.status_label.configure(text="Iniciando download...")
         
         self.is_downloading = True
+        self.progress = ProgressAggregator()
+        self._scheduler = None
+        self._transcoder = None
+        self._audio_methods = Counter()
+        self._last_audio = ""
+        self._saved_bytes = 0
+        self._last_playlist_item = ""
+        self.window.after(1000 // PROGRESS_FPS, self._render_progress)
         
         # Executar download em thread
-        url = self.url_entry.get().strip()
+        url = self._pasted_url()
         thread = threading.Thread(
             target=self._download_thread,
-            args=(url, download_type, is_playlist, selected_indices)
+            args=(url, download_type, is_playlist, selected_entries)
         )
         thread.daemon = True
         thread.start()
     
-    def _download_thread(self, url, download_type, is_playlist, selected_indices=None):
+    def _iter_selected_entries(self):
+        """
+        Entradas marcadas da playlist, em ordem, para a fila de downloads
+        
+        Se a listagem ainda estiver em andamento, espera as próximas
+        entradas chegarem em vez de parar no que já foi carregado.
+        """
+        selection = self.playlist_scroll_frame.selection
+        row = 0
+        while True:
+            with self._entries_cond:
+                while row >= len(self.playlist_rows) and not self._entries_done:
+                    self._entries_cond.wait()
+                if row >= len(self.playlist_rows):
+                    return
+                idx = self.playlist_rows[row]
+                entry = self.video_info['entries'][idx]
+            if selection.is_selected(row):
+                yield idx, entry
+            row += 1
+    
+    def _entry_name(self, idx):
+        """Nome do arquivo de uma entrada (numerado na playlist; só o título com vários links)"""
+        if self.video_info.get('links'):
+            return '%(title)s.%(ext)s'
+        return f'{idx+1} - %(title)s.%(ext)s'
+    
+    def _download_thread(self, url, download_type, is_playlist, selected_entries=None):
         """Thread de download"""
         try:
-            # Encontrar FFmpeg (priorizar versão bundled)
-            ffmpeg_location = None
-            possible_paths = [
-                # Bundled com o executável
-                resource_path("ffmpeg/ffmpeg.exe"),
-                resource_path("ffmpeg.exe"),
-                # Instalações do sistema
-                os.path.expanduser(r"~\AppData\Local\Microsoft\WinGet\Packages\Gyan.FFmpeg_Microsoft.Winget.Source_8wekyb3d8bbwe\ffmpeg-8.0.1-full_build\bin\ffmpeg.exe"),
-                r"C:\ffmpeg\bin\ffmpeg.exe",
-            ]
+            ffmpeg_location = self._find_ffmpeg()
             
-            for path in possible_paths:
-                if os.path.exists(path):
-                    ffmpeg_location = path
-                    break
+            # Áudio: a conversão (ou cópia do fluxo) roda no pool de conversão
+            # enquanto os próximos arquivos são baixados
+            postprocess = None
+            extra_opts = {'noprogress': False}
+            if download_type in AUDIO_CODECS:
+                transcoder = transcode_pool(ffmpeg_location)
+                self._transcoder = transcoder
+                
+                def postprocess(info):
+                    return transcoder.submit_info(info, AUDIO_CODECS[download_type], on_file=self._audio_file_done)
+                extra_opts['postprocessors'] = []
             
             # Se for playlist, criar pasta
             output_path = self.download_path
             if is_playlist and self.video_info:
-                playlist_title = self.video_info.get('title', 'Playlist')
-                safe_title = "".join(c for c in playlist_title if c.isalnum() or c in (' ', '-', '_')).strip()
-                output_path = os.path.join(self.download_path, safe_title)
+                output_path = self._playlist_folder()
                 
                 if not os.path.exists(output_path):
                     os.makedirs(output_path)
             
-            # Download com seleção de vídeos
-            if is_playlist and selected_indices:
-                entries = list(self.video_info.get('entries', []))
-                for idx in selected_indices:
-                    if idx < len(entries):
-                        entry = entries[idx]
-                        video_url = entry.get('url') or f"https://www.youtube.com/watch?v={entry.get('id')}"
-                        video_title = entry.get('title', f'Video {idx+1}')
-                        
-                        self.window.after(0, lambda t=video_title: self.status_label.configure(
-                            text=f"Baixando: {t[:40]}..."
-                        ))
-                        
-                        if download_type == "video":
-                            ydl_opts = {
-                                'format': 'best[ext=mp4]/best',
-                                'outtmpl': os.path.join(output_path, f'{idx+1} - %(title)s.%(ext)s'),
-                                'progress_hooks': [self._progress_hook],
-                                'noprogress': False,
-                            }
-                        else:
-                            ydl_opts = {
-                                'format': 'bestaudio/best',
-                                'outtmpl': os.path.join(output_path, f'{idx+1} - %(title)s.%(ext)s'),
-                                'postprocessors': [{
-                                    'key': 'FFmpegExtractAudio',
-                                    'preferredcodec': 'mp3',
-                                    'preferredquality': '192',
-                                }],
-                                'progress_hooks': [self._progress_hook],
-                                'noprogress': False,
-                            }
-                        
-                        if ffmpeg_location:
-                            ydl_opts['ffmpeg_location'] = ffmpeg_location
-                        
-                        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                            ydl.download([video_url])
+            # Com o serviço local rodando, os downloads entram na fila dele
+            service = ServiceClient.find()
+            if service is not None:
+                self._download_remote(service, url, download_type, is_playlist, selected_entries, output_path)
+                self.window.after(0, lambda: self._download_complete(output_path))
+                return
+            
+            # Download com seleção de vídeos (vários ao mesmo tempo)
+            if is_playlist and selected_entries is not None:
+                def build_opts(idx, entry, hook):
+                    return build_ydl_opts(download_type, os.path.join(output_path, self._entry_name(idx)),
+                                          [hook], ffmpeg_location, self._quality(), **extra_opts)
                 
-            else:
-                # Download normal
-                if download_type == "video":
-                    ydl_opts = {
-                        'format': 'best[ext=mp4]/best',
-                        'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s' if not is_playlist else '%(playlist_index)s - %(title)s.%(ext)s'),
-                        'progress_hooks': [self._progress_hook],
-                        'noplaylist': not is_playlist,
-                        'noprogress': False,
-                    }
-                else:
-                    ydl_opts = {
-                        'format': 'bestaudio/best',
-                        'outtmpl': os.path.join(output_path, '%(title)s.%(ext)s' if not is_playlist else '%(playlist_index)s - %(title)s.%(ext)s'),
-                        'postprocessors': [{
-                            'key': 'FFmpegExtractAudio',
-                            'preferredcodec': 'mp3',
-                            'preferredquality': '192',
-                        }],
-                        'progress_hooks': [self._progress_hook],
-                        'noplaylist': not is_playlist,
-                        'noprogress': False,
-                    }
+                scheduler = DownloadScheduler(
+                    build_opts,
+                    max_workers=self.max_workers,
+                    on_progress=self._playlist_progress,
+                    profile=download_type,
+                    postprocess=postprocess,
+                    segments=self.segments
+                )
+                self._scheduler = scheduler
+                results = scheduler.run(selected_entries)
+                self._saved_bytes = scheduler.saved_bytes
+                self._record_sync(url, download_type, output_path, results)
                 
-                if ffmpeg_location:
-                    ydl_opts['ffmpeg_location'] = ffmpeg_location
+                failed = [idx for idx, ok in results.items() if not ok]
+                if failed:
+                    raise RuntimeError(f"{len(failed)} de {len(results)} vídeo(s) falharam: " +
+                                       ", ".join(str(idx + 1) for idx in failed))
                 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([url])
+            else:
+                # Download normal (registrado no diário; pulado se já estiver na pasta)
+                outtmpl = '%(title)s.%(ext)s' if not is_playlist else '%(playlist_index)s - %(title)s.%(ext)s'
+                ydl_opts = build_ydl_opts(download_type, os.path.join(output_path, outtmpl),
+                                          [self._progress_hook], ffmpeg_location, self._quality(),
+                                          noplaylist=not is_playlist, **extra_opts)
+                result = download_with_journal(url, download_type, ydl_opts, skip_done=True,
+                                               postprocess=postprocess, segments=self.segments,
+                                               priority=INTERACTIVE_PRIORITY)
+                if postprocess and result is not None:
+                    result.result()  # Esperar a conversão para MP3
+                elif result is not None:
+                    self._saved_bytes = (format_plan(result) or {}).get('saved_bytes') or 0
             
             # Sucesso
             self.window.after(0, lambda: self._download_complete(output_path))
@@ -726,36 +1481,193 @@ class YouTubeDownloaderGUI:
         except Exception as e:
             self.window.after(0, lambda: self._download_error(str(e)))
     
-    def _progress_hook(self, d):
-        """Hook de progresso"""
-        if d['status'] == 'downloading':
-            # Tentar obter total de bytes (pode ser total_bytes ou total_bytes_estimate)
-            total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
-            downloaded_bytes = d.get('downloaded_bytes', 0)
+    def _download_remote(self, service, url, download_type, is_playlist, selected_entries, output_path):
+        """Download pelo serviço local: aqui só se coloca na fila e acompanha o progresso"""
+        events = service.subscribe()
+        if is_playlist and selected_entries is not None:
+            remote = RemoteJobs()
+            self._scheduler = remote
+            job_ids = []
+            indices = {}  # Job -> índice da entrada na playlist
+            for idx, entry in selected_entries:
+                job = service.submit(entry_url(entry), download_type, output_path,
+                                     name=self._entry_name(idx), segments=self.segments,
+                                     quality=self._quality())
+                remote.update(job)
+                job_ids.append(job['id'])
+                indices[job['id']] = idx
             
-            if total_bytes and total_bytes > 0:
-                progress = downloaded_bytes / total_bytes
-                self.window.after(0, lambda p=progress: self.progress_bar.set(p))
-                
-                downloaded_mb = downloaded_bytes / 1024 / 1024
-                total_mb = total_bytes / 1024 / 1024
-                status_text = f"Baixando: {downloaded_mb:.1f}MB / {total_mb:.1f}MB ({progress*100:.1f}%)"
-                self.window.after(0, lambda t=status_text: self.status_label.configure(text=t))
-            else:
-                # Se não tiver total, mostrar apenas o que foi baixado
-                downloaded_mb = downloaded_bytes / 1024 / 1024
-                status_text = f"Baixando: {downloaded_mb:.1f}MB..."
-                self.window.after(0, lambda t=status_text: self.status_label.configure(text=t))
+            def on_update(job):
+                remote.update(job)
+                if job['status'] in ('downloading', 'processing'):
+                    self._last_playlist_item = job['title'] or job['url']
+        else:
+            job_ids = [service.submit(url, download_type, output_path, INTERACTIVE_PRIORITY,
+                                      segments=self.segments, quality=self._quality())['id']]
+            
+            def on_update(job):
+                progress = job['progress'] or {}
+                self.progress.update('single', {
+                    'status': 'finished' if job['status'] == 'processing' or job['status'] in FINAL_STATES
+                              else 'downloading',
+                    'downloaded_bytes': progress.get('downloaded_bytes'),
+                    'total_bytes': progress.get('total_bytes'),
+                })
+        
+        results = service.wait(job_ids, on_update, events) if job_ids else {}
+        for job in results.values():
+            for audio in job.get('audio') or []:
+                self._audio_file_done(None, audio['file'], audio['method'], audio['codec'])
+            self._saved_bytes += job.get('saved_bytes') or 0
+        if is_playlist and selected_entries is not None:
+            self._record_sync(url, download_type, output_path,
+                              {indices[job_id]: job['ok'] for job_id, job in results.items()})
+        failed = [job for job in results.values() if not job['ok']]
+        if failed and len(results) == 1:
+            raise RuntimeError(failed[0]['error'] or failed[0]['status'])
+        if failed:
+            raise RuntimeError(f"{len(failed)} de {len(results)} vídeo(s) falharam")
+    
+    def _find_ffmpeg(self):
+        """Encontrar FFmpeg (priorizar versão bundled com o executável)"""
+        return find_ffmpeg([resource_path("ffmpeg/ffmpeg.exe"), resource_path("ffmpeg.exe")])
+    
+    def _offer_resume(self):
+        """Perguntar se os downloads interrompidos devem ser retomados"""
+        jobs = download_journal.interrupted()
+        if not jobs or self.is_downloading:
+            return
+        
+        answer = messagebox.askyesnocancel(
+            "Downloads interrompidos",
+            f"{len(jobs)} download(s) não terminaram da última vez.\n\n"
+            "Sim: retomar agora\nNão: descartar\nCancelar: decidir depois"
+        )
+        if answer is None:
+            return
+        if not answer:
+            for job in jobs:
+                download_journal.discard(job['job_id'])
+            return
         
-        elif d['status'] == 'finished':
-            self.window.after(0, lambda: self.progress_bar.set(1.0))
-            self.window.after(0, lambda: self.status_label.configure(text="Processando arquivo..."))
+        self.analyze_btn.configure(state="disabled")
+        self.progress_bar.pack(pady=(0, 10), padx=50)
+        self.progress_bar.set(0)
+        self.status_label.pack(pady=(0, 20))
+        self.status_label.configure(text="Retomando downloads...")
+        
+        self.is_downloading = True
+        self.progress = ProgressAggregator()
+        self._scheduler = None
+        self.window.after(1000 // PROGRESS_FPS, self._render_progress)
+        
+        thread = threading.Thread(target=self._resume_thread)
+        thread.daemon = True
+        thread.start()
+    
+    def _resume_thread(self):
+        """Thread que retoma os downloads do diário"""
+        results = resume_interrupted([self._progress_hook], self._find_ffmpeg())
+        self.window.after(0, lambda: self._resume_complete(results))
+    
+    def _resume_complete(self, results):
+        """Downloads retomados"""
+        self.is_downloading = False
+        self.analyze_btn.configure(state="normal")
+        
+        resumed = sum(1 for _, ok in results if ok)
+        self.progress_bar.set(1.0)
+        self.status_label.configure(text=f"{resumed} de {len(results)} download(s) retomado(s)")
+        if resumed < len(results):
+            messagebox.showwarning(
+                "Downloads interrompidos",
+                f"{len(results) - resumed} download(s) falharam de novo e continuam salvos para depois."
+            )
+        self.window.after(3000, self._reset_progress)
+    
+    def _audio_file_done(self, source, target, method, acodec):
+        """Registra se o áudio foi copiado (sem perda) ou reconvertido (mostrado por _render_progress)"""
+        self._audio_methods[method] += 1
+        outcome = 'cópia do fluxo' if method == 'copy' else 'reconvertido'
+        self._last_audio = f"{os.path.basename(target)}: {outcome} ({acodec or '?'})"
+    
+    def _progress_hook(self, d):
+        """Hook de progresso (só guarda o último estado; ver _render_progress)"""
+        self.progress.update('single', d)
+    
+    def _playlist_progress(self, idx, item, aggregate):
+        """Mudança de estado de um item da playlist"""
+        if item['status'] in ('downloading', 'processing'):
+            self._last_playlist_item = item['title']
+    
+    def _render_progress(self):
+        """Desenhar o progresso mais recente (PROGRESS_FPS vezes por segundo)"""
+        if not self.is_downloading:
+            return
+        
+        if self._scheduler is not None:
+            # Progresso agregado dos downloads paralelos da playlist
+            aggregate = self._scheduler.aggregate()
+            progress = aggregate['progress']
+            speed = format_bandwidth() or format_speed(aggregate['speed'])
+            status_text = (
+                f"Baixando ({aggregate['active']} simultâneos): {aggregate['done']}/{aggregate['total']} "
+                f"concluídos ({progress*100:.1f}%)"
+            )
+            if speed:
+                status_text += f" - {speed}"
+            transcode = self._transcoder.stats() if self._transcoder else None
+            if transcode and (transcode['active'] or transcode['queued']):
+                status_text += (f"\nProcessando áudio: {transcode['active']} em andamento, "
+                                f"{transcode['queued']} na fila")
+            if self._last_audio:
+                status_text += f"\n{self._last_audio[:60]}"
+            if self._last_playlist_item:
+                status_text += f"\n{self._last_playlist_item[:50]}"
+            self.progress_bar.set(progress)
+            self.status_label.configure(text=status_text)
+        else:
+            item = self.progress.poll()['items'].get('single')
+            if item and item['status'] == 'finished':
+                transcode = self._transcoder.stats() if self._transcoder else None
+                self.progress_bar.set(1.0)
+                if transcode and transcode['active']:
+                    self.status_label.configure(text=f"Processando áudio ({transcode['progress']*100:.0f}%)...")
+                else:
+                    self.status_label.configure(text="Processando arquivo...")
+            elif item:
+                # Pode haver só o total estimado (total_bytes_estimate) ou nenhum
+                downloaded_mb = item['downloaded_bytes'] / 1024 / 1024
+                speed = format_speed(item['speed'], item['eta'])
+                bandwidth = format_bandwidth()
+                if bandwidth:
+                    speed = f"{speed} ({bandwidth})" if speed else bandwidth
+                if item['total_bytes']:
+                    progress = item['progress']
+                    total_mb = item['total_bytes'] / 1024 / 1024
+                    status_text = f"Baixando: {downloaded_mb:.1f}MB / {total_mb:.1f}MB ({progress*100:.1f}%)"
+                    self.progress_bar.set(progress)
+                else:
+                    status_text = f"Baixando: {downloaded_mb:.1f}MB..."
+                if speed:
+                    status_text += f" - {speed}"
+                self.status_label.configure(text=status_text)
+        
+        self.window.after(1000 // PROGRESS_FPS, self._render_progress)
     
     def _download_complete(self, output_path=None):
         """Download concluído"""
         self.is_downloading = False
         self.progress_bar.set(1.0)
-        self.status_label.configure(text="Download concluído com sucesso!")
+        status_text = "Download concluído com sucesso!"
+        if sum(self._audio_methods.values()) == 1:
+            status_text += f"\n{self._last_audio}"
+        elif self._audio_methods:
+            status_text += (f" ({self._audio_methods['copy']} áudio(s) copiado(s) sem reconverter, "
+                            f"{self._audio_methods['transcode']} convertido(s))")
+        if self._saved_bytes:
+            status_text += f"\nEconomia estimada pela escolha de formato: {self._saved_bytes / 1024 / 1024:.1f}MB"
+        self.status_label.configure(text=status_text)
         
         # Mostrar botões novamente
         is_playlist = 'entries' in self.video_info if self.video_info else False
@@ -856,22 +1768,8 @@ class YouTubeDownloaderGUI:
         self.window.mainloop()
 
 def main():
-    """Função principal"""
-    # Verificar dependências
-    try:
-        import customtkinter
-    except ImportError:
-        print("Instalando customtkinter...")
-        os.system(f"{sys.executable} -m pip install customtkinter")
-    
-    try:
-        import yt_dlp
-    except ImportError:
-        print("Instalando yt-dlp...")
-        os.system(f"{sys.executable} -m pip install yt-dlp")
-    
-    # Executar GUI
-    app = YouTubeDownloaderGUI()
+    """Função principal (--startup-report imprime os tempos de abertura)"""
+    app = YouTubeDownloaderGUI(startup_report='--startup-report' in sys.argv[1:])
     app.run()
 
 if __name__ == "__main__":